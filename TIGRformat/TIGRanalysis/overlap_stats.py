@@ -0,0 +1,309 @@
+#Overlap and turn-transition statistics of a corpus
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#directories containing "traditional transcript" files exported from ELAN with timecodes
+#("begin - end" line after each segment) and without suppressing repeated speaker labels,
+#or glob patterns or file paths; with the option --eaf, the ELAN documents (.eaf files) are read instead.
+#OUTPUT:
+#two tables, saved as CSV files (appending "_overlaps.csv" and "_transitions.csv" to the output name)
+#or together as one JSON file (appending ".json"):
+#- overlaps: for each recording and pair of speakers, the number of overlaps and their total and mean duration;
+#- transitions: for each recording and speaker change (from one speaker to the next), the number of transitions,
+#  of gaps and of overlaps, and the distribution of the offsets (mean, minimum, percentiles, maximum).
+#The offset of a transition is the time between the ending of the segment of the preceding speaker and the beginning
+#of the segment of the next speaker: positive for a gap (silence), negative for an overlap.
+#All durations are in seconds. The row of each recording with the speakers "*" sums up all pairs of speakers,
+#the rows of the file "*" the whole corpus.
+
+#EXPLANATION:
+#The statistics are computed from the beginning and ending times of the segments (see TIGRtimecode.overlap),
+#not from the square brackets and pauses "(X.XX)" of the formatted transcripts, whose "begin - end" lines
+#have been replaced in step 3 of the workflow.
+#The segments of each recording are sorted by beginning and swept once: the segments still going on at the
+#beginning of a segment are kept (ordered by ending in a heap), so that each overlap is found when its second
+#segment starts. Overlaps shorter than MIN_OVERLAP milliseconds are not counted;
+#segments of the same speaker and segments of AMBIENT_NOISES are never in overlap.
+#The offsets of the transitions are stored in typed arrays and summarized with NumPy if it is installed.
+#The recordings are read in parallel by as many worker processes as there are processor cores (option --jobs).
+#Usage:
+#python -m TIGRformat overlapstats CORPUS_FOLDER -o corpus_stats [--format csv|json] [--eaf]
+
+import argparse
+import csv
+import heapq
+import json
+import os
+from array import array
+from collections import namedtuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .. import batch
+from ..pipeline import read_transcript
+from ..transcript import Transcript
+from ..TIGRelan import eaf_export
+from ..TIGRtimecode.overlap import MIN_OVERLAP, NOISE_LABEL, Segment, transcript_segments
+
+#Speaker (and file) standing for all speakers (all files) in the summary rows.
+ALL = "*"
+#Percentiles of the offsets given in the transitions table.
+PERCENTILES = [10, 25, 50, 75, 90]
+
+OVERLAP_COLUMNS = ["file", "speaker_a", "speaker_b", "overlaps", "overlap_seconds", "mean_seconds"]
+TRANSITION_COLUMNS = (["file", "from_speaker", "to_speaker", "transitions", "gaps", "overlaps", "mean_seconds",
+                       "min_seconds"] + ["p" + str(percentile) + "_seconds" for percentile in PERCENTILES]
+                      + ["max_seconds"])
+
+#Statistics of one recording, as returned by the worker processes.
+#overlaps maps each pair of speakers (sorted) to [number of overlaps, total duration in milliseconds];
+#pairs lists the speaker changes (from, to), codes the index in pairs of each transition, offsets its offset
+#in milliseconds. error is the error message (None if successful).
+FileStats = namedtuple("FileStats", ["file", "segments", "overlaps", "pairs", "codes", "offsets", "error"])
+
+
+def read_segments(filename):
+    """Reads the segments of a transcript exported from ELAN or of an ELAN document (.eaf)."""
+
+    if eaf_export.is_eaf(filename):
+        annotations = eaf_export.merge_annotations(eaf_export.read_eaf(filename))
+        return [Segment(annotation.label, annotation.start, annotation.end, None) for annotation in annotations]
+    return transcript_segments(Transcript(read_transcript(filename)))
+
+
+def sweep(segments, minimum=MIN_OVERLAP):
+    """Sweeps the segments of a recording in order of beginning.
+
+    Returns the overlaps by pair of speakers ({(speaker_a, speaker_b): [count, milliseconds]})
+    and the transitions, as the list of speaker changes (from, to), the array of their indexes
+    and the array of the offsets in milliseconds (see FileStats)."""
+
+    segments = sorted((segment for segment in segments if segment.label != NOISE_LABEL),
+                      key=lambda segment: segment.start)
+    overlaps = {}
+    pairs = []
+    pair_codes = {}
+    codes = array("i")
+    offsets = array("q")
+    #Segments still going on: (ending, order, label).
+    active = []
+    previous = None
+    for order, segment in enumerate(segments):
+        while active and active[0][0] <= segment.start + minimum:
+            heapq.heappop(active)
+        for end, other_order, label in active:
+            if label == segment.label:
+                continue
+            duration = min(end, segment.end) - segment.start
+            if duration > minimum:
+                pair = (label, segment.label) if label < segment.label else (segment.label, label)
+                total = overlaps.setdefault(pair, [0, 0])
+                total[0] += 1
+                total[1] += duration
+        heapq.heappush(active, (segment.end, order, segment.label))
+        if previous is not None and previous.label != segment.label:
+            pair = (previous.label, segment.label)
+            code = pair_codes.get(pair)
+            if code is None:
+                code = pair_codes[pair] = len(pairs)
+                pairs.append(pair)
+            codes.append(code)
+            offsets.append(segment.start - previous.end)
+        previous = segment
+    return overlaps, pairs, codes, offsets
+
+
+def file_statistics(filename):
+    """Computes the statistics of one recording and returns a FileStats instead of raising errors."""
+
+    try:
+        segments = read_segments(filename)
+        overlaps, pairs, codes, offsets = sweep(segments)
+    except Exception as error:
+        return FileStats(filename, 0, {}, [], array("i"), array("q"), type(error).__name__ + ": " + str(error))
+    return FileStats(filename, len(segments), overlaps, pairs, codes, offsets, None)
+
+
+def corpus_statistics(filenames, jobs=None):
+    """Computes the statistics of the recordings in parallel.
+
+    jobs is the number of worker processes (by default the number of processor cores);
+    with jobs=1 the recordings are read one after the other in the current process.
+    Returns the list of FileStats, in the order of the files."""
+
+    return batch.parallel_map(file_statistics, filenames, jobs=jobs)
+
+
+def percentile(values, q):
+    """Returns the q-th percentile of a sorted list of values, interpolated as numpy.percentile() does."""
+
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def distribution(offsets):
+    """Summarizes offsets in milliseconds (array or list): number, gaps, overlaps, mean, minimum,
+    PERCENTILES and maximum, the times in seconds."""
+
+    if len(offsets) == 0:
+        return [0, 0, 0] + [None] * (len(PERCENTILES) + 3)
+    if numpy is not None:
+        values = numpy.asarray(offsets, dtype=numpy.int64)
+        gaps = int(numpy.count_nonzero(values > 0))
+        overlaps = int(numpy.count_nonzero(values < 0))
+        times = ([float(values.mean()), float(values.min())]
+                 + [float(value) for value in numpy.percentile(values, PERCENTILES)] + [float(values.max())])
+    else:
+        values = sorted(offsets)
+        gaps = sum(1 for value in values if value > 0)
+        overlaps = sum(1 for value in values if value < 0)
+        times = ([sum(values) / len(values), values[0]] + [percentile(values, q) for q in PERCENTILES]
+                 + [values[-1]])
+    return [len(offsets), gaps, overlaps] + [round(time / 1000, 3) for time in times]
+
+
+def grouped_offsets(codes, offsets, count):
+    """Splits the offsets of the transitions by index of speaker change (count indexes).
+
+    Returns a list of arrays (or lists), one per index."""
+
+    if numpy is not None:
+        codes = numpy.asarray(codes, dtype=numpy.int64)
+        values = numpy.asarray(offsets, dtype=numpy.int64)
+        order = numpy.argsort(codes, kind="stable")
+        bounds = numpy.searchsorted(codes[order], numpy.arange(1, count))
+        return numpy.split(values[order], bounds)
+    groups = [[] for i in range(count)]
+    for code, offset in zip(codes, offsets):
+        groups[code].append(offset)
+    return groups
+
+
+def overlap_row(file, pair, total):
+    """Returns a row of the overlaps table."""
+
+    count, milliseconds = total
+    mean = round(milliseconds / count / 1000, 3) if count else None
+    return [file, pair[0], pair[1], count, round(milliseconds / 1000, 3), mean]
+
+
+def tables(results):
+    """Builds the overlaps and transitions tables (lists of rows) from the FileStats of the recordings."""
+
+    overlap_rows = []
+    transition_rows = []
+    corpus_total = [0, 0]
+    corpus_offsets = []
+    for result in results:
+        if result.error is not None:
+            continue
+        file_total = [0, 0]
+        for pair in sorted(result.overlaps):
+            total = result.overlaps[pair]
+            overlap_rows.append(overlap_row(result.file, pair, total))
+            file_total[0] += total[0]
+            file_total[1] += total[1]
+        overlap_rows.append(overlap_row(result.file, (ALL, ALL), file_total))
+        corpus_total[0] += file_total[0]
+        corpus_total[1] += file_total[1]
+        groups = grouped_offsets(result.codes, result.offsets, len(result.pairs))
+        for code in sorted(range(len(result.pairs)), key=lambda code: result.pairs[code]):
+            transition_rows.append([result.file, result.pairs[code][0], result.pairs[code][1]]
+                                   + distribution(groups[code]))
+        transition_rows.append([result.file, ALL, ALL] + distribution(result.offsets))
+        corpus_offsets.append(result.offsets)
+    overlap_rows.append(overlap_row(ALL, (ALL, ALL), corpus_total))
+    if numpy is not None and corpus_offsets:
+        offsets = numpy.concatenate([numpy.asarray(offsets, dtype=numpy.int64) for offsets in corpus_offsets])
+    else:
+        offsets = array("q")
+        for file_offsets in corpus_offsets:
+            offsets.extend(file_offsets)
+    transition_rows.append([ALL, ALL, ALL] + distribution(offsets))
+    return overlap_rows, transition_rows
+
+
+def save_csv(filename, columns, rows):
+    """Saves a table to a new CSV file (an existing file is never overwritten)."""
+
+    with open(filename, "x", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(rows)
+
+
+def table_names(output, format="csv"):
+    """Returns the names of the files in which the tables are saved."""
+
+    if format == "json":
+        return [output + ".json"]
+    return [output + "_overlaps.csv", output + "_transitions.csv"]
+
+
+def save_tables(output, results, format="csv"):
+    """Saves the overlaps and transitions tables of the recordings, as two CSV files or one JSON file.
+
+    Returns the list of files saved."""
+
+    overlap_rows, transition_rows = tables(results)
+    names = table_names(output, format)
+    if format == "json":
+        filename = names[0]
+        record = {"overlaps": [dict(zip(OVERLAP_COLUMNS, row)) for row in overlap_rows],
+                  "transitions": [dict(zip(TRANSITION_COLUMNS, row)) for row in transition_rows],
+                  "failed": [{"file": result.file, "error": result.error} for result in results
+                             if result.error is not None]}
+        with open(filename, "x", encoding="utf-8") as f:
+            json.dump(record, f, indent=1, ensure_ascii=False)
+            f.write("\n")
+        return names
+    save_csv(names[0], OVERLAP_COLUMNS, overlap_rows)
+    save_csv(names[1], TRANSITION_COLUMNS, transition_rows)
+    return names
+
+
+def main(argv=None):
+    """Computes the statistics of a corpus from the command line."""
+
+    parser = argparse.ArgumentParser(prog="python -m TIGRformat overlapstats",
+                                     description="Compute overlap and turn-transition statistics of a corpus.")
+    parser.add_argument("paths", nargs="+", help="directories, glob patterns or transcript files exported from ELAN")
+    parser.add_argument("--eaf", action="store_true",
+                        help="read the ELAN documents (.eaf) of the directories instead of exported transcripts")
+    parser.add_argument("-o", "--output", default="overlap_stats",
+                        help="name of the saved files, without extension (default: overlap_stats)")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv",
+                        help="two CSV files (_overlaps.csv, _transitions.csv) or one JSON file (default: csv)")
+    parser.add_argument("-j", "--jobs", type=int, help="number of worker processes (default: number of processor cores)")
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    for filename in table_names(args.output, args.format):
+        if os.path.exists(filename):
+            parser.error(filename + " already exists")
+
+    filenames = batch.find_transcripts(args.paths, ".eaf" if args.eaf else ".txt")
+    if not filenames:
+        parser.error("no transcript found")
+    results = corpus_statistics(filenames, args.jobs)
+    for result in results:
+        if result.error is not None:
+            print("FAILED ", result.file, ":", result.error)
+    for filename in save_tables(args.output, results, args.format):
+        print("File saved as", filename)
+    if any(result.error is not None for result in results):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
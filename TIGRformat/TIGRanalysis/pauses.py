@@ -0,0 +1,424 @@
+#Pauses and speech rate of the speakers of processed transcripts
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#transcript files processed by TIGRtimecode.timecode_at_intervals and possibly by the following steps
+#(suppression of repeated labels, concatenation, manual corrections, numbering of lines).
+#OUTPUT:
+#three tables, saved as CSV files (appending "_pauses.csv", "_rates.csv" and "_profiles.csv" to the output name)
+#or together as one JSON file (appending ".json"):
+#- pauses: every pause "(X.XX)" with its line, duration, speaker, position ("turn" within an etic turn,
+#  "transition" before a change of speaker, "end" at the end of the transcript) and the next speaker;
+#- rates: for each stretch of the transcript between two timecodes, the number of words, the duration,
+#  the words per second and the speaker ("*" if several speakers talk in the stretch);
+#- profiles: for each transcript and speaker, the number of words, the words per second in the stretches
+#  where the speaker talks alone, and the distribution of the speaker's pauses (in turn and at transitions).
+#The rows of each transcript with the speaker "*" sum up all speakers, the rows of the file "*" the whole corpus.
+
+#EXPLANATION:
+#Pauses are attributed to the last person speaking, as in TIGRlayout.suppress_repeated_labels:
+#the etic turn of a speaker only ends with the label of another speaker (see the definition of "etic turn" there),
+#AMBIENT_NOISES included.
+#A pause is within the turn if the same speaker goes on talking after it, at a transition if the next line with
+#a label belongs to another speaker.
+#The timecodes are the anchors of the speech rate: a timecode mark "((TC))" is the position in the text of the time
+#given by the following "--TIMECODE--" line (as in TIGRtimecode.time_index). Words are the tokens of the transcribed
+#discourse containing a letter or digit; pauses, timecode marks, comments in double round brackets "(( ))"
+#and arrows "-->" are not words. The reading stops at the statement about the timecode interval added at the end
+#of the transcript by timecode_at_intervals.
+#Lines are numbered as TIGRlayout.number_lines numbers them (from 1 after the "----Transcript----" title),
+#whether the transcript is already numbered or not.
+#The transcript is read once; the pauses and stretches are stored in typed arrays (see TranscriptProfile) and
+#summarized with NumPy if it is installed, so that the tables can be computed again after each round of corrections.
+#The transcripts are read in parallel by as many worker processes as there are processor cores (option --jobs).
+#Usage:
+#python -m TIGRformat pauses TRANSCRIPT_tcfltrd_nolbls.txt [...] -o pause_profiles [--format csv|json]
+
+import argparse
+import json
+import os
+import re
+from array import array
+from collections import namedtuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from ..batch import parallel_map
+from ..pipeline import read_transcript
+from ..transcript import Transcript, LABEL, TIMECODE
+from ..TIGRlayout.number_lines import remove_line_numbers, transcript_start
+from ..TIGRtimecode.timecode_at_intervals import STATEMENT
+from .overlap_stats import ALL, percentile, save_csv
+
+#Position of a pause in the etic turns.
+IN_TURN = 0
+TRANSITION = 1
+END = 2
+POSITIONS = ["turn", "transition", "end"]
+
+#Tokens of the transcribed discourse, in the order of the text: pause, timecode mark, comment, other token.
+TOKEN_PATTERN = re.compile(r"(\(\d+\.\d+\))|(\(\(TC\)\))|\(\([^)]*\)\)|([^\s(]+)")
+WORD_PATTERN = re.compile(r"\w")
+#Words of a line without round brackets, found at once.
+WORDS_PATTERN = re.compile(r"\S*\w\S*")
+
+PAUSE_COLUMNS = ["file", "line", "seconds", "speaker", "position", "next_speaker"]
+RATE_COLUMNS = ["file", "start_line", "end_line", "start_ms", "end_ms", "speaker", "words", "pause_seconds",
+                "words_per_second"]
+PROFILE_COLUMNS = ["file", "speaker", "words", "timed_words", "timed_seconds", "words_per_second", "pauses",
+                   "pauses_in_turn", "pauses_at_transition", "pause_seconds", "mean_pause", "median_pause",
+                   "p90_pause", "max_pause"]
+
+#Profile of one transcript, as returned by the worker processes (error is None if successful).
+Result = namedtuple("Result", ["file", "profile", "error"])
+
+
+class TranscriptProfile:
+    """Pauses, words and timed stretches of a transcript, stored in parallel arrays.
+
+        Lines are numbered as by TIGRlayout.number_lines (from 1 after the ----Transcript---- title and its blank line).
+        Speakers are stored by number (speaker_names). Pauses: line, duration in seconds,
+        speaker, position (IN_TURN, TRANSITION or END) and next speaker (-1 if none).
+        Stretches between two timecodes: first and last line, times in milliseconds, words, seconds of pause,
+        speaker (-1 if several speakers talk)."""
+
+    __slots__ = ("speaker_names", "speaker_ids", "words",
+                 "pause_lines", "pause_seconds", "pause_speakers", "pause_positions", "pause_next",
+                 "stretch_first", "stretch_last", "stretch_starts", "stretch_ends", "stretch_words",
+                 "stretch_pauses", "stretch_speakers", "stretch_speaker_words")
+
+    def __init__(self):
+        self.speaker_names = []
+        self.speaker_ids = {}
+        self.words = array("q")
+        self.pause_lines = array("i")
+        self.pause_seconds = array("d")
+        self.pause_speakers = array("i")
+        self.pause_positions = array("b")
+        self.pause_next = array("i")
+        self.stretch_first = array("i")
+        self.stretch_last = array("i")
+        self.stretch_starts = array("q")
+        self.stretch_ends = array("q")
+        self.stretch_words = array("q")
+        self.stretch_pauses = array("d")
+        self.stretch_speakers = array("i")
+        self.stretch_speaker_words = array("q")
+
+    def intern(self, name):
+        """Returns the number of a speaker, assigning a new number to speakers not seen before."""
+
+        speaker = self.speaker_ids.get(name)
+        if speaker is None:
+            speaker = len(self.speaker_names)
+            self.speaker_ids[name] = speaker
+            self.speaker_names.append(name)
+            self.words.append(0)
+        return speaker
+
+
+class Anchor:
+    """Position of a timecode in the text: line, words and seconds of pause counted so far, and words of each speaker."""
+
+    __slots__ = ("line", "words", "pauses", "speaker_words")
+
+    def __init__(self, line, words, pauses, speaker_words):
+        self.line = line
+        self.words = words
+        self.pauses = pauses
+        self.speaker_words = speaker_words
+
+
+def add_stretch(profile, start, end, time_start, time_end):
+    """Adds the stretch between two anchors with their times (in milliseconds) to the profile."""
+
+    speakers = [speaker for speaker in range(len(end.speaker_words))
+                if end.speaker_words[speaker] > (start.speaker_words[speaker] if speaker < len(start.speaker_words) else 0)]
+    profile.stretch_first.append(start.line)
+    profile.stretch_last.append(end.line)
+    profile.stretch_starts.append(time_start)
+    profile.stretch_ends.append(time_end)
+    profile.stretch_words.append(end.words - start.words)
+    profile.stretch_pauses.append(end.pauses - start.pauses)
+    profile.stretch_speakers.append(speakers[0] if len(speakers) == 1 else -1)
+    profile.stretch_speaker_words.append(end.words - start.words if len(speakers) == 1 else 0)
+
+
+def profile_transcript(content):
+    """Extracts the pauses, words and timed stretches of a processed transcript.
+
+    The document must be opened as a list of lines (file.readlines()); line numbers are ignored.
+    Returns a TranscriptProfile."""
+
+    content = remove_line_numbers(content)
+    first = transcript_start(content) or 0
+    transcript = Transcript(content)
+    text_column = transcript.text_column or 0
+    kinds = transcript.kinds
+    profile = TranscriptProfile()
+
+    speaker = -1
+    words = 0
+    pauses = 0.0
+    #Pauses whose position is not known yet (indexes in the arrays of the profile).
+    pending = []
+    #Latest timecode mark not yet followed by its "--TIMECODE--" line, and latest anchor with its time.
+    mark = None
+    previous = None
+    for i in range(first, len(content)):
+        kind = kinds[i]
+        line = content[i]
+        #Number of the line as written by TIGRlayout.number_lines.
+        number = i - first + 1
+        if line.startswith(STATEMENT):
+            break
+        if kind == TIMECODE:
+            if transcript.times[i] < 0:
+                continue
+            if mark is None:
+                mark = Anchor(number, words, pauses, list(profile.words))
+            if previous is not None and transcript.times[i] > previous[1]:
+                add_stretch(profile, previous[0], mark, previous[1], transcript.times[i])
+            previous = (mark, transcript.times[i])
+            mark = None
+            continue
+        if kind == LABEL:
+            name = transcript.speaker(i)
+            new = profile.intern(name)
+            for pause in pending:
+                profile.pause_positions[pause] = IN_TURN if new == speaker else TRANSITION
+                profile.pause_next[pause] = new
+            pending = []
+            speaker = new
+            line = line[text_column:]
+        if "(" not in line:
+            #No pause, timecode mark or comment: only words.
+            count = len(WORDS_PATTERN.findall(line)) if speaker >= 0 else 0
+            if count:
+                words += count
+                profile.words[speaker] += count
+                for pause in pending:
+                    profile.pause_positions[pause] = IN_TURN
+                    profile.pause_next[pause] = speaker
+                pending = []
+            continue
+        for token in TOKEN_PATTERN.finditer(line):
+            pause, timecode_mark, word = token.groups()
+            if pause is not None:
+                seconds = float(pause[1:-1])
+                pending.append(len(profile.pause_lines))
+                profile.pause_lines.append(number)
+                profile.pause_seconds.append(seconds)
+                profile.pause_speakers.append(speaker)
+                profile.pause_positions.append(END)
+                profile.pause_next.append(-1)
+                pauses += seconds
+            elif timecode_mark is not None:
+                mark = Anchor(number, words, pauses, list(profile.words))
+            elif word is not None and WORD_PATTERN.search(word) and speaker >= 0:
+                words += 1
+                profile.words[speaker] += 1
+                for pause in pending:
+                    profile.pause_positions[pause] = IN_TURN
+                    profile.pause_next[pause] = speaker
+                pending = []
+    return profile
+
+
+def pause_summary(seconds):
+    """Summarizes durations of pauses in seconds: mean, median, 90th percentile and maximum (None if there is none)."""
+
+    if len(seconds) == 0:
+        return [None] * 4
+    if numpy is not None:
+        values = numpy.asarray(seconds, dtype=numpy.float64)
+        median, p90 = numpy.percentile(values, [50, 90])
+        summary = [values.mean(), median, p90, values.max()]
+    else:
+        values = sorted(seconds)
+        summary = [sum(values) / len(values), percentile(values, 50), percentile(values, 90), values[-1]]
+    return [round(float(value), 3) for value in summary]
+
+
+def select(values, mask):
+    """Returns the values (array) whose mask is True, with NumPy if it is installed."""
+
+    if numpy is not None:
+        return numpy.asarray(values)[mask]
+    return [value for value, keep in zip(values, mask) if keep]
+
+
+def profile_row(file, speaker, words, timed_words, timed_seconds, seconds, positions):
+    """Returns a row of the profiles table."""
+
+    rate = round(timed_words / timed_seconds, 3) if timed_seconds > 0 else None
+    in_turn = sum(1 for position in positions if position == IN_TURN)
+    transition = sum(1 for position in positions if position == TRANSITION)
+    return ([file, speaker, words, timed_words, round(timed_seconds, 3), rate, len(seconds), in_turn, transition,
+             round(float(sum(seconds)), 3)] + pause_summary(seconds))
+
+
+def profile_rows(file, profile):
+    """Returns the rows of the profiles table of one transcript: one per speaker and one for all speakers ("*")."""
+
+    rows = []
+    if numpy is not None:
+        pause_speakers = numpy.asarray(profile.pause_speakers)
+        stretch_speakers = numpy.asarray(profile.stretch_speakers)
+        durations = (numpy.asarray(profile.stretch_ends) - numpy.asarray(profile.stretch_starts)) / 1000
+    else:
+        pause_speakers = profile.pause_speakers
+        stretch_speakers = profile.stretch_speakers
+        durations = [(end - start) / 1000 for start, end in zip(profile.stretch_starts, profile.stretch_ends)]
+    for speaker in sorted(range(len(profile.speaker_names)), key=lambda speaker: profile.speaker_names[speaker]):
+        if numpy is not None:
+            pauses = pause_speakers == speaker
+            alone = stretch_speakers == speaker
+        else:
+            pauses = [value == speaker for value in pause_speakers]
+            alone = [value == speaker for value in stretch_speakers]
+        rows.append(profile_row(file, profile.speaker_names[speaker], profile.words[speaker],
+                                int(sum(select(profile.stretch_speaker_words, alone))),
+                                float(sum(select(durations, alone))),
+                                select(profile.pause_seconds, pauses), select(profile.pause_positions, pauses)))
+    rows.append(profile_row(file, ALL, sum(profile.words), int(sum(profile.stretch_words)), float(sum(durations)),
+                            profile.pause_seconds, profile.pause_positions))
+    return rows
+
+
+def transcript_tables(file, profile):
+    """Returns the rows of the pauses, rates and profiles tables of one transcript."""
+
+    #Speaker -1 (no speaker before the first label, no next speaker) is written as an empty string.
+    names = profile.speaker_names + [""]
+    pause_rows = []
+    for k in range(len(profile.pause_lines)):
+        pause_rows.append([file, profile.pause_lines[k], profile.pause_seconds[k], names[profile.pause_speakers[k]],
+                           POSITIONS[profile.pause_positions[k]], names[profile.pause_next[k]]])
+    rate_rows = []
+    for k in range(len(profile.stretch_first)):
+        seconds = (profile.stretch_ends[k] - profile.stretch_starts[k]) / 1000
+        speaker = profile.stretch_speakers[k]
+        rate_rows.append([file, profile.stretch_first[k], profile.stretch_last[k], profile.stretch_starts[k],
+                          profile.stretch_ends[k], profile.speaker_names[speaker] if speaker >= 0 else ALL,
+                          profile.stretch_words[k], round(profile.stretch_pauses[k], 2),
+                          round(profile.stretch_words[k] / seconds, 3)])
+    return pause_rows, rate_rows, profile_rows(file, profile)
+
+
+def file_profile(filename):
+    """Profiles one transcript and returns a Result instead of raising errors."""
+
+    try:
+        profile = profile_transcript(read_transcript(filename))
+    except Exception as error:
+        return Result(filename, None, type(error).__name__ + ": " + str(error))
+    return Result(filename, profile, None)
+
+
+def corpus_profiles(filenames, jobs=None):
+    """Profiles the transcripts in parallel.
+
+    jobs is the number of worker processes (by default the number of processor cores);
+    with jobs=1 the transcripts are read one after the other in the current process.
+    Returns the list of Result tuples, in the order of the files."""
+
+    return parallel_map(file_profile, filenames, jobs=jobs)
+
+
+def tables(results):
+    """Builds the pauses, rates and profiles tables (lists of rows) from the Result tuples of the transcripts."""
+
+    pause_table = []
+    rate_table = []
+    profile_table = []
+    corpus = [0, 0, 0.0]
+    seconds = array("d")
+    positions = array("b")
+    for result in results:
+        if result.error is not None:
+            continue
+        pauses, rates, profiles = transcript_tables(result.file, result.profile)
+        pause_table.extend(pauses)
+        rate_table.extend(rates)
+        profile_table.extend(profiles)
+        total = profiles[-1]
+        corpus[0] += total[2]
+        corpus[1] += total[3]
+        corpus[2] += total[4]
+        seconds.extend(result.profile.pause_seconds)
+        positions.extend(result.profile.pause_positions)
+    profile_table.append(profile_row(ALL, ALL, corpus[0], corpus[1], corpus[2], seconds, positions))
+    return pause_table, rate_table, profile_table
+
+
+def table_names(output, format="csv"):
+    """Returns the names of the files in which the tables are saved."""
+
+    if format == "json":
+        return [output + ".json"]
+    return [output + "_pauses.csv", output + "_rates.csv", output + "_profiles.csv"]
+
+
+def save_tables(output, results, format="csv"):
+    """Saves the pauses, rates and profiles tables of the transcripts, as three CSV files or one JSON file.
+
+    Returns the list of files saved."""
+
+    pause_table, rate_table, profile_table = tables(results)
+    names = table_names(output, format)
+    if format == "json":
+        record = {"pauses": [dict(zip(PAUSE_COLUMNS, row)) for row in pause_table],
+                  "rates": [dict(zip(RATE_COLUMNS, row)) for row in rate_table],
+                  "profiles": [dict(zip(PROFILE_COLUMNS, row)) for row in profile_table],
+                  "failed": [{"file": result.file, "error": result.error} for result in results
+                             if result.error is not None]}
+        with open(names[0], "x", encoding="utf-8") as f:
+            json.dump(record, f, indent=1, ensure_ascii=False)
+            f.write("\n")
+        return names
+    save_csv(names[0], PAUSE_COLUMNS, pause_table)
+    save_csv(names[1], RATE_COLUMNS, rate_table)
+    save_csv(names[2], PROFILE_COLUMNS, profile_table)
+    return names
+
+
+def main(argv=None):
+    """Computes the pause and speech-rate profiles of transcripts from the command line."""
+
+    parser = argparse.ArgumentParser(prog="python -m TIGRformat pauses",
+                                     description="Extract the pauses of processed transcripts and compute the pause "
+                                                 "and speech-rate profiles of the speakers.")
+    parser.add_argument("transcripts", nargs="+", help="transcript files processed by tcfilter (and following steps)")
+    parser.add_argument("-o", "--output", default="pause_profiles",
+                        help="name of the saved files, without extension (default: pause_profiles)")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv",
+                        help="three CSV files (_pauses.csv, _rates.csv, _profiles.csv) or one JSON file (default: csv)")
+    parser.add_argument("-j", "--jobs", type=int, help="number of worker processes (default: number of processor cores)")
+    args = parser.parse_args(argv)
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    for filename in table_names(args.output, args.format):
+        if os.path.exists(filename):
+            parser.error(filename + " already exists")
+
+    results = corpus_profiles(args.transcripts, args.jobs)
+    for result in results:
+        if result.error is not None:
+            print("FAILED ", result.file, ":", result.error)
+    for filename in save_tables(args.output, results, args.format):
+        print("File saved as", filename)
+    if any(result.error is not None for result in results):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
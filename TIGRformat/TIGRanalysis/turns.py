@@ -0,0 +1,424 @@
+#Table of the etic turns of processed transcripts
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#transcript files processed by TIGRtimecode.timecode_at_intervals and possibly by the following steps
+#(suppression of repeated labels, concatenation, manual corrections, numbering of lines).
+#OUTPUT:
+#a table with one row per etic turn, saved in one of the following formats:
+#- "columns" (default): a folder with one binary file per column (typed array) and a description "columns.json",
+#  read back by read_columns() (e.g. pandas.DataFrame(read_columns("turns"))) without parsing any text;
+#- "csv": a CSV file with a header;
+#- "parquet": a Parquet file, if the pyarrow package is installed ("pip install pyarrow").
+#Columns:
+#- file, speaker: name of the transcript file and speaker label;
+#- first_line, last_line: first and last line of the turn, as numbered by TIGRlayout.number_lines
+#  (from 1 after the "----Transcript----" title and its blank line);
+#- ms, anchored: time of the first timecode mark "((TC))" in the turn, in milliseconds (anchored = 1),
+#  or, if the turn has none, time of the last timecode before the turn (anchored = 0; -1 if there is none);
+#- tokens: number of words (see TIGRanalysis.pauses);
+#- pauses, pause_seconds: number and total duration of the pauses "(X.XX)" attributed to the turn;
+#- starts_in_overlap: 1 if the turn starts with a square bracket, overlaps: 1 if it contains a square bracket.
+
+#EXPLANATION:
+#An etic turn is defined in TIGRlayout.suppress_repeated_labels: a stretch of talk by the same speaker that only ends
+#with the label of another speaker (pauses are attributed to the last person speaking).
+#In the processed transcripts, etic turns are only implicit (repeated labels are suppressed): iter_turns() reads
+#a transcript line by line and yields one Turn per etic turn, so that analyses need not parse the formatted text again.
+#A turn is yielded as soon as the next one starts, unless its timecode mark still waits for its "--TIMECODE--" line.
+#In the table, speakers and files are stored as numbers referring to the list of their names
+#(dictionary encoding), the other columns as integers or floating-point numbers of fixed size.
+#Usage:
+#python -m TIGRformat turns corpus/*_concat.txt -o turns [--format columns|csv|parquet]
+
+import argparse
+import csv
+import json
+import os
+import sys
+from array import array
+from collections import deque, namedtuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from ..pipeline import read_transcript
+from ..transcript import classify_line, text_column_ahead, EMPTY, LABEL, TIMECODE
+from ..TIGRlayout.number_lines import remove_line_numbers
+from ..TIGRtimecode.overlap import label_of
+from .pauses import STATEMENT, TOKEN_PATTERN, WORD_PATTERN, WORDS_PATTERN
+
+#An etic turn (see the columns above).
+Turn = namedtuple("Turn", ["speaker", "first_line", "last_line", "ms", "anchored", "tokens", "pauses", "pause_seconds",
+                           "starts_in_overlap", "overlaps"])
+
+#Columns of the table and type code of their arrays (see the array module).
+COLUMNS = [("file", "i"), ("speaker", "i"), ("first_line", "i"), ("last_line", "i"), ("ms", "q"), ("anchored", "b"),
+           ("tokens", "i"), ("pauses", "i"), ("pause_seconds", "d"), ("starts_in_overlap", "b"), ("overlaps", "b")]
+#Columns stored as numbers referring to a list of names.
+CATEGORIES = ["file", "speaker"]
+#Columns holding 0 or 1.
+FLAGS = ["anchored", "starts_in_overlap", "overlaps"]
+FORMATS = ["columns", "csv", "parquet"]
+#Description of the columns in the folder of the "columns" format.
+DESCRIPTION = "columns.json"
+
+
+class OpenTurn:
+    """Etic turn being read: counts so far, and whether its timecode mark waits for its "--TIMECODE--" line."""
+
+    __slots__ = ("speaker", "first", "last", "ms", "preceding", "tokens", "pauses", "seconds", "started",
+                 "starts_in_overlap", "overlaps", "waiting")
+
+    def __init__(self, speaker, first, preceding):
+        self.speaker = speaker
+        self.first = first
+        self.last = first
+        self.ms = None
+        self.preceding = preceding
+        self.tokens = 0
+        self.pauses = 0
+        self.seconds = 0.0
+        self.started = False
+        self.starts_in_overlap = False
+        self.overlaps = False
+        self.waiting = False
+
+    def turn(self):
+        """Returns the Turn tuple of the turn."""
+
+        anchored = self.ms is not None
+        return Turn(self.speaker, self.first, self.last, self.ms if anchored else self.preceding, anchored,
+                    self.tokens, self.pauses, round(self.seconds, 2), self.starts_in_overlap, self.overlaps)
+
+
+def skip_header(lines):
+    """Skips the lines up to the ----Transcript---- title and its blank line, if the title is found before the first
+    timecode mark or timecode line.
+
+    Returns an iterator over the remaining lines, the first of which is line 1 of TIGRlayout.number_lines."""
+
+    lines = iter(lines)
+    ahead = []
+    for line in lines:
+        ahead.append(line)
+        if "----Transcript----" in line:
+            next(lines, None)
+            return lines
+        if "TC" in line:
+            break
+    return chain_lines(ahead, lines)
+
+
+def chain_lines(ahead, lines):
+    """Yields the lines read ahead, then the remaining lines."""
+
+    yield from ahead
+    yield from lines
+
+
+def release(waiting):
+    """Yields the Turn tuples of the finished turns, in order, up to the first one still waiting for its timecode."""
+
+    while waiting and not waiting[0].waiting:
+        yield waiting.popleft().turn()
+
+
+def iter_turns(lines):
+    """Yields the etic turns of a processed transcript read line by line, as Turn tuples.
+
+    lines is any iterable of lines without line numbers, e.g. an open file (see turns() for numbered transcripts).
+    Only the current turn and the turns waiting for the time of their timecode mark are kept."""
+
+    lines = skip_header(lines)
+    text_column, lines = text_column_ahead(lines)
+    current = None
+    waiting = deque()
+    #Turn whose latest timecode mark waits for its "--TIMECODE--" line, and latest time seen.
+    marked = None
+    latest = -1
+    for number, line in enumerate(lines, 1):
+        if line.startswith(STATEMENT):
+            break
+        kind, flags, field, offset, time = classify_line(line, text_column)
+        if kind == EMPTY or not line.strip():
+            continue
+        if kind == TIMECODE:
+            if time >= 0:
+                #As in TIGRtimecode.time_index, the timecode line belongs to the latest timecode mark.
+                if marked is not None:
+                    if marked.ms is None:
+                        marked.ms = time
+                    marked.waiting = False
+                    marked = None
+                latest = time
+                yield from release(waiting)
+            if current is not None:
+                current.last = number
+            continue
+        text = line
+        if kind == LABEL:
+            #The first word of the label, even if the text column is misplaced (first timecode mark within a line).
+            speaker = label_of(line)
+            if current is None or speaker != current.speaker:
+                if current is not None:
+                    waiting.append(current)
+                    yield from release(waiting)
+                current = OpenTurn(speaker, number, latest)
+            #Without timecodes, the position of the text is unknown: it follows the label.
+            text = line[len(speaker):] if text_column is None else line[text_column:]
+        if current is None:
+            continue
+        current.last = number
+        if "[" in text:
+            current.overlaps = True
+        if "(" not in text:
+            #No pause, timecode mark or comment: only words.
+            if not current.started:
+                first = text.split(None, 1)
+                if first:
+                    current.started = True
+                    current.starts_in_overlap = first[0].startswith("[")
+            current.tokens += len(WORDS_PATTERN.findall(text))
+            continue
+        for token in TOKEN_PATTERN.finditer(text):
+            pause, timecode_mark, word = token.groups()
+            if pause is not None:
+                current.pauses += 1
+                current.seconds += float(pause[1:-1])
+            elif timecode_mark is not None:
+                #An earlier mark that has not received its timecode line never will.
+                if marked is not None:
+                    marked.waiting = False
+                    yield from release(waiting)
+                marked = current
+                current.waiting = current.ms is None
+            elif word is not None:
+                if not current.started:
+                    current.started = True
+                    current.starts_in_overlap = word.startswith("[")
+                if WORD_PATTERN.search(word):
+                    current.tokens += 1
+    if current is not None:
+        waiting.append(current)
+    for turn in waiting:
+        turn.waiting = False
+    yield from release(waiting)
+
+
+def turns(content):
+    """Returns the etic turns of a processed transcript opened as a list of lines (file.readlines()), numbered or not."""
+
+    return list(iter_turns(remove_line_numbers(content)))
+
+
+class TurnTable:
+    """Etic turns of one or more transcripts, stored column by column in typed arrays (see COLUMNS).
+
+        The names of the files and speakers are listed in categories; their columns hold the position in the list."""
+
+    __slots__ = ("columns", "categories", "codes")
+
+    def __init__(self):
+        self.columns = {name: array(typecode) for name, typecode in COLUMNS}
+        self.categories = {name: [] for name in CATEGORIES}
+        self.codes = {name: {} for name in CATEGORIES}
+
+    def __len__(self):
+        return len(self.columns["file"])
+
+    def code(self, name, value):
+        """Returns the number of a file or speaker name, assigning a new number to names not seen before."""
+
+        codes = self.codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.categories[name])
+            self.categories[name].append(value)
+        return code
+
+    def add(self, file, turns):
+        """Adds the Turn tuples of a transcript file."""
+
+        columns = self.columns
+        file = self.code("file", file)
+        for turn in turns:
+            columns["file"].append(file)
+            columns["speaker"].append(self.code("speaker", turn.speaker))
+            columns["first_line"].append(turn.first_line)
+            columns["last_line"].append(turn.last_line)
+            columns["ms"].append(turn.ms)
+            columns["anchored"].append(turn.anchored)
+            columns["tokens"].append(turn.tokens)
+            columns["pauses"].append(turn.pauses)
+            columns["pause_seconds"].append(turn.pause_seconds)
+            columns["starts_in_overlap"].append(turn.starts_in_overlap)
+            columns["overlaps"].append(turn.overlaps)
+
+    def rows(self):
+        """Yields the rows of the table, with the names of the files and speakers."""
+
+        names = [self.categories.get(name) for name, typecode in COLUMNS]
+        for row in zip(*(self.columns[name] for name, typecode in COLUMNS)):
+            yield [value if categories is None else categories[value] for value, categories in zip(row, names)]
+
+
+def table_of(filenames):
+    """Reads the etic turns of transcript files into a TurnTable."""
+
+    table = TurnTable()
+    for filename in filenames:
+        table.add(filename, turns(read_transcript(filename)))
+    return table
+
+
+def write_csv(filename, table):
+    """Saves the table to a new CSV file (an existing file is never overwritten)."""
+
+    with open(filename, "x", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, typecode in COLUMNS])
+        writer.writerows(table.rows())
+
+
+def dtype(typecode):
+    """Returns the NumPy type (e.g. "<i4") of the values of an array with this type code, in the machine's byte order."""
+
+    kind = "f" if typecode == "d" else "i"
+    return ("<" if sys.byteorder == "little" else ">") + kind + str(array(typecode).itemsize)
+
+
+def write_columns(directory, table):
+    """Saves the table to a new folder, one binary file per column and the description of the columns (DESCRIPTION).
+
+    An existing folder is never overwritten."""
+
+    os.makedirs(directory)
+    description = {"rows": len(table), "columns": []}
+    for name, typecode in COLUMNS:
+        column = {"name": name, "file": name + ".bin", "typecode": typecode, "dtype": dtype(typecode)}
+        if name in CATEGORIES:
+            column["categories"] = table.categories[name]
+        description["columns"].append(column)
+        with open(os.path.join(directory, column["file"]), "xb") as f:
+            table.columns[name].tofile(f)
+    with open(os.path.join(directory, DESCRIPTION), "x", encoding="utf-8") as f:
+        json.dump(description, f, indent=1, ensure_ascii=False)
+        f.write("\n")
+
+
+def read_columns(directory):
+    """Opens a table saved by write_columns().
+
+    Returns a dictionary of columns: NumPy arrays if NumPy is installed (file and speaker names as arrays of strings),
+    otherwise arrays of the array module (file and speaker names as lists)."""
+
+    with open(os.path.join(directory, DESCRIPTION), "r", encoding="utf-8") as f:
+        description = json.load(f)
+    columns = {}
+    for column in description["columns"]:
+        path = os.path.join(directory, column["file"])
+        if numpy is not None:
+            values = numpy.fromfile(path, dtype=column["dtype"], count=description["rows"])
+            if "categories" in column:
+                values = numpy.asarray(column["categories"], dtype=object)[values]
+        else:
+            values = array(column["typecode"])
+            with open(path, "rb") as f:
+                values.fromfile(f, description["rows"])
+            if (column["dtype"][0] == "<") != (sys.byteorder == "little"):
+                values.byteswap()
+            if "categories" in column:
+                values = [column["categories"][value] for value in values]
+        columns[column["name"]] = values
+    return columns
+
+
+def arrow_array(values, typecode):
+    """Converts a typed array into a pyarrow array without copying it (Arrow buffers are little-endian)."""
+
+    types = {"b": pyarrow.int8(), "i": pyarrow.int32(), "q": pyarrow.int64(), "d": pyarrow.float64()}
+    if sys.byteorder != "little":
+        values = array(typecode, values)
+        values.byteswap()
+    return pyarrow.Array.from_buffers(types[typecode], len(values), [None, pyarrow.py_buffer(values)])
+
+
+def write_parquet(filename, table):
+    """Saves the table to a new Parquet file (an existing file is never overwritten). Needs the pyarrow package."""
+
+    if pyarrow is None:
+        raise ImportError("Parquet files need the pyarrow package (pip install pyarrow).")
+    if os.path.exists(filename):
+        raise FileExistsError("File exists: " + filename)
+    arrays = {}
+    for name, typecode in COLUMNS:
+        values = arrow_array(table.columns[name], typecode)
+        if name in CATEGORIES:
+            values = pyarrow.DictionaryArray.from_arrays(values, pyarrow.array(table.categories[name],
+                                                                               type=pyarrow.string()))
+        elif name in FLAGS:
+            values = values.cast(pyarrow.bool_())
+        arrays[name] = values
+    pyarrow.parquet.write_table(pyarrow.table(arrays), filename)
+
+
+def output_name(output, format):
+    """Returns the name of the saved table: the folder for "columns", otherwise with the extension of the format."""
+
+    if format == "columns":
+        return output
+    return output + "." + format
+
+
+def save_table(output, table, format="columns"):
+    """Saves the table in one of the FORMATS and returns the name of the saved file or folder."""
+
+    save = output_name(output, format)
+    if format == "columns":
+        write_columns(save, table)
+    elif format == "csv":
+        write_csv(save, table)
+    else:
+        write_parquet(save, table)
+    return save
+
+
+def main(argv=None):
+    """Saves the table of the etic turns of transcripts from the command line."""
+
+    parser = argparse.ArgumentParser(prog="python -m TIGRformat turns",
+                                     description="Save the etic turns of processed transcripts as a table "
+                                                 "for analysis (e.g. with pandas).")
+    parser.add_argument("transcripts", nargs="+", help="transcript files processed by tcfilter (and following steps)")
+    parser.add_argument("-o", "--output", default="turns",
+                        help="name of the saved folder or file, without extension (default: turns)")
+    parser.add_argument("--format", choices=FORMATS, default="columns",
+                        help="one binary file per column in a folder, CSV file, or Parquet file (needs pyarrow) "
+                             "(default: columns)")
+    args = parser.parse_args(argv)
+    if args.format == "parquet" and pyarrow is None:
+        parser.error("the parquet format needs the pyarrow package (pip install pyarrow)")
+    if os.path.exists(output_name(args.output, args.format)):
+        parser.error(output_name(args.output, args.format) + " already exists")
+
+    table = table_of(args.transcripts)
+    print(len(table), "etic turns of", len(table.categories["file"]), "transcripts")
+    print("Saved as", save_table(args.output, table, args.format))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
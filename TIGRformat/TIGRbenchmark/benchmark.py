@@ -0,0 +1,297 @@
+#Benchmark of the scripts on synthetic transcripts of growing length
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#- sizes of the synthetic transcripts in lines (by default 1000, 10000, 100000 and 1000000);
+#- optionally: a baseline file saved by an earlier run (by default baseline.json in this folder).
+#OUTPUT:
+#- a table with the time and the peak memory of each script at each size;
+#- the growth of time and memory from one size to the next, with a warning when it is super-linear;
+#- optionally: the results saved as JSON (report, or new baseline).
+
+#EXPLANATION:
+#Each script is run on the document it receives in the workflow: timecode_at_intervals and check_orphan_brackets
+#on the export generated by TIGRbenchmark.synthetic, suppress_repeated_labels on the filtered transcript,
+#concatenate on the transcript without repeated labels, combicheck and number_lines on the concatenated one.
+#These input documents are prepared before the measurements, which only cover the script itself.
+#The time is the best of several runs for short documents (at least MIN_RUNS runs and MIN_SECONDS seconds).
+#The peak memory is measured in a separate run with tracemalloc (Python allocations made by the script).
+#Growth is expressed as an exponent: when the document is 10 times longer, a script of exponent 1 (linear)
+#takes 10 times longer, a script of exponent 2 (quadratic) 100 times longer.
+#A script is reported when its exponent between two sizes exceeds 1 + TOLERANCE (super-linear),
+#or the exponent of the baseline between the same sizes by more than TOLERANCE (growth worse than before).
+#Measurements shorter than MIN_MEASURE seconds are too imprecise and are not used to compute the growth.
+#Exponents do not depend much on the computer, times do: the time ratio to the baseline is only given for information.
+#Usage:
+#python -m TIGRformat benchmark                                  (all sizes, compared with the stored baseline)
+#python -m TIGRformat benchmark --sizes 1000,10000,100000 -o report.json
+#python -m TIGRformat benchmark --save-baseline                  (replace the stored baseline)
+
+import argparse
+import gc
+import io
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+from . import synthetic
+from ..TIGRtimecode import timecode_at_intervals
+from ..TIGRlayout import suppress_repeated_labels
+from ..TIGRlayout import concatenate
+from ..TIGRlayout import check_orphan_brackets
+from ..TIGRlayout import combicheck
+from ..TIGRlayout import number_lines
+
+SIZES = [1000, 10000, 100000, 1000000]
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+#Interval in seconds used to filter the timecodes.
+INTERVAL = 30
+#Repetition of short measurements.
+MIN_RUNS = 3
+MIN_SECONDS = 0.5
+#Growth exponent tolerated above linear (or above the baseline), and shortest time used to compute it.
+TOLERANCE = 0.25
+MIN_MEASURE = 0.005
+
+#Result of one script at one size. lines is the actual length of the synthetic export.
+Measure = namedtuple("Measure", ["stage", "size", "lines", "seconds", "peak_bytes"])
+
+
+def prepare(size, seed=0):
+    """Generates a synthetic export of size lines and the documents derived from it in the workflow.
+
+        Returns a dictionary of documents opened as lists of lines (export, tcfltrd, nolbls, concat)
+        and the export read as a string (text)."""
+
+    export = list(synthetic.generate(size, seed=seed))
+    tcfltrd = timecode_at_intervals.filter_timecodes(list(export), INTERVAL)
+    tcfltrd.append(timecode_at_intervals.timecode_statement(INTERVAL))
+    tcfltrd = io.StringIO("".join(tcfltrd)).readlines()
+    nolbls = io.StringIO("".join(suppress_repeated_labels.suppress_labels(list(tcfltrd)))).readlines()
+    concat = io.StringIO("".join(concatenate.concatenate(list(nolbls)))).readlines()
+    return {"export": export, "text": "".join(export), "tcfltrd": tcfltrd, "nolbls": nolbls, "concat": concat}
+
+
+#Scripts measured: name, document they receive and function applied to it.
+#Functions receiving a list of lines may modify it: they are given a new copy at each run.
+STAGES = [
+    ("timecode_at_intervals", "export", lambda content: timecode_at_intervals.filter_timecodes(content, INTERVAL)),
+    ("suppress_repeated_labels", "tcfltrd", suppress_repeated_labels.suppress_labels),
+    ("concatenate", "nolbls", concatenate.concatenate),
+    ("check_orphan_brackets", "text", check_orphan_brackets.checkbr),
+    ("combicheck", "concat", combicheck.check),
+    ("number_lines", "concat", number_lines.number_transcript),
+]
+STAGE_NAMES = [name for name, document, function in STAGES]
+
+
+def run_once(function, document):
+    """Runs a function once on a copy of a document and returns the time it took, in seconds."""
+
+    argument = list(document) if isinstance(document, list) else document
+    start = time.perf_counter()
+    function(argument)
+    return time.perf_counter() - start
+
+
+def measure_time(function, document):
+    """Returns the best time of several runs of a function (at least MIN_RUNS runs and MIN_SECONDS seconds),
+        or the time of a single run if it takes longer than MIN_SECONDS."""
+
+    times = [run_once(function, document)]
+    while len(times) < MIN_RUNS and sum(times) < MIN_SECONDS:
+        times.append(run_once(function, document))
+    return min(times)
+
+
+def measure_memory(function, document):
+    """Returns the peak of the memory allocated by Python while a function runs on a copy of a document, in bytes."""
+
+    argument = list(document) if isinstance(document, list) else document
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(argument)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(sizes=SIZES, stages=STAGE_NAMES, seed=0, progress=None):
+    """Measures the scripts on synthetic transcripts of each size.
+
+        progress, if given, is called with each Measure as soon as it is available.
+        Returns the list of Measure tuples."""
+
+    measures = []
+    for size in sizes:
+        documents = prepare(size, seed)
+        for name, document, function in STAGES:
+            if name not in stages:
+                continue
+            seconds = measure_time(function, documents[document])
+            peak = measure_memory(function, documents[document])
+            result = Measure(name, size, len(documents["export"]), seconds, peak)
+            measures.append(result)
+            if progress:
+                progress(result)
+        del documents
+    return measures
+
+
+def exponent(size_1, value_1, size_2, value_2):
+    """Returns the growth exponent between two measures: value grows as size to this power."""
+
+    return math.log(value_2 / value_1) / math.log(size_2 / size_1)
+
+
+def growth(measures, key="seconds", minimum=MIN_MEASURE):
+    """Computes the growth exponents of each script between consecutive sizes.
+
+        key is "seconds" or "peak_bytes". Measures smaller than minimum are not used.
+        Returns a dictionary {(stage, size_1, size_2): exponent}."""
+
+    exponents = {}
+    by_stage = {}
+    for measure in measures:
+        by_stage.setdefault(measure.stage, []).append(measure)
+    for stage, stage_measures in by_stage.items():
+        stage_measures.sort(key=lambda measure: measure.lines)
+        for first, second in zip(stage_measures, stage_measures[1:]):
+            value_1 = getattr(first, key)
+            value_2 = getattr(second, key)
+            if value_1 < minimum or value_2 <= 0 or second.lines <= first.lines:
+                continue
+            exponents[(stage, first.size, second.size)] = exponent(first.lines, value_1, second.lines, value_2)
+    return exponents
+
+
+def find_regressions(measures, baseline=None, tolerance=TOLERANCE):
+    """Lists the super-linear growths of time and memory, and the growths worse than in the baseline.
+
+        baseline is a list of Measure tuples (or None). Returns a list of messages."""
+
+    messages = []
+    for key, what, minimum in (("seconds", "time", MIN_MEASURE), ("peak_bytes", "memory", 1 << 20)):
+        exponents = growth(measures, key, minimum)
+        reference = growth(baseline, key, minimum) if baseline else {}
+        for (stage, size_1, size_2), value in sorted(exponents.items()):
+            if value > 1 + tolerance:
+                messages.append("%s: %s grows super-linearly from %d to %d lines (exponent %.2f)"
+                                % (stage, what, size_1, size_2, value))
+            elif (stage, size_1, size_2) in reference and value > reference[(stage, size_1, size_2)] + tolerance:
+                messages.append("%s: %s grows faster than in the baseline from %d to %d lines (exponent %.2f, baseline %.2f)"
+                                % (stage, what, size_1, size_2, value, reference[(stage, size_1, size_2)]))
+    return messages
+
+
+def print_table(measures, baseline=None, output=None):
+    """Prints the measures with the growth exponent of time and the time ratio to the baseline."""
+
+    output = output or sys.stdout
+    exponents = growth(measures)
+    previous = {}
+    reference = {(measure.stage, measure.size): measure for measure in baseline or []}
+    output.write("%-26s %9s %10s %10s %8s %9s\n" % ("script", "lines", "seconds", "peak MB", "growth", "baseline"))
+    for measure in sorted(measures, key=lambda measure: (STAGE_NAMES.index(measure.stage), measure.size)):
+        key = (measure.stage, previous.get(measure.stage), measure.size)
+        growth_text = "%.2f" % exponents[key] if key in exponents else "-"
+        base = reference.get((measure.stage, measure.size))
+        ratio = "x%.2f" % (measure.seconds / base.seconds) if base and base.seconds > 0 else "-"
+        output.write("%-26s %9d %10.4f %10.1f %8s %9s\n" % (measure.stage, measure.lines, measure.seconds,
+                                                           measure.peak_bytes / 1e6, growth_text, ratio))
+        previous[measure.stage] = measure.size
+
+
+def save_measures(save, measures, overwrite=False):
+    """Saves the measures as JSON, with a description of the computer. A baseline may be overwritten, a report may not."""
+
+    data = {"python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.machine(),
+            "measures": [measure._asdict() for measure in measures]}
+    with open(save, "w" if overwrite else "x", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+        f.write("\n")
+
+
+def load_measures(filename):
+    """Reads the measures saved by save_measures()."""
+
+    with open(filename, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [Measure(**measure) for measure in data["measures"]]
+
+
+def parse_sizes(text):
+    """Converts a comma-separated list of sizes into a sorted list of integers."""
+
+    try:
+        sizes = sorted(set(int(size) for size in text.split(",") if size.strip()))
+    except ValueError:
+        raise argparse.ArgumentTypeError("sizes must be numbers of lines separated by commas")
+    if not sizes or sizes[0] < 1:
+        raise argparse.ArgumentTypeError("sizes must be positive")
+    return sizes
+
+
+def parse_stage_names(text):
+    """Converts a comma-separated list of script names into a list."""
+
+    names = [name.strip() for name in text.split(",") if name.strip()]
+    for name in names:
+        if name not in STAGE_NAMES:
+            raise argparse.ArgumentTypeError("unknown script " + repr(name) + " (choose from " + ", ".join(STAGE_NAMES) + ")")
+    return names
+
+
+def main(argv=None):
+    """Runs the benchmark from the command line. Returns 1 if a super-linear growth is found."""
+
+    parser = argparse.ArgumentParser(prog="python -m TIGRformat benchmark",
+                                     description="Measure the time and memory of the scripts on synthetic transcripts.")
+    parser.add_argument("--sizes", type=parse_sizes, default=SIZES,
+                        help="comma-separated numbers of lines (default: " + ",".join(str(size) for size in SIZES) + ")")
+    parser.add_argument("--scripts", type=parse_stage_names, default=STAGE_NAMES,
+                        help="comma-separated scripts to measure (default: all)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the synthetic transcripts (default: 0)")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline to compare with (default: the stored baseline)")
+    parser.add_argument("--save-baseline", action="store_true", help="save the measures as the new baseline")
+    parser.add_argument("-o", "--output", help="new file to save the measures to (JSON)")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        baseline = load_measures(args.baseline)
+
+    def progress(measure):
+        print("%-26s %9d lines %10.4f s" % (measure.stage, measure.lines, measure.seconds), file=sys.stderr)
+
+    measures = run_benchmark(args.sizes, args.scripts, args.seed, progress)
+    print_table(measures, baseline)
+    messages = find_regressions(measures, baseline)
+    print()
+    for message in messages:
+        print("WARNING", message)
+    if not messages:
+        print("No super-linear growth found.")
+    if args.output:
+        save_measures(args.output, measures)
+    if args.save_baseline:
+        save_measures(args.baseline, measures, overwrite=True)
+        print("Baseline saved as", args.baseline)
+    return 1 if messages else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,157 @@
+#Synthetic "traditional transcripts" for testing and benchmarking
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#- number of lines of the transcript to be generated;
+#- optionally: number of speakers, overlap rate, pause density, timecodes per minute, random seed.
+#OUTPUT:
+#a transcript in the format exported from ELAN with the options given in Step 1 of the readme file
+#(participant labels, no suppression of repeated labels, timecodes, silence duration, line length of 80 characters).
+
+#EXPLANATION:
+#The transcript imitates the features of real exports that the scripts of the package rely on:
+#- each segment starts with the speaker label, padded to the position where the transcribed discourse starts,
+#  its text is broken after at most 80 characters and it is followed by its timecodes ("begin - end");
+#- segments overlapping the preceding one start with "[" and end with "]",
+#  and the overlapped segment contains the corresponding brackets;
+#- pauses "(X.XX)" are placed between segments, at the line beginning before a speaker change;
+#- comments "((ride))", ambient noises pointing to their ending "-->" and duplicate timecode lines occur now and then.
+#The words are meaningless. The same seed always gives the same transcript.
+#The transcript is produced line by line, so that transcripts of millions of lines can be written
+#without being held in memory.
+#Usage:
+#python -m TIGRformat.TIGRbenchmark.synthetic 100000 -o synthetic.txt --speakers 4 --overlap 0.3
+
+import argparse
+import random
+import sys
+
+#The segments are laid out as by TIGRelan.eaf_export (position of the text, line length of 80 characters).
+from ..TIGRelan.eaf_export import TEXT_COLUMN, segment_lines
+
+WORDS = ("allora", "bene", "che", "ciao", "come", "dunque", "ecco", "grazie", "guarda", "insomma", "mah", "no",
+         "oggi", "però", "quindi", "senti", "sì", "stai", "vabbè", "va", "cioè", "niente", "appunto", "tipo")
+NAMES = ("ANNA", "BEA", "CARLO", "DINO", "ELENA", "FABIO", "GIULIA", "LUCA", "MARTA", "NICO")
+
+#Words spoken per second, used to derive the number of words of a segment from its duration.
+WORDS_PER_SECOND = 3
+#Probability that the next segment is by the same speaker (a repeated label).
+SAME_SPEAKER = 0.4
+#Probabilities of a comment in a segment, of an ambient noise segment and of a duplicate timecode line.
+COMMENTS = 0.05
+NOISES = 0.02
+DUPLICATES = 0.02
+
+
+def speaker_names(speakers):
+    """Returns the labels of the speakers: first names, followed by numbered labels if more are needed."""
+
+    return [NAMES[k] if k < len(NAMES) else "SPEAKER" + str(k + 1) for k in range(speakers)]
+
+
+def generate(lines, speakers=3, overlap=0.2, pauses=0.3, timecodes_per_minute=20, seed=0):
+    """Yields the lines of a synthetic transcript one by one.
+
+        lines is the number of lines to produce (the last segment is completed, so that a few more lines may be yielded);
+        overlap is the proportion of segments overlapping the preceding one, pauses the proportion of segments
+        followed by a pause and timecodes_per_minute the average number of segments (each with its timecode) per minute."""
+
+    rnd = random.Random(seed)
+    names = speaker_names(speakers)
+    mean_duration = 60000 / timecodes_per_minute
+    time = rnd.randint(0, 5000)
+    speaker = rnd.choice(names)
+    count = 0
+    #The preceding segment is only output once the next one is known, since an overlap changes its text.
+    previous = None
+    while count < lines:
+        duration = int(min(max(rnd.expovariate(1 / mean_duration), 300), 4 * mean_duration))
+        if rnd.random() < NOISES:
+            label = "AMBIENT_NOISES"
+            words = ["((rumore))", "-->"]
+        else:
+            label = speaker
+            words = [rnd.choice(WORDS) for _ in range(max(1, duration * WORDS_PER_SECOND // 1000))]
+            if rnd.random() < COMMENTS:
+                words.insert(rnd.randrange(len(words) + 1), "((ride))")
+        start = time
+        #An overlapping segment starts with "[" during the preceding segment (by another speaker),
+        #which gets "[" at the overlap onset and "]" at its end.
+        in_overlap = (previous is not None and label != "AMBIENT_NOISES" and rnd.random() < overlap
+                      and previous[0] not in (label, "AMBIENT_NOISES") and len(previous[1]) > 1
+                      and not any("[" in word for word in previous[1]))
+        if in_overlap:
+            previous_words, previous_start, previous_end = previous[1:]
+            onset = rnd.randrange(1, len(previous_words))
+            previous_words[onset] = "[" + previous_words[onset]
+            previous_words[-1] = previous_words[-1] + "]"
+            words[0] = "[" + words[0]
+            words[-1] = words[-1] + "]"
+            start = max(previous_start + 1, previous_end - rnd.randint(100, 1000))
+        if previous is not None:
+            for line in segment_lines(*previous, duplicate=rnd.random() < DUPLICATES):
+                count += 1
+                yield line
+            if not in_overlap and rnd.random() < pauses:
+                length = rnd.choice((10, 20, 30, 50, 80, 120, 250, 600))
+                pause = "(" + format(length / 100, ".2f") + ")\n"
+                #ELAN places pauses between speaker changes at the line beginning.
+                if label != previous[0]:
+                    yield pause
+                else:
+                    yield " " * TEXT_COLUMN + pause
+                count += 1
+                start += length * 10
+        previous = (label, words, start, start + duration)
+        time = max(time, start + duration)
+        if rnd.random() >= SAME_SPEAKER:
+            speaker = rnd.choice(names)
+    if previous is not None:
+        yield from segment_lines(*previous)
+
+
+def write_transcript(save, lines, **options):
+    """Saves a synthetic transcript of about lines lines to a new file (see generate() for the options)."""
+
+    with open(save, "x", encoding="utf-8") as f:
+        f.writelines(generate(lines, **options))
+
+
+def main(argv=None):
+    """Generates a synthetic transcript from the command line."""
+
+    parser = argparse.ArgumentParser(prog="python -m TIGRformat.TIGRbenchmark.synthetic",
+                                     description="Generate a synthetic traditional transcript as exported from ELAN.")
+    parser.add_argument("lines", type=int, help="number of lines")
+    parser.add_argument("-o", "--output", default="-", help="new file to write to (default: standard output)")
+    parser.add_argument("--speakers", type=int, default=3, help="number of speakers (default: 3)")
+    parser.add_argument("--overlap", type=float, default=0.2,
+                        help="proportion of segments overlapping the preceding one (default: 0.2)")
+    parser.add_argument("--pauses", type=float, default=0.3,
+                        help="proportion of segments followed by a pause (default: 0.3)")
+    parser.add_argument("--timecodes-per-minute", type=float, default=20,
+                        help="average number of segments, each with its timecode, per minute (default: 20)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    args = parser.parse_args(argv)
+    if args.lines < 1 or args.speakers < 1 or args.timecodes_per_minute <= 0:
+        parser.error("lines, --speakers and --timecodes-per-minute must be positive")
+    if not (0 <= args.overlap <= 1 and 0 <= args.pauses <= 1):
+        parser.error("--overlap and --pauses must be between 0 and 1")
+
+    options = dict(speakers=args.speakers, overlap=args.overlap, pauses=args.pauses,
+                   timecodes_per_minute=args.timecodes_per_minute, seed=args.seed)
+    if args.output == "-":
+        for line in generate(args.lines, **options):
+            sys.stdout.buffer.write(line.encode("utf-8"))
+        sys.stdout.flush()
+    else:
+        write_transcript(args.output, args.lines, **options)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
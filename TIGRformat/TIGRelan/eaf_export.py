@@ -0,0 +1,334 @@
+#Traditional transcripts built directly from ELAN documents (.eaf)
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#ELAN document (.eaf): time slots, speaker tiers and the AMBIENT_NOISES tier.
+#OUTPUT:
+#"traditional transcript" with the layout of the export from ELAN with the options given in Step 1 of the readme file
+#(participant labels, no suppression of repeated labels, timecodes, silence duration, Jefferson style alignment
+#for "[", line length of 80 characters, annotations of the same tier merged if the gap is less than 10 ms),
+#saved under the name of the ELAN document with the extension .txt.
+
+#EXPLANATION:
+#The ELAN document is read with xml.etree.ElementTree.iterparse, one element at a time: each annotation is
+#reduced to its tier, times and text as soon as it has been read, and the XML elements are discarded,
+#so that the document is never held in memory as a tree.
+#The annotations of the top-level tiers (speaker tiers and the AMBIENT_NOISES tier) are read;
+#dependent tiers (e.g. translations) are skipped. Time slots without a time value are placed
+#between the neighbouring time slots, proportionally, as ELAN does.
+#The segments of all tiers are then laid out in order of their beginning:
+#- the speaker label (participant, or tier name if there is no participant), padded to the position where
+#  the transcribed discourse starts, followed by the text, broken after at most 80 characters;
+#- the timecode line "begin - end";
+#- between two segments separated by at least 100 ms of silence, the silence duration "(X.XX)",
+#  at the line beginning before a change of speaker, at the position of the text otherwise;
+#- when two segments of different speakers overlap in time, "[" is inserted in each of them at the word
+#  corresponding to the beginning of the overlap and "]" at the word corresponding to its end.
+#  Every overlap is marked, also in a segment that already has brackets (e.g. a segment overlapped by the
+#  preceding and by the following segment), but not with AMBIENT_NOISES (see Step 8 of the readme file).
+#Since the times of the annotations are known exactly, overlap is not guessed from the position of brackets:
+#as in TIGRtimecode.overlap, the segments are swept in order of beginning, and those still going on
+#when a segment starts are the segments it overlaps. A segment is output once no later segment can overlap it,
+#i.e. once a segment starts after its end: TIGRlayout.combicheck --overlap finds no mismatch in the result.
+#The layout of the segments (segment_lines(), which breaks the text with break_text()) is shared with TIGRbenchmark.synthetic.
+#The result can be processed by all scripts of the package, starting from step 2, as if it had been exported;
+#the pipeline and batch scripts also accept .eaf files directly (see the readme file).
+#Usage:
+#python -m TIGRformat eaf RECORDING.eaf -o RECORDING.txt
+
+import argparse
+import sys
+from collections import deque, namedtuple
+from xml.etree import ElementTree
+
+from ..transcript import Transcript
+from ..TIGRtimecode.overlap import NOISE_LABEL
+from ..TIGRtimecode.timeconvert import format_timecode
+
+#Position where the transcribed discourse starts (at least) and maximum length of lines, as in the export.
+TEXT_COLUMN = 20
+LINE_LENGTH = 80
+#Minimal silence duration indicated, in milliseconds.
+MIN_SILENCE = 100
+#Annotations of the same tier separated by less than this gap (in milliseconds) are merged.
+MERGE_GAP = 10
+
+#A time-aligned annotation read from the ELAN document (times in milliseconds).
+Annotation = namedtuple("Annotation", ["tier", "label", "start", "end", "text"])
+
+
+def fill_times(times):
+    """Replaces the missing time values (None) of a list of time slots, in document order,
+    by times placed proportionally between the nearest time slots with a value."""
+
+    known = [i for i, time in enumerate(times) if time is not None]
+    if not known:
+        return [0] * len(times)
+    filled = list(times)
+    for i in range(known[0]):
+        filled[i] = times[known[0]]
+    for left, right in zip(known, known[1:]):
+        for i in range(left + 1, right):
+            filled[i] = times[left] + (times[right] - times[left]) * (i - left) // (right - left)
+    for i in range(known[-1] + 1, len(times)):
+        filled[i] = times[known[-1]]
+    return filled
+
+
+def read_eaf(source, tiers=None):
+    """Reads the time-aligned annotations of an ELAN document.
+
+    source is a file name or a file opened in binary mode. The document is read one element at a time (iterparse).
+    tiers is a collection of tier IDs to read; by default, all top-level tiers are read.
+    Returns the list of Annotation tuples sorted by beginning (and by order in the document)."""
+
+    slot_ids = {}
+    slot_times = []
+    annotations = []
+    tier = None
+    #Element (TIME_ORDER or TIER) whose children are discarded as soon as they have been read.
+    parent = None
+    for event, element in ElementTree.iterparse(source, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            if tag == "TIER":
+                tier = None
+                if (element.get("TIER_ID") in tiers) if tiers is not None else element.get("PARENT_REF") is None:
+                    tier = (element.get("TIER_ID"), element.get("PARTICIPANT") or element.get("TIER_ID"))
+            if tag in ("TIER", "TIME_ORDER"):
+                parent = element
+            continue
+        if tag == "TIME_SLOT":
+            slot_ids[element.get("TIME_SLOT_ID")] = len(slot_times)
+            value = element.get("TIME_VALUE")
+            slot_times.append(int(value) if value is not None else None)
+        elif tag == "ALIGNABLE_ANNOTATION" and tier is not None:
+            text = " ".join((element.findtext("ANNOTATION_VALUE") or "").split())
+            if text:
+                start = slot_times[slot_ids[element.get("TIME_SLOT_REF1")]]
+                end = slot_times[slot_ids[element.get("TIME_SLOT_REF2")]]
+                annotations.append(Annotation(tier[0], tier[1], start, end, text))
+        elif tag == "TIER":
+            tier = None
+        elif tag == "TIME_ORDER":
+            #The time slots precede the tiers in the document: their times are known before the annotations.
+            slot_times = fill_times(slot_times)
+        if tag in ("ANNOTATION", "TIME_SLOT"):
+            #The attributes of the parent have been read at its start.
+            parent.clear()
+        elif tag in ("TIER", "TIME_ORDER"):
+            element.clear()
+
+    #The sort is stable: annotations starting at the same time keep the order of the document.
+    annotations.sort(key=lambda annotation: annotation.start)
+    return annotations
+
+
+def merge_annotations(annotations, gap=MERGE_GAP):
+    """Merges the annotations of the same tier separated by less than gap milliseconds.
+
+    Returns a new list of Annotation tuples sorted by beginning."""
+
+    merged = []
+    last = {}
+    for annotation in annotations:
+        position = last.get(annotation.tier)
+        if position is not None and annotation.start - merged[position].end < gap:
+            previous = merged[position]
+            merged[position] = previous._replace(end=max(previous.end, annotation.end),
+                                                 text=previous.text + " " + annotation.text)
+        else:
+            last[annotation.tier] = len(merged)
+            merged.append(annotation)
+    return merged
+
+
+def break_text(words, width=LINE_LENGTH - TEXT_COLUMN):
+    """Breaks a list of words into lines of at most width characters, as ELAN does
+    (a longer word fills a line on its own)."""
+
+    lines = []
+    current = ""
+    for word in words:
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = (current + " " + word) if current else word
+    lines.append(current)
+    return lines
+
+
+def segment_lines(label, words, start, end, text_column=TEXT_COLUMN, line_length=LINE_LENGTH, duplicate=False):
+    """Returns the lines of a segment: speaker label and text, then the timecode line (twice if duplicate)."""
+
+    text = break_text(words, line_length - text_column)
+    lines = [label.ljust(text_column) + text[0] + "\n"]
+    for line in text[1:]:
+        lines.append(" " * text_column + line + "\n")
+    timecode = " " * text_column + format_timecode(start) + " - " + format_timecode(end) + "\n"
+    lines.append(timecode)
+    if duplicate:
+        lines.append(timecode)
+    return lines
+
+
+def word_at(words, start, end, time):
+    """Returns the index of the word of a segment (start, end) spoken at time, assuming a constant speech rate."""
+
+    if end <= start:
+        return 0
+    return min(max((len(words) * (time - start)) // (end - start), 0), len(words) - 1)
+
+
+def bracket_words(segment, start, end):
+    """Inserts "[" at the word of a segment [label, words, start, end] spoken at start and "]" at the word spoken
+    just before end, unless the words already have these brackets."""
+
+    words = segment[1]
+    first = word_at(words, segment[2], segment[3], start)
+    last = max(word_at(words, segment[2], segment[3], end - 1), first)
+    if not words[first].startswith("["):
+        words[first] = "[" + words[first]
+    if not words[last].endswith("]"):
+        words[last] = words[last] + "]"
+
+
+def mark_overlap(segment, overlapping):
+    """Inserts the Jefferson brackets of an overlap in the words of two segments [label, words, start, end].
+
+    overlapping starts before the end of segment."""
+
+    start = max(segment[2], overlapping[2])
+    end = min(segment[3], overlapping[3])
+    bracket_words(segment, start, end)
+    bracket_words(overlapping, start, end)
+
+
+def text_column_for(annotations):
+    """Returns the position where the transcribed discourse starts: TEXT_COLUMN, or more if a label is longer."""
+
+    return max([TEXT_COLUMN] + [len(annotation.label) + 1 for annotation in annotations])
+
+
+def iter_transcript(annotations, text_column=None, line_length=LINE_LENGTH, min_silence=MIN_SILENCE):
+    """Yields the lines of the traditional transcript of a list of Annotation tuples sorted by beginning.
+
+    Each segment is only output once no later segment can overlap it, since an overlap adds brackets to it:
+    only the segments still going on and the lines following them are kept."""
+
+    if text_column is None:
+        text_column = text_column_for(annotations)
+    #Segments [label, words, start, end] and pause lines not output yet, in order,
+    #and the segments of speakers still going on (which later segments can overlap).
+    waiting = deque()
+    ongoing = []
+    previous = None
+    #End of the latest segment so far, from which silences are measured.
+    latest = None
+    for annotation in annotations:
+        segment = [annotation.label, annotation.text.split(), annotation.start, annotation.end]
+        ongoing = [other for other in ongoing if other[3] > annotation.start]
+        if annotation.label != NOISE_LABEL:
+            #As in TIGRtimecode.overlap, two segments overlap if each starts before the other one ends.
+            for other in ongoing:
+                if other[2] < annotation.end and other[0] != annotation.label:
+                    mark_overlap(other, segment)
+            ongoing.append(segment)
+        #The segments ended by now, and ambient noises, get no more brackets.
+        while waiting and (isinstance(waiting[0], str) or waiting[0][0] == NOISE_LABEL
+                           or waiting[0][3] <= annotation.start):
+            yield from output_lines(waiting.popleft(), text_column, line_length)
+        if previous is not None and annotation.start - latest >= min_silence:
+            pause = "(" + format((annotation.start - latest) / 1000, ".2f") + ")\n"
+            if annotation.label != previous[0]:
+                waiting.append(pause)
+            else:
+                waiting.append(" " * text_column + pause)
+        waiting.append(segment)
+        previous = segment
+        latest = annotation.end if latest is None else max(latest, annotation.end)
+    for item in waiting:
+        yield from output_lines(item, text_column, line_length)
+
+
+def output_lines(item, text_column, line_length):
+    """Returns the lines of an item waiting to be output by iter_transcript(): a pause line, or a segment."""
+
+    if isinstance(item, str):
+        return [item]
+    return segment_lines(*item, text_column, line_length)
+
+
+def eaf_lines(source, tiers=None, text_column=None):
+    """Returns the traditional transcript of an ELAN document as a list of lines, as file.readlines() would."""
+
+    return list(iter_transcript(merge_annotations(read_eaf(source, tiers)), text_column))
+
+
+def eaf_transcript(source, tiers=None, text_column=None):
+    """Returns the traditional transcript of an ELAN document parsed into a Transcript, as used by the scripts."""
+
+    return Transcript(eaf_lines(source, tiers, text_column))
+
+
+def is_eaf(filename):
+    """Checks if a file name designates an ELAN document."""
+
+    return filename.lower().endswith(".eaf")
+
+
+def export_name(filename):
+    """Returns the name of the traditional transcript of an ELAN document."""
+
+    return filename[:-4] + ".txt"
+
+
+def export_file(filename, save=None, tiers=None, text_column=None):
+    """Saves the traditional transcript of an ELAN document to a new file (an existing file is never overwritten).
+
+    Returns the name of the saved file."""
+
+    if save is None:
+        save = export_name(filename)
+    lines = eaf_lines(filename, tiers, text_column)
+    with open(save, "x", encoding="utf-8") as f:
+        f.write("".join(lines))
+    return save
+
+
+def main(argv=None):
+    """Builds the traditional transcript of ELAN documents from the command line."""
+
+    parser = argparse.ArgumentParser(prog="python -m TIGRformat eaf",
+                                     description="Build the traditional transcript of ELAN documents without exporting them.")
+    parser.add_argument("documents", nargs="+", help="ELAN documents (.eaf)")
+    parser.add_argument("-o", "--output", help="name of the saved file, or - for the standard output "
+                                               "(only with one document; default: name of the document with .txt)")
+    parser.add_argument("--tiers", help="comma-separated IDs of the tiers to include (default: all top-level tiers)")
+    parser.add_argument("--text-column", type=int,
+                        help="position where the transcribed discourse starts (default: " + str(TEXT_COLUMN) +
+                             ", or more if a label is longer)")
+    args = parser.parse_args(argv)
+    if args.output is not None and len(args.documents) > 1:
+        parser.error("--output can only be used with one document")
+    tiers = None
+    if args.tiers is not None:
+        tiers = {tier.strip() for tier in args.tiers.split(",") if tier.strip()}
+
+    for document in args.documents:
+        if args.output == "-":
+            for line in iter_transcript(merge_annotations(read_eaf(document, tiers)), args.text_column):
+                sys.stdout.buffer.write(line.encode("utf-8"))
+            sys.stdout.flush()
+        else:
+            print("File saved as", export_file(document, args.output, tiers, args.text_column))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
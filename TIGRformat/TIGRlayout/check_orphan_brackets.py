@@ -1,114 +1,287 @@
-#Check square brackets
-
-#This script is part of the "TIGRformat" package.
-#The package supports a workflow in which "traditional transcripts" are exported from ELAN
-#and processed automatically and manually in view of qualitative analysis.
-#Refer to the package's readme file for more information.
-
-#INPUT:
-#"traditional transcript" file exported from ELAN
-#- without suppressing repeated speaker labels and
-#- using ELAN's built-in function to graphicallz align overlapping speech at square brackets.
-#OUTPUT:
-#- Two lists of lines in which brackets are missing.
-
-#EXPLANATION:
-#Square brackets indicate overlap.
-#Each square bracket needs to be to be opened and closed.
-#Brackets have been inserted by transcribers, who may make errors.
-#The script looks for orphan opening / closing brackets and lists the corresponding lines.
-#The errors must then be fixed manually, both in the .txt transcript and in the ELAN source transcript.
-#N.B. Differently from other TIGRformat modules, the file must be read as a string, not as a list of lines.
-
-
-#AUTHOR: Johanna Miecznikowski, Università della Svizzera italiana
-#FUNDING: 
-#- InfinIta project, grant no. 192771 of the Swiss National Science Foundation
-#  (https://data.snf.ch/grants/grant/192771)
-#- ShareTIGR - Sharing the TIGR corpus of spoken Italian: an ORD case study, 
-#  project funded by USI Università della Svizzera italiana
-#  (https://search.usi.ch/projects/3090)
-
-#When using the script please mention author and funding institution in acknowledgements.
-#CREATED: December 2023
-
-
-def run_function():
-    """Executes all operations in the script."""
-    
-    #Import the Regex module.
-    import re
-    
-    def checkbr(content):
-        """Checks for orphan square brackets in a file read as a string (file.read()).
-
-            Outputs two lists of lines. The first lists open square brackets that are not closed.
-            The second lists closed square brackets that are not preceded by opening ones."""
-        
-        print("\n")
-
-        #Find all opening square brackets.
-        opening_br = re.finditer(r"\[", content)
-    #Loop them through looking for the next square bracket of each and signal its line number
-    #if it is a further opening bracket instead of the expected closing bracket.
-        for br in opening_br:
-            next_br = re.search(r"[\[\]]", content[br.end():])
-            if next_br.group() == "]":
-                continue
-            else:
-                number = br.string.count("\n", 0, br.start()) + 1
-                print("\nOrphan opening bracket at line", number, end="")
-                line_start = content.rfind("\n", 0, br.start())
-                line_end = content.find("\n", br.end()) 
-                print(content[line_start:line_end])
-                
-
-        print("\n")
-
-        #Find all closing square brackets.
-        closing_br = re.finditer(r"\]", content)
-        #Loop them through looking for the last square bracket before each and signal its line number
-        #if it is a closing bracket instead of the expected opening bracket.
-        for br in closing_br:
-            preceding_br = (re.findall(r"[\[\]]",content[:br.start()]) )[-1]
-            if preceding_br == "[":
-                continue
-            else:
-                number = br.string.count("\n", 0, br.start()) + 1
-                print("\nOrphan closing bracket at line", number, end="")
-                line_start = content.rfind("\n", 0, br.start())
-                line_end = content.find("\n", br.end()) 
-                print(content[line_start:line_end])
-
-    #Open a transcript file.
-    attempts = 0
-    while attempts < 3:
-        try:
-            filename = input("Write the file path of a traditional transcript exported from ELAN: ")
-            file = open(filename, "r", encoding="utf-8")
-            input_successful = True
-            break
-        except:
-            if attempts < 2:
-                print("Problem with name or location of the file. Try again.")
-                input_successful = False
-                attempts += 1
-            else:
-                print("Problem with name or location of the file.")
-                input_successful = False
-                attempts += 1
-
-    #Read the file as one long string and close it.
-    if input_successful == True:
-        content = file.read()
-        file.close()
-        #Call checkbr function defined earlier
-        checkbr(content)
-        print("\n---Brackets checked.---")
-    else:
-        print("\nInput failed several times.")
-        print("---Operation interrupted.---")
-
-#Check document for orphan brackets.
-run_function()
-
+#Check square brackets and the other TIGR delimiters
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#"traditional transcript" file exported from ELAN
+#- without suppressing repeated speaker labels and
+#- using ELAN's built-in function to graphicallz align overlapping speech at square brackets.
+#OUTPUT:
+#- A list of lines in which brackets are missing, sorted by opening and closing brackets.
+
+#EXPLANATION:
+#Square brackets indicate overlap.
+#Each square bracket needs to be to be opened and closed.
+#Brackets have been inserted by transcribers, who may make errors.
+#The script looks for orphan opening / closing brackets and lists the corresponding lines.
+#The errors must then be fixed manually, both in the .txt transcript and in the ELAN source transcript.
+#The other delimiter pairs of the TIGR conventions are balanced in the same pass:
+#- double round brackets "(( ))" (comments, e.g. "((TC))" or "((ride))");
+#- round brackets "( )" (e.g. pauses "(0.50)");
+#- angle brackets "< >".
+#Square brackets do not nest: an opening bracket must be followed by a closing one before the next opening one.
+#Round and angle brackets may nest.
+#Arrows pointing to endings of ambient noises ("-->") are not counted as angle brackets.
+#N.B. Differently from other TIGRformat modules, the file must be read as a string, not as a list of lines.
+#Very large files (e.g. a whole corpus in one file) can be checked without reading them into memory:
+#check_file() maps the file in memory (mmap) and scans its bytes, counting lines only up to the orphans found,
+#and only decodes the lines containing orphans. The result is the same as with checkbr() on the string.
+
+
+#AUTHOR: Johanna Miecznikowski, Università della Svizzera italiana
+#FUNDING: 
+#- InfinIta project, grant no. 192771 of the Swiss National Science Foundation
+#  (https://data.snf.ch/grants/grant/192771)
+#- ShareTIGR - Sharing the TIGR corpus of spoken Italian: an ORD case study, 
+#  project funded by USI Università della Svizzera italiana
+#  (https://search.usi.ch/projects/3090)
+
+#When using the script please mention author and funding institution in acknowledgements.
+#CREATED: December 2023
+
+import mmap
+import os
+import re
+from bisect import bisect_left
+from collections import namedtuple
+
+#Names of the delimiter pairs, indexed by their opening delimiter.
+DELIMITER_NAMES = {"[": "square bracket",
+                   "((": "double round bracket",
+                   "(": "round bracket",
+                   "<": "angle bracket"}
+
+#Closing delimiter of each pair, indexed by the opening delimiter.
+CLOSING = {"[": "]", "((": "))", "(": ")", "<": ">"}
+OPENING = {closing: opening for opening, closing in CLOSING.items()}
+
+#Double round brackets must be tried before single ones.
+#Angle brackets belonging to arrows ("-->", "<--") are not delimiters.
+#The pattern starts with a single set of characters, which the regular expression engine finds quickly;
+#the conditions are checked afterwards: a second round bracket of the same kind is taken with the first one,
+#">" must not be preceded by "-" and "<" must not be followed by "-".
+DELIMITER = re.compile(r"[\[\]()<>](?:(?<=\()\(|(?<=\))\))?(?<!->)(?!(?<=<)-)")
+#The same pattern for texts read as bytes, and the delimiters it finds converted into strings.
+DELIMITER_BYTES = re.compile(DELIMITER.pattern.encode("ascii"))
+TOKENS = {delimiter.encode("ascii"): delimiter for delimiter in list(CLOSING) + list(OPENING)}
+
+#Number of bytes in which line breaks are counted at once in a file mapped in memory.
+CHUNK = 1 << 20
+
+#An orphan delimiter found by checkbr().
+#kind is "opening" or "closing", line and column are counted from 1.
+Orphan = namedtuple("Orphan", ["delimiter", "kind", "line", "column", "excerpt"])
+
+
+def count_newlines(data, start, end):
+    """Counts the line breaks between two offsets of a text read as bytes (bytes or mmap),
+        copying at most CHUNK bytes at a time."""
+
+    if isinstance(data, bytes):
+        return data.count(b"\n", start, end)
+    count = 0
+    for position in range(start, end, CHUNK):
+        count += data[position:min(position + CHUNK, end)].count(b"\n")
+    return count
+
+
+def newline_offsets(content):
+    """Lists the offsets of all line breaks in a file read as a string (file.read())."""
+
+    return [match.start() for match in re.finditer("\n", content)]
+
+
+def locate(content, newlines, offset):
+    """Returns the line number, column and text of the line containing a character offset.
+
+        newlines is the list returned by newline_offsets(content).
+        Line numbers and columns are counted from 1."""
+
+    index = bisect_left(newlines, offset)
+    line_start = newlines[index - 1] + 1 if index > 0 else 0
+    line_end = newlines[index] if index < len(newlines) else len(content)
+    return index + 1, offset - line_start + 1, content[line_start:line_end]
+
+
+class DelimiterState:
+    """Delimiters waiting for their closing delimiter at a point of the text.
+
+        open_square is the offset of the open square bracket (None if there is none);
+        round_stack and angle_stack are lists of (delimiter, offset) for the delimiters that may nest."""
+
+    __slots__ = ("open_square", "round_stack", "angle_stack")
+
+    def __init__(self, open_square=None, round_stack=None, angle_stack=None):
+        self.open_square = open_square
+        self.round_stack = round_stack if round_stack is not None else []
+        self.angle_stack = angle_stack if angle_stack is not None else []
+
+
+def scan(content, state, found):
+    """Balances the delimiters of a text, starting from the delimiters left open in state.
+
+        content is a string, or bytes (possibly a file mapped in memory), in which case offsets are counted in bytes.
+        state is updated; orphan delimiters found are appended to found as (delimiter, kind, offset)."""
+
+    open_square = state.open_square
+    round_stack = state.round_stack
+    angle_stack = state.angle_stack
+
+    pattern = DELIMITER if isinstance(content, str) else DELIMITER_BYTES
+    position = 0
+    while True:
+        match = pattern.search(content, position)
+        if not match:
+            break
+        token = TOKENS.get(match.group(), match.group())
+        offset = match.start()
+        position = match.end()
+        if token == "[":
+            if open_square is not None:
+                found.append(("[", "opening", open_square))
+            open_square = offset
+        elif token == "]":
+            if open_square is None:
+                found.append(("[", "closing", offset))
+            open_square = None
+        elif token == "<":
+            angle_stack.append(("<", offset))
+        elif token == ">":
+            if angle_stack:
+                angle_stack.pop()
+            else:
+                found.append(("<", "closing", offset))
+        elif token in ("((", "("):
+            round_stack.append((token, offset))
+        else:
+            #"))" closes a single round bracket first if one is open (e.g. "((ride (0.50)))").
+            if token == "))" and round_stack and round_stack[-1][0] == "(":
+                token = ")"
+                position = offset + 1
+            if round_stack and round_stack[-1][0] == OPENING[token]:
+                round_stack.pop()
+            else:
+                found.append((OPENING[token], "closing", offset))
+
+    state.open_square = open_square
+
+def left_open(state, found):
+    """Appends the delimiters still open at the end of the text to found, as orphan opening delimiters."""
+
+    if state.open_square is not None:
+        found.append(("[", "opening", state.open_square))
+    for delimiter, offset in state.round_stack + state.angle_stack:
+        found.append((delimiter, "opening", offset))
+
+def locate_orphans(content, found):
+    """Converts the (delimiter, kind, offset) items found in a text into Orphan tuples sorted by position."""
+
+    if not isinstance(content, str):
+        return locate_orphans_bytes(content, found)
+    #Resolve line numbers with a single index of line breaks.
+    newlines = newline_offsets(content)
+    orphans = []
+    for delimiter, kind, offset in sorted(found, key=lambda item: item[2]):
+        line, column, excerpt = locate(content, newlines, offset)
+        orphans.append(Orphan(delimiter, kind, line, column, excerpt))
+    return orphans
+
+def locate_orphans_bytes(data, found):
+    """Converts the (delimiter, kind, offset) items found in a text read as bytes into Orphan tuples sorted by position.
+
+        Line breaks are counted from one orphan to the next, and only the lines containing orphans are decoded,
+        so that columns and excerpts are the same as in the text read as a string."""
+
+    orphans = []
+    line = 1
+    counted = 0
+    for delimiter, kind, offset in sorted(found, key=lambda item: item[2]):
+        line += count_newlines(data, counted, offset)
+        counted = offset
+        line_start = data.rfind(b"\n", 0, offset) + 1
+        line_end = data.find(b"\n", offset)
+        if line_end < 0:
+            line_end = len(data)
+        text = data[line_start:line_end]
+        column = len(text[:offset - line_start].decode("utf-8", "replace")) + 1
+        excerpt = text.decode("utf-8", "replace")
+        if excerpt.endswith("\r"):
+            excerpt = excerpt[:-1]
+        orphans.append(Orphan(delimiter, kind, line, column, excerpt))
+    return orphans
+
+def checkbr(content):
+    """Checks for orphan brackets in a file read as a string (file.read()).
+
+        Scans the text once, balancing square brackets, double round brackets,
+        round brackets and angle brackets at the same time.
+        content may also be bytes or a file mapped in memory (see check_file()).
+        Returns a list of Orphan tuples sorted by their position in the text."""
+
+    state = DelimiterState()
+    found = []
+    scan(content, state, found)
+    left_open(state, found)
+    return locate_orphans(content, found)
+
+def check_file(filename):
+    """Checks for orphan brackets in a file without reading it into memory.
+
+        The file is mapped in memory and scanned as bytes (see checkbr()).
+        Returns a list of Orphan tuples sorted by their position in the text."""
+
+    with open(filename, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return checkbr(data)
+
+
+def report_orphans(orphans):
+    """Prints the orphan brackets returned by checkbr(), opening brackets first."""
+
+    print("\n")
+    for kind in ("opening", "closing"):
+        for orphan in orphans:
+            if orphan.kind == kind:
+                print("\nOrphan", kind, DELIMITER_NAMES[orphan.delimiter], "at line", orphan.line)
+                print(orphan.excerpt)
+        print("\n")
+
+
+def run_function():
+    """Executes all operations in the script."""
+
+    #Open a transcript file.
+    attempts = 0
+    while attempts < 3:
+        try:
+            filename = input("Write the file path of a traditional transcript exported from ELAN: ")
+            file = open(filename, "r", encoding="utf-8")
+            input_successful = True
+            break
+        except:
+            if attempts < 2:
+                print("Problem with name or location of the file. Try again.")
+                input_successful = False
+                attempts += 1
+            else:
+                print("Problem with name or location of the file.")
+                input_successful = False
+                attempts += 1
+
+    #Close the file and check it mapped in memory, without reading it as one long string.
+    if input_successful == True:
+        file.close()
+        report_orphans(check_file(filename))
+        print("\n---Brackets checked.---")
+    else:
+        print("\nInput failed several times.")
+        print("---Operation interrupted.---")
+
+#Check document for orphan brackets.
+if __name__ == "__main__":
+    run_function()
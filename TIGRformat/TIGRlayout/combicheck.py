@@ -1,154 +1,338 @@
-#Check transcript for
-#- square brackets in lines with timecode marks
-#- undesired repeated speaker labels
-
-#This script is part of the "TIGRformat" package.
-#The package supports a workflow in which "traditional transcripts" are exported from ELAN
-#and processed automatically and manually in view of qualitative analysis.
-#Refer to the package's readme file for more information.
-
-#INPUT:
-#"traditional transcript" file exported from ELAN manipulated both automatically and manually.
-#OUTPUT:
-#- a list of lines containing repeated speaker labels;
-#- a list of lines with timecode marks that contain square brackets
-#- a list of lines with "-->" (pointing to reference points of AMBIENT_NOISES)
-
-
-def run_function():
-    """Executes all operations in the script."""
-    
-    #Import the Regex module.
-    import re
-
-    def replabels(content):
-        """Finds undesired repeated speaker labels and signals them to the user.
-
-            The function operates on the content of a file opened as a list of lines (file.readlines())."""
-
-        print("\n")
-        print("Repeated speaker Labels")
-        print("=======================", "\n")
-
-        for line in content:
-            timecode_mark = re.search("TC", line)
-            if timecode_mark:
-                spaces = line.index(timecode_mark.group()) - 2
-                break
-            else:
-                continue        
-        
-        for index in range(len(content)):
-            if re.match(r"[A-Z]", content[index]):
-                label = (content[index])[:spaces]
-                for nextind in range((index + 1), len(content[index + 1:])):
-                    if len(content[nextind]) >= 1:
-                        if (content[nextind])[0] == " ":
-                            continue
-                        elif (content[nextind])[0] == "-":
-                            continue
-                        else:
-                            if re.match("[A-Z]", content[nextind]):
-                                if (content[nextind])[:spaces] == label:
-                                    print("Check these lines:")
-                                    print("line", index+1, ":", content[index], end="")
-                                    print("line", nextind+1, ":", content[nextind])
-                                    continue
-                                else:
-                                    break
-                    else:
-                        continue
-            else:
-                continue      
-
-    def find_tc_and_brackets(content):
-        """Finds lines that contain both timecode marks and square brackets.
-
-            The function operates on the content of a file opened as a list of lines (file.readlines()).
-            In an early step of the formatting procedure, a timecode mark ("((TC))") was inserted into the transcript
-            a each point referred to by timecode stamps. That insertion shifted the following text forward.
-            When square brackets (indicating overlapping speech( were present in that line,
-            their automatic graphical alignment performed by ELAN was disturbed.
-            In later phases of the formatting process, overlapping speech was rearranged manually and many
-            disalignments probably have been recognized and corrected.
-            The function checks for disalignments that have gone unnoticed.
-            Any disalignment found must be corrected manually."""
-         
-        print("\n")
-        print("Lines containing timecode marks followed by square brackets")
-        print("===========================================================", "\n")
-
-        for i in range(len(content)):
-            if re.search("TC", content[i]):
-                tc = re.search("TC", content[i])
-                if re.search(r"\[", (content[i])[tc.end():]):
-                    print("Check square brackets at lines", i-2, "to", i+2)                    
-                    print(content[i-2], end="")
-                    print(content[i-1], end="")
-                    print(content[i], end="")
-                    print(content[i+1], end="")
-                    print(content[i+2], "\n")
-                else:
-                    continue
-            else:
-                continue
-
-    def ambnoise_arrows(content):
-        """Finds arrows pointing towards endings of ambient noises.
-
-            The function operates on the content of a file opened as a list of lines (file.readlines()).
-            In ELAN, noises have been transcribed using a separate tier.
-            Longer noises overlapping speech have been transcribed as short segments
-            at the beginning of the noise, in order not to cover segments empty of speech
-            and to allow ELAN to properly recognize and calculate such empty segments as pauses.
-            An arrow is placed in the segment pointing to the ending of the noise.
-            When formatting the exported transcript, it should be moved to the line that immediately
-            precedes the corresponding reference point in the transcript (usually indicated by a "*").
-            The present function retrieves arrows, which then must then be moved manually."""
-        
-        print("\n")
-        print("Pointers to endings of AMBIENT_NOISES")
-        print("=====================================")
-
-        #List indexes of lines that contain 
-        for i in range(len(content)):
-            if re.search("-->", content[i]):
-                print("Check line", i+1,":", content[i], "and possible reference points in the following lines.")
-            else:
-                continue
-
-    #Open a transcript file.
-    attempts = 0
-    while attempts < 3:
-        try:
-            filename = input("Write the file path of a traditional transcript exported from ELAN: ")
-            file = open(filename, "r", encoding="utf-8")
-            input_successful = True
-            break
-        except:
-            if attempts < 2:
-                print("Problem with name or location of the file. Try again.")
-                input_successful = False
-                attempts += 1
-            else:
-                print("Problem with name or location of the file.")
-                input_successful = False
-                attempts += 1
-
-    #Read the file as a list of lines and close it.
-    if input_successful == True:
-        content = file.readlines()
-        file.close()
-        #Call function defined earlier
-        replabels(content)
-        #Call function defined earlier
-        find_tc_and_brackets(content)
-        #Call function defined earlier
-        ambnoise_arrows(content)
-        print("\n---Combicheck performed.---")
-    else:
-        print("\nInput failed several times.")
-        print("---Operation interrupted.---")
-
-#Execute combicheck.
-run_function()        
+#Check transcript for
+#- square brackets in lines with timecode marks
+#- undesired repeated speaker labels
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#"traditional transcript" file exported from ELAN manipulated both automatically and manually.
+#OUTPUT:
+#- a list of lines containing repeated speaker labels;
+#- a list of lines with timecode marks that contain square brackets
+#- a list of lines with "-->" (pointing to reference points of AMBIENT_NOISES)
+#- with the option --overlap, a list of segments whose square brackets do not match the overlap found
+#  from the beginning and ending times of the segments (exported transcript only, see TIGRtimecode.overlap)
+#The lists are printed as text or, for automatic processing (e.g. comparing the reports of a whole corpus),
+#as JSON: one record per problem found, with the name of the check ("rule"), the line and column
+#(counted from 1), the text of the line ("excerpt") and a message.
+
+#EXPLANATION:
+#Each check is a "rule" that looks at one line at a time and may remember what it has seen in preceding lines.
+#The transcript is read once: every line is passed to all rules in turn.
+#To add a check, define a subclass of Rule and add an instance to the list returned by default_rules().
+#The check of the brackets against the times (OverlapBrackets) needs the "begin - end" timecode lines of the export,
+#which are replaced in the first step of the formatting procedure: it is not one of the default rules.
+#Usage:
+#python -m TIGRformat combicheck FILE [FILE ...] [--format text|json|jsonl] [--overlap]
+
+
+import json
+from collections import namedtuple
+
+from ..transcript import Transcript, LABEL, HAS_MARK, HAS_ARROW
+from ..TIGRtimecode.overlap import OverlapIndex, NOISE_LABEL, transcript_segments
+
+#A problem found by a rule. line and column are counted from 1.
+Diagnostic = namedtuple("Diagnostic", ["rule", "line", "column", "excerpt", "message"])
+
+FORMATS = ["text", "json", "jsonl"]
+
+
+class Rule:
+    """A check performed on a transcript, one line at a time.
+
+        name identifies the rule in the diagnostics, title is the heading of its list in the text report,
+        context is the number of lines printed before and after each line found in the text report."""
+
+    name = ""
+    title = ""
+    context = 0
+
+    def start(self, transcript):
+        """Prepares the rule before the first line of a transcript."""
+
+    def visit(self, transcript, index):
+        """Checks the line at index and returns a list of Diagnostic tuples (possibly empty)."""
+
+        return []
+
+    def finish(self, transcript):
+        """Returns the Diagnostic tuples that can only be determined after the last line."""
+
+        return []
+
+    def diagnostic(self, transcript, index, column, message):
+        """Returns a Diagnostic of this rule for the line at index."""
+
+        return Diagnostic(self.name, index + 1, column + 1, transcript.lines[index].rstrip("\n"), message)
+
+
+class RepeatedLabels(Rule):
+    """Finds undesired repeated speaker labels.
+
+        A label is repeated if it is the same as the label of the current etic turn:
+        only the label of another speaker ends the turn (continuation, pause and timecode lines do not)."""
+
+    name = "repeated-label"
+    title = "Repeated speaker Labels"
+
+    def start(self, transcript):
+        self.current = -1
+        self.previous = None
+
+    def visit(self, transcript, index):
+        if transcript.kinds[index] != LABEL:
+            return []
+        previous = self.previous
+        self.previous = index
+        if transcript.speakers[index] != self.current:
+            self.current = transcript.speakers[index]
+            return []
+        #The previous label is located relative to the line, so that the message does not change
+        #when lines are added or removed before it (see TIGRlayout.recheck).
+        return [self.diagnostic(transcript, index, 0,
+                                "speaker label " + transcript.speaker(index) + " repeated (previous label "
+                                + str(index - previous) + " lines above)")]
+
+
+class TimecodeMarkBrackets(Rule):
+    """Finds lines that contain both timecode marks and square brackets.
+
+        In an early step of the formatting procedure, a timecode mark ("((TC))") was inserted into the transcript
+        a each point referred to by timecode stamps. That insertion shifted the following text forward.
+        When square brackets (indicating overlapping speech( were present in that line,
+        their automatic graphical alignment performed by ELAN was disturbed.
+        In later phases of the formatting process, overlapping speech was rearranged manually and many
+        disalignments probably have been recognized and corrected.
+        The rule checks for disalignments that have gone unnoticed.
+        Any disalignment found must be corrected manually."""
+
+    name = "tc-bracket"
+    title = "Lines containing timecode marks followed by square brackets"
+    context = 2
+
+    def visit(self, transcript, index):
+        if not transcript.flags[index] & HAS_MARK:
+            return []
+        line = transcript.lines[index]
+        bracket = line.find("[", line.index("TC") + 2)
+        if bracket < 0:
+            return []
+        return [self.diagnostic(transcript, index, bracket, "square bracket after a timecode mark: check the alignment")]
+
+
+class NoiseArrows(Rule):
+    """Finds arrows pointing towards endings of ambient noises.
+
+        In ELAN, noises have been transcribed using a separate tier.
+        Longer noises overlapping speech have been transcribed as short segments
+        at the beginning of the noise, in order not to cover segments empty of speech
+        and to allow ELAN to properly recognize and calculate such empty segments as pauses.
+        An arrow is placed in the segment pointing to the ending of the noise.
+        When formatting the exported transcript, it should be moved to the line that immediately
+        precedes the corresponding reference point in the transcript (usually indicated by a "*").
+        The rule retrieves arrows, which then must then be moved manually."""
+
+    name = "noise-arrow"
+    title = "Pointers to endings of AMBIENT_NOISES"
+
+    def visit(self, transcript, index):
+        if not transcript.flags[index] & HAS_ARROW:
+            return []
+        column = transcript.lines[index].index("-->")
+        return [self.diagnostic(transcript, index, column, "arrow to be moved before its reference point in the following lines")]
+
+
+class OverlapBrackets(Rule):
+    """Finds segments whose square brackets do not match their overlap with other speakers in time.
+
+        Overlapping speech is indicated by the transcribers with square brackets.
+        In the exported transcript, the beginning and ending time of each segment show whether it actually
+        overlaps a segment of another speaker (see TIGRtimecode.overlap). The rule finds
+        - segments overlapping another speaker's segment by more than MIN_OVERLAP milliseconds without any bracket;
+        - segments with a bracket that overlap no segment of another speaker at all.
+        The brackets or the segment boundaries in ELAN must then be checked manually."""
+
+    name = "overlap-bracket"
+    title = "Segments whose square brackets do not match their overlap in time"
+    context = 2
+
+    def start(self, transcript):
+        segments = transcript_segments(transcript)
+        self.index = OverlapIndex(segments)
+        self.segments = {segment.line: segment for segment in segments}
+        self.first = None
+        self.bracket = None
+
+    def visit(self, transcript, index):
+        if transcript.kinds[index] == LABEL:
+            self.first = index
+            self.bracket = None
+        segment = self.segments.get(index)
+        if segment is None:
+            if self.bracket is None and "[" in transcript.lines[index]:
+                self.bracket = index
+            return []
+        first, bracket = self.first, self.bracket
+        self.first = None
+        self.bracket = None
+        if first is None or segment.label == NOISE_LABEL:
+            return []
+        if bracket is None and self.index.overlaps(segment):
+            other = self.index.starts_inside(segment)
+            message = "overlaps a segment of another speaker in time but contains no square bracket"
+            if other is not None:
+                message = "starts during a segment of " + other + " but contains no square bracket"
+            return [self.diagnostic(transcript, first, 0, message)]
+        if bracket is not None and not self.index.overlaps(segment, 0):
+            return [self.diagnostic(transcript, bracket, transcript.lines[bracket].index("["),
+                                    "square bracket in a segment that overlaps no segment of another speaker in time")]
+        return []
+
+
+def default_rules():
+    """Returns new instances of all rules, in the order of the text report."""
+
+    return [RepeatedLabels(), TimecodeMarkBrackets(), NoiseArrows()]
+
+def overlap_rules():
+    """Returns new instances of the default rules and of the check of the brackets against the times."""
+
+    return default_rules() + [OverlapBrackets()]
+
+def check(content, rules=None):
+    """Reads a transcript once and applies all rules to each line.
+
+        The function operates on the content of a file opened as a list of lines (file.readlines()),
+        or on a Transcript.
+        Returns the list of Diagnostic tuples found, sorted by line and in the order of the rules."""
+
+    transcript = content if isinstance(content, Transcript) else Transcript(content)
+    if rules is None:
+        rules = default_rules()
+    diagnostics = []
+    for rule in rules:
+        rule.start(transcript)
+    for index in range(len(transcript)):
+        for rule in rules:
+            diagnostics.extend(rule.visit(transcript, index))
+    for rule in rules:
+        diagnostics.extend(rule.finish(transcript))
+    order = {rule.name: position for position, rule in enumerate(rules)}
+    diagnostics.sort(key=lambda diagnostic: (diagnostic.line, order[diagnostic.rule]))
+    return diagnostics
+
+def print_report(content, diagnostics, rules=None):
+    """Prints the diagnostics as text, in one list per rule, with the lines concerned."""
+
+    if rules is None:
+        rules = default_rules()
+    for rule in rules:
+        print("\n")
+        print(rule.title)
+        print("=" * len(rule.title), "\n")
+        for diagnostic in diagnostics:
+            if diagnostic.rule != rule.name:
+                continue
+            first = max(diagnostic.line - 1 - rule.context, 0)
+            last = min(diagnostic.line + rule.context, len(content))
+            if rule.context:
+                print("Check line", diagnostic.line, "(lines", first + 1, "to", str(last) + "):", diagnostic.message)
+            else:
+                print("Check line", diagnostic.line, ":", diagnostic.message)
+            for line in content[first:last]:
+                print(line, end="")
+            print()
+
+def as_records(diagnostics, filename=None):
+    """Converts diagnostics into dictionaries, adding the name of the checked file if given."""
+
+    records = []
+    for diagnostic in diagnostics:
+        record = {}
+        if filename is not None:
+            record["file"] = filename
+        record.update(diagnostic._asdict())
+        records.append(record)
+    return records
+
+def write_json(records, output, lines=False):
+    """Writes records as a JSON list or, if lines is True, as JSON Lines (one record per line)."""
+
+    if lines:
+        for record in records:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+    else:
+        output.write(json.dumps(records, ensure_ascii=False, indent=1) + "\n")
+
+def replabels(content, transcript=None):
+    """Finds undesired repeated speaker labels and signals them to the user.
+
+        The function operates on the content of a file opened as a list of lines (file.readlines())."""
+
+    rules = [RepeatedLabels()]
+    print_report(content, check(transcript or content, rules), rules)
+
+def find_tc_and_brackets(content, transcript=None):
+    """Finds lines that contain both timecode marks and square brackets and signals them to the user.
+
+        The function operates on the content of a file opened as a list of lines (file.readlines())."""
+
+    rules = [TimecodeMarkBrackets()]
+    print_report(content, check(transcript or content, rules), rules)
+
+def ambnoise_arrows(content, transcript=None):
+    """Finds arrows pointing towards endings of ambient noises and signals them to the user.
+
+        The function operates on the content of a file opened as a list of lines (file.readlines())."""
+
+    rules = [NoiseArrows()]
+    print_report(content, check(transcript or content, rules), rules)
+
+def combicheck(content):
+    """Performs all checks on the content of a file opened as a list of lines (file.readlines()) and prints them.
+
+        Returns the list of Diagnostic tuples."""
+
+    diagnostics = check(content)
+    print_report(content, diagnostics)
+    return diagnostics
+
+def run_function():
+    """Executes all operations in the script."""
+
+    #Open a transcript file.
+    attempts = 0
+    while attempts < 3:
+        try:
+            filename = input("Write the file path of a traditional transcript exported from ELAN: ")
+            file = open(filename, "r", encoding="utf-8")
+            input_successful = True
+            break
+        except:
+            if attempts < 2:
+                print("Problem with name or location of the file. Try again.")
+                input_successful = False
+                attempts += 1
+            else:
+                print("Problem with name or location of the file.")
+                input_successful = False
+                attempts += 1
+
+    #Read the file as a list of lines and close it.
+    if input_successful == True:
+        content = file.readlines()
+        file.close()
+        #Call function defined earlier
+        combicheck(content)
+        print("\n---Combicheck performed.---")
+    else:
+        print("\nInput failed several times.")
+        print("---Operation interrupted.---")
+
+#Execute combicheck.
+if __name__ == "__main__":
+    run_function()        
@@ -1,229 +1,249 @@
-#Reformats "etic turns"
-
-#This script is part of the "TIGRformat" package.
-#The package supports a workflow in which "traditional transcripts" are exported from ELAN
-#and processed automatically and manually in view of qualitative analysis.
-#Refer to the package's readme file for more information.
-
-#INPUT:
-#"traditional transcript" file exported from ELAN processed in preceding steps 
-#to filter timecode indications, insert timecode labels and suppress repeated speaker labels
-#(see the package's readme file for details).
-#OUTPUT:
-#transcript file in which discourse segments produced by the same speaker and pauses calculated by ELAN 
-#(except those precding a speaker change) are concatenated without line breaks, forming "etic turns",
-#(see the package's readme file for a definition) and most lines are shortened to a maximum of 86 characters
-#(the initial 80 characters of the ELAN export + 6 characters due to the insertion of timecode marks).
-
-#EXPLANATION:
-#Compact "etic turns" are easier to read and to annotate. That's why this script
-#- concatenates segments produced by the same speaker (without line breaks);
-#- concatenates in the same way pauses between such segments;
-#- inserts line breaks after the last space before the length of 86 characters.
-#N.B. Timecode lines are ignored.
-#N.B. For the time being, the line break function has a maximum of four recursions written manually.
-#It therefore can handle properly etic turns that are at most 4x80 characters long.
-#Longer etic turns will exceed the length of 80 characters per line.
-
-#AUTHOR: Johanna Miecznikowski, Università della Svizzera italiana
-#FUNDING: 
-#- InfinIta project, grant no. 192771 of the Swiss National Science Foundation
-#  (https://data.snf.ch/grants/grant/192771)
-#- ShareTIGR - Sharing the TIGR corpus of spoken Italian: an ORD case study, 
-#  project funded by USI Università della Svizzera italiana
-#  (https://search.usi.ch/projects/3090)
-
-
-def run_function():
-    
-    #Import the Regex module.
-    import re
-
-    def concat_after_label(content):
-        """Looks for text by the same speaker and concatenates it.
-
-            The function operates on the content of a file opened as a list of lines (file.readlines()).
-            It loops through all lines in the document and starts operations from lines that start with a speaker label (uppercase letter).
-            It then checks the following lines and concatenates discourse and pauses by the same speaker,
-            except for the last pause before speaker change.
-            It stops at timecode lines. Discourse following a timecode must be concatenated using the concat_after_tc function."""
-        
-        for line in content:
-            timecode_mark = re.search("TC", line)
-            if timecode_mark:
-                spaces = line.index(timecode_mark.group()) - 2
-                break
-            else:
-                continue
-
-        for index in range(len(content)):
-            if re.match(r"[A-Z]", content[index]):
-                for nextind in range((index + 1), len(content)):
-        #Check the following lines.
-        #When encountering a line without speaker label or timecode, consider concatenating it with preceding discourse.
-                    if re.match(" ", content[nextind]):
-        #Concatenate pauses if not followed by next speaker label.
-                        if re.search(r"\(\d+\.\d+\)",(content[nextind])):
-                            if re.match(r"[A-Z]", content[nextind+1]):
-                                break
-                            else:
-                                text_nextind = (content[nextind])[spaces:]
-                                text_index = (content[index])[:-1]
-                                content[index] = text_index+" "+text_nextind
-                                content[nextind] = ""
-                                continue
-        #Concatenate if the line does not contain either pause or sign of overlap.
-                        else:
-                            text_nextind = (content[nextind])[spaces:]
-                            text_index = (content[index])[:-1]
-                            content[index] = text_index+" "+text_nextind
-                            content[nextind] = ""
-                            continue
-                    else:
-                        break
-
-
-    def concat_after_tc(content):
-
-        """Looks for text by the same speaker following a line with timecode and concatenates it.
-
-            The function operates on the content of a file opend as a list of lines (file.readlines()).
-            It loops through all lines in the document and start operations from lines without speaker label or timecode stamp.
-            When encountering such a line, it checks the following lines and concatenates discourse and pauses by the same speaker,
-            except for the last pause before speaker change.
-            It only concatenates lines without speaker labels and is suitable to concatenate discourse following a timecode line.
-            It is complentary to the concat_after_label function."""
-
-        for line in content:
-            timecode_mark = re.search("TC", line)
-            if timecode_mark:
-                spaces = line.index(timecode_mark.group()) - 2
-                break
-            else:
-                continue
-            
-        for line in content:
-            timecode_mark = re.search("TC", line)
-            if timecode_mark:
-                spaces = line.index(timecode_mark.group()) - 2
-                break
-            else:
-                continue
-
-        #Loop through all lines in the document and start operations from lines that start without speaker label or timecode
-        for index in range(len(content)):
-            if re.match(" ", content[index]):
-        #Check following lines
-                for nextind in range((index + 1), len(content)):
-        #When encountering line without speaker label or timecode, consider concatenating it with preceding discourse.
-                    if re.match(" ", content[nextind]):
-        #Concatenate pauses if not followed by next speaker label.
-                        if re.search(r"\(\d+\.\d+\)",(content[nextind])):
-                            if re.match(r"[A-Z]", content[nextind+1]):
-                                break
-                            else:
-                                text_nextind = (content[nextind])[spaces:]
-                                text_index = (content[index])[:-1]
-                                content[index] = text_index+" "+text_nextind
-                                content[nextind] = ""
-                                continue
-        #Concatenate if the line does not contain either pause or sign of overlap.
-                        else:
-                            text_nextind = (content[nextind])[spaces:]
-                            text_index = (content[index])[:-1]
-                            content[index] = text_index+" "+text_nextind
-                            content[nextind] = ""
-                            continue
-                    else:
-                        break
-
-    def break_lines(text, ind):
-
-        for line in content:
-            timecode_mark = re.search("TC", line)
-            if timecode_mark:
-                spaces = line.index(timecode_mark.group()) - 2
-                break
-            else:
-                continue
-            
-        for line in content:
-            timecode_mark = re.search("TC", line)
-            if timecode_mark:
-                spaces = line.index(timecode_mark.group()) - 2
-                break
-            else:
-                continue
-
-        if len(text[ind]) > 86:
-            maxline = (text[ind])[:86]
-            boundary = maxline.rfind(" ")
-            string_1 = (text[ind])[:boundary]
-            string_2 = (text[ind])[boundary:]
-            text[ind] = string_1+"\n"+" " * (spaces-1)+string_2
-            if len(string_2) > 86-spaces:
-                maxline_string_2 = string_2[:86-spaces]
-                boundary_string_2 = maxline_string_2.rfind(" ")
-                string_3 = string_2[:boundary_string_2]
-                string_4 = string_2[boundary_string_2:]
-                text[ind] = string_1+"\n"+" " * (spaces-1)+string_3+"\n"+" " * (spaces-1)+string_4
-                if len(string_4) > 86-spaces:
-                    maxline_string_4 = string_4[:86-spaces]
-                    boundary_string_4 = maxline_string_4.rfind(" ")
-                    string_5 = string_4[:boundary_string_4]
-                    string_6 = string_4[boundary_string_4:]
-                    text[ind] = string_1+"\n"+" " * (spaces-1)+string_3+"\n"+" " * (spaces-1)+string_5+"\n"+" " * (spaces-1)+string_6
-                    if len(string_6) > 86-spaces:
-                        maxline_string_6 = string_6[:86-spaces]
-                        boundary_string_6 = maxline_string_6.rfind(" ")
-                        string_7 = string_6[:boundary_string_6]
-                        string_8 = string_6[boundary_string_6:]
-                        text[ind] = string_1+"\n"+" " * (spaces-1)+string_3+"\n"+" " * (spaces-1)+string_5+"\n"+" " * (spaces-1)+string_7+"\n"+" " * (spaces-1)+string_8
-
-    #Open a transcript file.
-    attempts = 0
-    while attempts < 3:
-        try:
-            filename = input("Write the file path of a traditional transcript exported from ELAN: ")
-            file = open(filename, "r", encoding="utf-8")
-            input_successful = True
-            break
-        except:
-            if attempts < 2:
-                print("Problem with name or location of the file. Try again.")
-                input_successful = False
-                attempts += 1
-            else:
-                print("Problem with name or location of the file.")
-                input_successful = False
-                attempts += 1
-
-    #Read the file as a list of lines and close it.
-    if input_successful == True:
-        content = file.readlines()
-        file.close()
-        print("This file has ", len(content), " lines.")
-        #Call function defined earlier
-        concat_after_label(content)
-        #Call function defined earlier
-        concat_after_tc(content)
-        #Break lines after max. 86 characters.
-        for i in range(len(content)):
-            if len(content[i]) > 86:
-                break_lines(content, i)
-        print("\nThese are the first 50 lines of the processed document:\n")
-        for line in content[0:50]:
-            print(line, end="")
-        #Save file.
-        save = filename[:-4]+"_concat.txt"
-        with open(save, "x", encoding="utf-8") as f:   
-            for line in content:
-                f.write(line)
-        print("\n---Text concatenated and linebreaks inserted after approx. 86 characters.---")
-        print("\nFile saved as", save)
-    else:
-        print("\nInput failed several times.")
-        print("---Operation interrupted.---")
-        
-#Execute all operations
-run_function()
+#Reformats "etic turns"
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#"traditional transcript" file exported from ELAN processed in preceding steps 
+#to filter timecode indications, insert timecode labels and suppress repeated speaker labels
+#(see the package's readme file for details).
+#OUTPUT:
+#transcript file in which discourse segments produced by the same speaker and pauses calculated by ELAN 
+#(except those precding a speaker change) are concatenated without line breaks, forming "etic turns",
+#(see the package's readme file for a definition) and most lines are shortened to a maximum of 86 characters
+#(the initial 80 characters of the ELAN export + 6 characters due to the insertion of timecode marks).
+
+#EXPLANATION:
+#Compact "etic turns" are easier to read and to annotate. That's why this script
+#- concatenates segments produced by the same speaker (without line breaks);
+#- concatenates in the same way pauses between such segments;
+#- inserts line breaks after the last space before the length of 86 characters.
+#N.B. Timecode lines are ignored.
+#N.B. The document is read once: the text of each etic turn is collected and joined when the turn ends,
+#so that long turns are not rebuilt at each line.
+#In streaming mode (iter_concatenate), only the current etic turn and the next line are kept in memory.
+#N.B. Etic turns of any length are broken into lines. A word longer than a line is not broken.
+#The maximum length of lines (86 characters) and the indentation of the new lines (by default the position
+#where the transcribed discourse starts) can be changed to obtain other print layouts:
+#concatenate(content, width=..., indent=...) or "python -m TIGRformat concat FILE --width ... --indent ...".
+
+#AUTHOR: Johanna Miecznikowski, Università della Svizzera italiana
+#FUNDING: 
+#- InfinIta project, grant no. 192771 of the Swiss National Science Foundation
+#  (https://data.snf.ch/grants/grant/192771)
+#- ShareTIGR - Sharing the TIGR corpus of spoken Italian: an ORD case study, 
+#  project funded by USI Università della Svizzera italiana
+#  (https://search.usi.ch/projects/3090)
+
+
+from ..transcript import Transcript, find_text_column, classify_line, text_column_ahead, LABEL, CONTINUATION, HAS_PAUSE
+
+#Maximum length of lines: the initial 80 characters of the ELAN export + 6 characters due to the insertion of timecode marks.
+WIDTH = 86
+
+
+def strip_last_character(parts):
+    """Removes the last character of the text made of the strings in the list parts (usually a line break)."""
+
+    while parts and not parts[-1]:
+        parts.pop()
+    if parts:
+        parts[-1] = (parts[-1])[:-1]
+
+def concat_turns(content, transcript=None, text_column=None):
+    """Looks for text by the same speaker and concatenates it.
+
+        The function operates on the content of a file opened as a list of lines (file.readlines()).
+        It loops once through all lines in the document. Lines that start with a speaker label (uppercase letter)
+        and lines without speaker label or timecode that follow a timecode line start an etic turn.
+        Discourse and pauses by the same speaker on the following lines are collected and joined with the first line,
+        except for the last pause before speaker change (or before the end of the document).
+        Timecode lines end the etic turn. The lines joined with the first line become empty strings.
+        text_column is the position where the transcribed discourse starts (by default calculated from the document).
+        Returns the number of lines joined with the first line of their etic turn."""
+
+    if transcript is None:
+        transcript = Transcript(content, text_column)
+    kinds = transcript.kinds
+    flags = transcript.flags
+    spaces = text_column if text_column is not None else find_text_column(content)
+
+    #first: index of the line starting the current etic turn (None outside etic turns);
+    #parts: the text of that line followed by the text of the lines joined with it.
+    first = None
+    parts = []
+    joined = 0
+    for index in range(len(content) + 1):
+        if index < len(content) and kinds[index] == CONTINUATION and first is not None:
+    #Concatenate the line, except for a pause followed by the next speaker label or by the end of the document.
+            if not (flags[index] & HAS_PAUSE and (index + 1 == len(content) or kinds[index+1] == LABEL)):
+                strip_last_character(parts)
+                parts.append(" ")
+                parts.append((content[index])[spaces:])
+                transcript.set_line(index, "")
+                joined += 1
+                continue
+    #Any other line ends the etic turn: join the collected text once.
+        if len(parts) > 1:
+            transcript.set_line(first, "".join(parts))
+        first = None
+        parts = []
+    #Lines with speaker label and lines without speaker label or timecode start a new etic turn.
+        if index < len(content) and kinds[index] in (LABEL, CONTINUATION):
+            first = index
+            parts = [content[index]]
+    return joined
+
+def wrap_line(line, width=WIDTH, indent=0):
+    """Breaks a line longer than width characters after the last space before that limit, as many times as needed.
+
+        The following pieces are placed on new lines starting at position indent (hanging indentation).
+        A piece without any space before the limit (e.g. a very long word) is left as it is.
+        Returns the line as a string containing the line breaks."""
+
+    pieces = []
+    rest = line
+    limit = width
+    while len(rest) > limit:
+        boundary = rest[:limit].rfind(" ")
+        if boundary <= 0:
+            break
+        pieces.append(rest[:boundary])
+        #The piece keeps the space before it, so that one space less is needed for the indentation.
+        rest = rest[boundary:]
+        limit = width - indent
+    pieces.append(rest)
+    return ("\n"+" " * (indent-1)).join(pieces)
+
+def break_lines(text, ind, width=WIDTH, indent=None):
+    """Breaks a line longer than width characters (86 by default) after the last space before that limit.
+
+        The function operates on the content of a file opened as a list of lines (file.readlines()).
+        The line at index ind is replaced by a string containing the line breaks.
+        indent is the position where the text of the new lines starts; by default the transcript's text position."""
+
+    if indent is None:
+        indent = find_text_column(text) or 0
+    text[ind] = wrap_line(text[ind], width, indent)
+
+def concatenate(content, width=WIDTH, indent=None, joined=None):
+    """Concatenates etic turns and breaks lines longer than width characters (86 by default).
+
+        The function operates on the content of a file opened as a list of lines (file.readlines()).
+        indent is the position where the text of the new lines starts; by default the transcript's text position,
+        determined once before concatenating.
+        If joined is a list, the number of lines joined with the first line of their etic turn is appended to it
+        (the number of lines of the result also depends on the line breaks inserted).
+        The list is modified and returned."""
+
+    text_column = find_text_column(content)
+    count = concat_turns(content, text_column=text_column)
+    if joined is not None:
+        joined.append(count)
+    if indent is None:
+        indent = text_column or 0
+    #Break lines after max. width characters.
+    for i in range(len(content)):
+        if len(content[i]) > width:
+            content[i] = wrap_line(content[i], width, indent)
+    return content
+
+def iter_concat_turns(lines, text_column, joined=None):
+    """Concatenates etic turns as concat_turns() does, reading the document line by line.
+
+        lines is any iterable of lines, e.g. an open file. Only the current etic turn and the next line
+        (needed to recognize the last pause before a speaker change) are kept. The lines joined with
+        the first line of their etic turn are left out instead of being replaced by empty strings.
+        If joined is a list, their number is appended to it once all lines have been read."""
+
+    lines = iter(lines)
+    parts = []
+    count = 0
+    line = next(lines, None)
+    while line is not None:
+        following = next(lines, None)
+        kind, flags = classify_line(line, text_column)[:2]
+    #Concatenate the line, except for a pause followed by the next speaker label or by the end of the document.
+        if kind == CONTINUATION and parts:
+            if not (flags & HAS_PAUSE and (following is None or classify_line(following, text_column)[0] == LABEL)):
+                strip_last_character(parts)
+                parts.append(" ")
+                parts.append(line[text_column:])
+                count += 1
+                line = following
+                continue
+    #Any other line ends the etic turn.
+        if parts:
+            yield "".join(parts)
+            parts = []
+        if kind in (LABEL, CONTINUATION):
+            parts = [line]
+        else:
+            yield line
+        line = following
+    if parts:
+        yield "".join(parts)
+    if joined is not None:
+        joined.append(count)
+
+def iter_concatenate(lines, width=WIDTH, indent=None, joined=None):
+    """Concatenates etic turns and breaks lines longer than width characters (86 by default),
+        reading the document line by line (see concatenate()).
+
+        lines is any iterable of lines, e.g. an open file; the processed lines are yielded one by one.
+        If joined is a list, the number of lines joined is appended to it once all lines have been read."""
+
+    text_column, lines = text_column_ahead(lines)
+    if indent is None:
+        indent = text_column or 0
+    for line in iter_concat_turns(lines, text_column, joined):
+        if len(line) > width:
+            line = wrap_line(line, width, indent)
+        yield line
+
+def run_function():
+
+    #Open a transcript file.
+    attempts = 0
+    while attempts < 3:
+        try:
+            filename = input("Write the file path of a traditional transcript exported from ELAN: ")
+            file = open(filename, "r", encoding="utf-8")
+            input_successful = True
+            break
+        except:
+            if attempts < 2:
+                print("Problem with name or location of the file. Try again.")
+                input_successful = False
+                attempts += 1
+            else:
+                print("Problem with name or location of the file.")
+                input_successful = False
+                attempts += 1
+
+    #Read the file as a list of lines and close it.
+    if input_successful == True:
+        content = file.readlines()
+        file.close()
+        print("This file has ", len(content), " lines.")
+        #Concatenate etic turns and break lines after max. 86 characters.
+        concatenate(content)
+        print("\nThese are the first 50 lines of the processed document:\n")
+        for line in content[0:50]:
+            print(line, end="")
+        #Save file.
+        save = filename[:-4]+"_concat.txt"
+        with open(save, "x", encoding="utf-8") as f:   
+            for line in content:
+                f.write(line)
+        print("\n---Text concatenated and linebreaks inserted after approx. 86 characters.---")
+        print("\nFile saved as", save)
+    else:
+        print("\nInput failed several times.")
+        print("---Operation interrupted.---")
+        
+#Execute all operations
+if __name__ == "__main__":
+    run_function()
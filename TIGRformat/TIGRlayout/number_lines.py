@@ -1,107 +1,256 @@
-#Number lines in transcript
-
-#This script is part of the "TIGRformat" package.
-#The package supports a workflow in which "traditional transcripts" are exported from ELAN
-#and processed automatically and manually in view of qualitative analysis.
-#Refer to the package's readme file for more information.
-
-#INPUT:
-#"Traditional transcript" file exported from ELAN manipulated both automatically and manually
-#OUTPUT:
-#Document with line numbers.
-
-#EXPLANATION:
-#N.B. The ----Transcript---- title, if present, is supposed to be followed 
-#by one blank line.
-
-def run_function():
-
-    import re
-
-    def insert_line_numbers(content):
-        """Inserts line numbers at the beginning of transcript lines.
-
-        The document must be opened as a list of lines (file.readlines()).
-        Works properly for documents with up to 9999 lines.""" 
-        
-        ln = 1
-        for i in range(len(content)):
-            if i in range(10):
-                content[i] = str(ln)+(" "*4)+content[i]
-                ln = ln + 1
-            elif i in range(10, 100):    
-                content[i] = str(ln)+(" "*3)+content[i]
-                ln = ln + 1
-            elif i in range(100, 1000):    
-                content[i] = str(ln)+(" "*2)+content[i]
-                ln = ln + 1
-            elif i in range(1000, 10000):    
-                content[i] = str(ln)+(" "*1)+content[i]
-                ln = ln + 1
-            else:
-                print("Document longer than 9999 lines, process interrupted.")
-                break
-
-    #Open a transcript file.
-    attempts = 0
-    while attempts < 3:
-        try:
-            filename = input("Write the file path of a traditional transcript exported from ELAN: ")
-            file = open(filename, "r", encoding="utf-8")
-            input_successful = True
-            break
-        except:
-            if attempts < 2:
-                print("Problem with name or location of the file. Try again.")
-                input_successful = False
-                attempts += 1
-            else:
-                print("Problem with name or location of the file.")
-                input_successful = False
-                attempts += 1
-
-    if input_successful == True:
-        #Read the file as a list of lines and close it.
-        content = file.readlines()
-        file.close()
-
-        #Redefine the content to be numbered as the transript section of the file only, 
-        #for the case that there is both a metadata section and a transcript section.
-        for line in content:
-            if re.search("----Transcript----", line):
-                tr_start = content.index(line) + 2
-                has_transcript_title = True
-                metadata_content = content[:tr_start]
-                content = content[tr_start:len(content)]
-                break
-            else:
-                has_transcript_title = False
-                continue
-
-        if has_transcript_title == False:
-            print("\nTitle ----Transcript---- not found. All lines in the document have been numbered.")
-        else:
-            print("\n---Lines numbered---")
-                
-        #Number lines
-        insert_line_numbers(content)
-            
-        #Save file.
-        save = filename[:-4]+"_ln.txt"
-        with open(save, "x", encoding="utf-8") as f:   
-            if has_transcript_title == True:    
-                for line in metadata_content:
-                    f.write(line)
-                for line in content:
-                    f.write(line)
-            else:
-                for line in content:
-                    f.write(line)
-        print("File saved as", save)
-       
-    else:
-        print("\nInput failed several times.")
-        print("---Operation interrupted---")
-        
-#Perform all operations
-run_function()
+#Number lines in transcript
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#"Traditional transcript" file exported from ELAN manipulated both automatically and manually
+#OUTPUT:
+#- Document with line numbers;
+#- cross-reference from line numbers to timecodes, saved next to the document, appending "_lnxref"
+#  to the document name and the extension .tsv (only if the document contains "--TIMECODE--" lines).
+
+#EXPLANATION:
+#N.B. The ----Transcript---- title, if present, is supposed to be followed 
+#by one blank line.
+#The width of the line numbers and their padding is calculated from the number of lines:
+#5 characters up to 9999 lines, one more for each further digit, so that transcripts of any length can be numbered.
+#Transcripts of up to 9999 lines are numbered as they always have been: as before, the numbers 10, 100, 1000, etc.
+#are followed by one more space than the preceding numbers.
+#The cross-reference has one row per "--TIMECODE--" line, with the following columns:
+#- line: the number of the "--TIMECODE--" line;
+#- ms: its timecode in milliseconds;
+#- timecode: its timecode (HH:MM:SS.mmm).
+#Each row applies to the lines from its line number to the line preceding the next row,
+#so that the time of a line quoted in a publication ("l. 1234") is that of the last row
+#whose line is not greater than 1234 (see timecode_at_line()). Lines preceding the first
+#"--TIMECODE--" line have no time.
+
+import tempfile
+from bisect import bisect_right
+
+from ..transcript import TIMECODE_PATTERN
+from ..TIGRtimecode.timeconvert import parse_timecode, format_timecode
+
+#Minimum width of the line numbers and their padding.
+MIN_WIDTH = 5
+#Size up to which iter_number_transcript() holds the transcript in memory while counting its lines.
+SPOOL_SIZE = 1 << 23
+
+COLUMNS = ["line", "ms", "timecode"]
+
+
+def number_width(count):
+    """Returns the width of the line numbers and their padding in a transcript of count lines."""
+
+    return max(MIN_WIDTH, len(str(count)) + 1)
+
+def line_number_prefix(i, width=MIN_WIDTH):
+    """Returns the line number and the spaces inserted by insert_line_numbers() before the line at index i."""
+
+    return str(i + 1) + " " * (width - len(str(i)))
+
+def timecode_line(line):
+    """Returns the timecode of a "--TIMECODE--" line in milliseconds, or None for any other line."""
+
+    if line[:1] == "-":
+        timecode = TIMECODE_PATTERN.search(line)
+        if timecode:
+            #A malformed timecode (e.g. 00:75:00.000) is not a time, as in transcript.classify_line().
+            try:
+                return parse_timecode(timecode.group())
+            except ValueError:
+                pass
+    return None
+
+def insert_line_numbers(content, xref=None):
+    """Inserts line numbers at the beginning of transcript lines.
+
+    The document must be opened as a list of lines (file.readlines()).
+    If xref is a list, a (line number, time in milliseconds) pair is appended to it
+    for each "--TIMECODE--" line (see the cross-reference above).""" 
+    
+    width = number_width(len(content))
+    if xref is not None:
+        for i, line in enumerate(content):
+            ms = timecode_line(line)
+            if ms is not None:
+                xref.append((i + 1, ms))
+    content[:] = [line_number_prefix(i, width) + line for i, line in enumerate(content)]
+
+def remove_line_numbers(content):
+    """Removes the line numbers inserted by number_transcript().
+
+    The document must be opened as a list of lines (file.readlines()).
+    Lines that do not start with the expected number are left unchanged,
+    so that a document without line numbers is returned as it is.
+    Returns a new list of lines."""
+
+    tr_start = transcript_start(content)
+    if tr_start is None:
+        tr_start = 0
+    width = number_width(len(content) - tr_start)
+    unnumbered = content[:tr_start]
+    for i, line in enumerate(content[tr_start:]):
+        prefix = line_number_prefix(i, width)
+        if line.startswith(prefix):
+            line = line[len(prefix):]
+        unnumbered.append(line)
+    return unnumbered
+
+def transcript_start(content):
+    """Returns the index of the first line following the ----Transcript---- title and its blank line.
+
+    The document must be opened as a list of lines (file.readlines()).
+    Returns None if the title is not found."""
+
+    for i, line in enumerate(content):
+        if "----Transcript----" in line:
+            return i + 2
+    return None
+
+def number_transcript(content, xref=None):
+    """Numbers the lines of the transcript section of a document.
+
+    The document must be opened as a list of lines (file.readlines()).
+    If the ----Transcript---- title is not found, all lines are numbered.
+    If xref is a list, the cross-reference of the numbered lines is appended to it (see insert_line_numbers()).
+    Returns the numbered document as a new list of lines."""
+
+    #Redefine the content to be numbered as the transript section of the file only, 
+    #for the case that there is both a metadata section and a transcript section.
+    tr_start = transcript_start(content)
+    if tr_start is None:
+        tr_start = 0
+    metadata_content = content[:tr_start]
+    transcript_content = content[tr_start:len(content)]
+
+    #Number lines
+    insert_line_numbers(transcript_content, xref)
+    return metadata_content + transcript_content
+
+def iter_number_transcript(lines, xref=None):
+    """Numbers the lines of the transcript section of a document read line by line (see number_transcript()).
+
+    lines is any iterable of lines, e.g. an open file; the numbered lines are yielded one by one.
+    Since the width of the line numbers depends on the number of lines, the document is read to the end
+    before numbering: it is kept in memory if it is short, otherwise in a temporary file.
+    The lines up to the ----Transcript---- title are given back without numbers as soon as the title is found;
+    a document without title (e.g. a transcript exported from ELAN) is numbered from its first line."""
+
+    lines = iter(lines)
+    with tempfile.SpooledTemporaryFile(SPOOL_SIZE, mode="w+", encoding="utf-8", newline="\n") as spool:
+        count = 0
+        for line in lines:
+            spool.write(line)
+            count += 1
+            if "----Transcript----" in line:
+                #The metadata, the title and the blank line following it are not numbered.
+                spool.seek(0)
+                yield from spool
+                blank = next(lines, None)
+                if blank is not None:
+                    yield blank
+                spool.seek(0)
+                spool.truncate()
+                count = 0
+                break
+        for line in lines:
+            spool.write(line)
+            count += 1
+        spool.seek(0)
+        width = number_width(count)
+        for i, line in enumerate(spool):
+            if xref is not None:
+                ms = timecode_line(line)
+                if ms is not None:
+                    xref.append((i + 1, ms))
+            yield line_number_prefix(i, width) + line
+
+def xref_name(filename):
+    """Returns the name of the cross-reference file of a numbered transcript file."""
+
+    return filename[:-4]+"_lnxref.tsv"
+
+def write_xref(save, xref):
+    """Saves the cross-reference as a tab-separated file (an existing file is never overwritten)."""
+
+    with open(save, "x", encoding="utf-8", newline="\n") as f:
+        f.write("\t".join(COLUMNS)+"\n")
+        for line, ms in xref:
+            f.write(str(line)+"\t"+str(ms)+"\t"+format_timecode(ms)+"\n")
+
+def read_xref(filename):
+    """Reads a cross-reference file saved by write_xref() and returns the list of (line number, milliseconds) pairs."""
+
+    xref = []
+    with open(filename, "r", encoding="utf-8") as f:
+        f.readline()
+        for row in f:
+            line, ms, timecode = row.rstrip("\n").split("\t")
+            xref.append((int(line), int(ms)))
+    return xref
+
+def timecode_at_line(xref, line):
+    """Returns the time in milliseconds of a numbered line, i.e. that of the nearest preceding "--TIMECODE--" line,
+    or None if the line precedes all timecodes."""
+
+    position = bisect_right(xref, (line, float("inf"))) - 1
+    if position < 0:
+        return None
+    return xref[position][1]
+
+def run_function():
+
+    #Open a transcript file.
+    attempts = 0
+    while attempts < 3:
+        try:
+            filename = input("Write the file path of a traditional transcript exported from ELAN: ")
+            file = open(filename, "r", encoding="utf-8")
+            input_successful = True
+            break
+        except:
+            if attempts < 2:
+                print("Problem with name or location of the file. Try again.")
+                input_successful = False
+                attempts += 1
+            else:
+                print("Problem with name or location of the file.")
+                input_successful = False
+                attempts += 1
+
+    if input_successful == True:
+        #Read the file as a list of lines and close it.
+        content = file.readlines()
+        file.close()
+
+        if transcript_start(content) is None:
+            print("\nTitle ----Transcript---- not found. All lines in the document have been numbered.")
+        else:
+            print("\n---Lines numbered---")
+                
+        #Number lines
+        xref = []
+        content = number_transcript(content, xref)
+            
+        #Save file in one write.
+        save = filename[:-4]+"_ln.txt"
+        with open(save, "x", encoding="utf-8") as f:   
+            f.write("".join(content))
+        print("File saved as", save)
+
+        #Save the cross-reference from line numbers to timecodes.
+        if xref:
+            write_xref(xref_name(save), xref)
+            print("Cross-reference of line numbers and timecodes saved as", xref_name(save))
+       
+    else:
+        print("\nInput failed several times.")
+        print("---Operation interrupted---")
+        
+#Perform all operations
+if __name__ == "__main__":
+    run_function()
@@ -0,0 +1,344 @@
+#Check transcripts again after corrections, re-analysing only what has changed
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#one or more transcript files that are being corrected manually.
+#OUTPUT:
+#- the problems found by TIGRlayout.check_orphan_brackets ("orphan-bracket") and TIGRlayout.combicheck
+#  (see the rules defined there), one per line: line, column, check, message and text of the line;
+#- in watch mode, each time a file is saved: the problems that are new and those that have been resolved.
+
+#EXPLANATION:
+#During correction rounds, the checks are run again and again on files of which only a few lines have changed.
+#The results are therefore kept in a cache, in the folder ".tigrformat_cache" next to the transcript:
+#- for the whole file: if the file has not changed, the results are taken from the cache;
+#- for each "chunk" of the file: a chunk starts at each change of speaker (speaker label different from the
+#  label of the current etic turn). Only the chunks whose text has changed are analysed again.
+#The cache is identified by the content of the file and of the chunks (hash), not by the file's date,
+#so that it remains valid when a file is copied or saved without changes.
+#Brackets may be opened in one chunk and closed in a following one: the result of a chunk is therefore
+#kept for each combination of brackets left open by the preceding chunks.
+#The cache file is replaced at each check and only keeps the chunks of the last version of the file.
+#Usage:
+#python -m TIGRformat recheck TRANSCRIPT.txt [--watch]
+#In watch mode, stop checking with Ctrl+C.
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+from ..transcript import Transcript, LABEL
+from . import check_orphan_brackets
+from . import combicheck
+from .combicheck import Diagnostic
+
+CACHE_DIRECTORY = ".tigrformat_cache"
+
+#Changed whenever the checks change, so that results computed by former versions are not used.
+CACHE_VERSION = "1"
+
+#Name given to the orphan brackets in the diagnostics.
+ORPHAN_RULE = "orphan-bracket"
+
+
+def text_hash(text):
+    """Returns the hash identifying a text in the cache."""
+
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def cache_name(filename):
+    """Returns the name of the cache file of a transcript file."""
+
+    directory, name = os.path.split(os.path.abspath(filename))
+    return os.path.join(directory, CACHE_DIRECTORY, name + ".json")
+
+def load_cache(filename):
+    """Reads the cache of a transcript file. Returns an empty cache if there is none or if it cannot be used."""
+
+    try:
+        with open(cache_name(filename), "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") == CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return new_cache()
+
+def new_cache():
+    """Returns an empty cache."""
+
+    return {"version": CACHE_VERSION, "file": None, "diagnostics": [], "chunks": {}}
+
+def save_cache(filename, cache):
+    """Saves the cache of a transcript file, replacing the former one."""
+
+    save = cache_name(filename)
+    os.makedirs(os.path.dirname(save), exist_ok=True)
+    with open(save + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(save + ".tmp", save)
+
+def chunk_starts(transcript):
+    """Lists the indexes of the lines where chunks start: the first line and each change of speaker."""
+
+    starts = [0]
+    current = -1
+    for index in range(len(transcript)):
+        if transcript.kinds[index] == LABEL and transcript.speakers[index] != current:
+            current = transcript.speakers[index]
+            if index > 0:
+                starts.append(index)
+    return starts
+
+def check_chunk_rules(lines, text_column):
+    """Applies the rules of combicheck to the lines of a chunk.
+
+        Returns the diagnostics as lists [rule, line, column, excerpt, message], with lines counted from the chunk start."""
+
+    return [list(diagnostic) for diagnostic in combicheck.check(Transcript(lines, text_column))]
+
+def bracket_signature(state):
+    """Describes the brackets left open in a DelimiterState, without their positions."""
+
+    return (("1" if state.open_square is not None else "0")
+            + "".join("d" if delimiter == "((" else "s" for delimiter, offset in state.round_stack)
+            + ":" + str(len(state.angle_stack)))
+
+def check_chunk_brackets(text, signature):
+    """Balances the brackets of the text of a chunk, after the brackets left open described by signature.
+
+        Returns what the chunk does to the open brackets, with offsets counted from the chunk start
+        (-1 stands for a bracket opened before the chunk):
+        the orphans found, the open square bracket, the number of round and angle brackets opened before the chunk
+        that are still open, and the round and angle brackets opened in the chunk that are still open."""
+
+    square, rest = signature[0], signature[1:]
+    round_kinds, angle_count = rest.split(":")
+    state = check_orphan_brackets.DelimiterState(
+        -1 if square == "1" else None,
+        [("((" if kind == "d" else "(", -1) for kind in round_kinds],
+        [("<", -1)] * int(angle_count))
+    found = []
+    check_orphan_brackets.scan(text, state, found)
+    round_kept = sum(1 for delimiter, offset in state.round_stack if offset < 0)
+    angle_kept = sum(1 for delimiter, offset in state.angle_stack if offset < 0)
+    return {"found": [list(item) for item in found],
+            "square": state.open_square,
+            "round_kept": round_kept,
+            "round_opened": [list(item) for item in state.round_stack[round_kept:]],
+            "angle_kept": angle_kept,
+            "angle_opened": [list(item) for item in state.angle_stack[angle_kept:]]}
+
+def apply_chunk_brackets(result, start, state, found):
+    """Applies the result of check_chunk_brackets() for a chunk starting at offset start to the state of the whole text."""
+
+    for delimiter, kind, offset in result["found"]:
+        found.append((delimiter, kind, start + offset if offset >= 0 else state.open_square))
+    if result["square"] is None:
+        state.open_square = None
+    elif result["square"] >= 0:
+        state.open_square = start + result["square"]
+    state.round_stack = state.round_stack[:result["round_kept"]] + [(delimiter, start + offset) for delimiter, offset in result["round_opened"]]
+    state.angle_stack = state.angle_stack[:result["angle_kept"]] + [(delimiter, start + offset) for delimiter, offset in result["angle_opened"]]
+
+def orphan_diagnostics(orphans):
+    """Converts the Orphan tuples of check_orphan_brackets into diagnostics."""
+
+    return [Diagnostic(ORPHAN_RULE, orphan.line, orphan.column, orphan.excerpt,
+                       "orphan " + orphan.kind + " " + check_orphan_brackets.DELIMITER_NAMES[orphan.delimiter])
+            for orphan in orphans]
+
+def sort_diagnostics(diagnostics):
+    """Sorts diagnostics by line and column, orphan brackets first and then in the order of the combicheck rules."""
+
+    order = {ORPHAN_RULE: 0}
+    for position, rule in enumerate(combicheck.default_rules()):
+        order[rule.name] = position + 1
+    return sorted(diagnostics, key=lambda diagnostic: (diagnostic.line, order.get(diagnostic.rule, len(order)), diagnostic.column))
+
+def check_text(text, cache):
+    """Checks a transcript read as a string (file.read()), using and updating the cache.
+
+        Returns the sorted list of Diagnostic tuples, the number of chunks and the number of chunks analysed
+        (not found in the cache)."""
+
+    file_hash = text_hash(text)
+    if cache["file"] == file_hash:
+        return [Diagnostic(*diagnostic) for diagnostic in cache["diagnostics"]], 0, 0
+
+    content = io.StringIO(text).readlines()
+    transcript = Transcript(content)
+    starts = chunk_starts(transcript) + [len(content)]
+    old_chunks = cache["chunks"]
+    chunks = {}
+    analysed = set()
+
+    def cached(key, first, compute, *arguments):
+        #Take the result from this check or from the cache, or compute it.
+        if key not in chunks:
+            if key in old_chunks:
+                chunks[key] = old_chunks[key]
+            else:
+                chunks[key] = compute(*arguments)
+                analysed.add(first)
+        return chunks[key]
+
+    diagnostics = []
+    state = check_orphan_brackets.DelimiterState()
+    found = []
+    offset = 0
+    for first, end in zip(starts, starts[1:]):
+        lines = content[first:end]
+        chunk_text = "".join(lines)
+        chunk_hash = text_hash(chunk_text)
+
+        #Checks of combicheck: they only depend on the lines of the chunk and on the text position.
+        key = "rules:" + str(transcript.text_column) + ":" + chunk_hash
+        result = cached(key, first, check_chunk_rules, lines, transcript.text_column)
+        for rule, line, column, excerpt, message in result:
+            diagnostics.append(Diagnostic(rule, first + line, column, excerpt, message))
+
+        #Orphan brackets: they also depend on the brackets left open by the preceding chunks.
+        signature = bracket_signature(state)
+        result = cached("brackets:" + signature + ":" + chunk_hash, first, check_chunk_brackets, chunk_text, signature)
+        apply_chunk_brackets(result, offset, state, found)
+        offset += len(chunk_text)
+
+    check_orphan_brackets.left_open(state, found)
+    diagnostics.extend(orphan_diagnostics(check_orphan_brackets.locate_orphans(text, found)))
+    diagnostics = sort_diagnostics(diagnostics)
+
+    cache["file"] = file_hash
+    cache["diagnostics"] = [list(diagnostic) for diagnostic in diagnostics]
+    cache["chunks"] = chunks
+    return diagnostics, len(starts) - 1, len(analysed)
+
+def check_file(filename, use_cache=True):
+    """Checks a transcript file, using its cache if use_cache is True.
+
+        Returns the sorted list of Diagnostic tuples, the number of chunks and the number of chunks analysed."""
+
+    with open(filename, "r", encoding="utf-8") as f:
+        text = f.read()
+    if not use_cache:
+        return check_text(text, new_cache())
+    cache = load_cache(filename)
+    result = check_text(text, cache)
+    if result[1]:
+        save_cache(filename, cache)
+    return result
+
+def compare(old, new):
+    """Lists the diagnostics of new that are not in old, and those of old that are not in new.
+
+        Diagnostics are compared without their line number, so that a problem is not considered new
+        when lines have only been added or removed before it."""
+
+    def identity(diagnostic):
+        return (diagnostic.rule, diagnostic.column, diagnostic.excerpt, diagnostic.message)
+
+    old_count = Counter(identity(diagnostic) for diagnostic in old)
+    new_count = Counter(identity(diagnostic) for diagnostic in new)
+    added = []
+    for diagnostic in new:
+        if old_count[identity(diagnostic)] > 0:
+            old_count[identity(diagnostic)] -= 1
+        else:
+            added.append(diagnostic)
+    resolved = []
+    for diagnostic in old:
+        if new_count[identity(diagnostic)] > 0:
+            new_count[identity(diagnostic)] -= 1
+        else:
+            resolved.append(diagnostic)
+    return added, resolved
+
+def format_diagnostic(diagnostic, sign=""):
+    """Returns a diagnostic as two lines of text."""
+
+    return (sign + "line " + str(diagnostic.line) + ", column " + str(diagnostic.column)
+            + " [" + diagnostic.rule + "] " + diagnostic.message + "\n    " + diagnostic.excerpt + "\n")
+
+def report(filename, diagnostics, chunks, analysed, output=sys.stdout):
+    """Writes all diagnostics of a file."""
+
+    if chunks:
+        output.write(filename + ": " + str(len(diagnostics)) + " problems (" + str(analysed)
+                     + " of " + str(chunks) + " chunks analysed)\n")
+    else:
+        output.write(filename + ": " + str(len(diagnostics)) + " problems (file unchanged)\n")
+    for diagnostic in diagnostics:
+        output.write(format_diagnostic(diagnostic))
+
+def watch(filenames, poll=1.0, use_cache=True, output=sys.stdout):
+    """Checks the files each time they are saved and writes the new and resolved diagnostics, until interrupted."""
+
+    previous = {}
+    stamps = {}
+    for filename in filenames:
+        previous[filename] = check_file(filename, use_cache)[0]
+        stamps[filename] = os.stat(filename).st_mtime_ns
+        report(filename, previous[filename], 0, 0, output)
+    output.write("\nWatching " + str(len(filenames)) + " file(s); press Ctrl+C to stop.\n")
+    output.flush()
+    try:
+        while True:
+            time.sleep(poll)
+            for filename in filenames:
+                try:
+                    stamp = os.stat(filename).st_mtime_ns
+                except OSError:
+                    continue
+                if stamp == stamps[filename]:
+                    continue
+                stamps[filename] = stamp
+                diagnostics, chunks, analysed = check_file(filename, use_cache)
+                added, resolved = compare(previous[filename], diagnostics)
+                previous[filename] = diagnostics
+                output.write("\n" + time.strftime("%H:%M:%S") + " " + filename + ": " + str(len(diagnostics))
+                             + " problems, " + str(len(added)) + " new, " + str(len(resolved)) + " resolved ("
+                             + str(analysed) + " of " + str(chunks) + " chunks analysed)\n")
+                for diagnostic in added:
+                    output.write(format_diagnostic(diagnostic, "+ "))
+                for diagnostic in resolved:
+                    output.write(format_diagnostic(diagnostic, "- "))
+                output.flush()
+    except KeyboardInterrupt:
+        output.write("\n---Watch stopped.---\n")
+
+def main(argv=None):
+    """Checks transcripts from the command line. Returns 1 if problems are found (0 in watch mode)."""
+
+    parser = argparse.ArgumentParser(prog="python -m TIGRformat recheck",
+                                     description="Check transcripts for orphan brackets and combicheck problems, "
+                                                 "re-analysing only what has changed since the last check.")
+    parser.add_argument("transcripts", nargs="+", help="transcript files")
+    parser.add_argument("--watch", action="store_true",
+                        help="check the files again each time they are saved and show new and resolved problems")
+    parser.add_argument("--poll", type=float, default=1.0, help="seconds between two looks at the files in watch mode (default: 1)")
+    parser.add_argument("--no-cache", action="store_true", help="neither use nor update the cache")
+    args = parser.parse_args(argv)
+
+    if args.watch:
+        watch(args.transcripts, args.poll, not args.no_cache)
+        return 0
+    status = 0
+    for filename in args.transcripts:
+        diagnostics, chunks, analysed = check_file(filename, not args.no_cache)
+        report(filename, diagnostics, chunks, analysed)
+        if diagnostics:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,219 @@
+#Overlapping talk found from the beginning and ending times of segments
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#"traditional transcript" file exported from ELAN with timecodes ("begin - end" line after each segment)
+#and without suppressing repeated speaker labels.
+#OUTPUT:
+#the segments of the transcript (speaker label, beginning and ending time, line of the timecode)
+#and, for each segment, whether it starts during a segment of another speaker or overlaps one.
+
+#EXPLANATION:
+#By default, TIGRtimecode.timecode_at_intervals recognizes the beginning of overlapping speech by the square bracket
+#placed by ELAN's Jefferson style alignment at the position of the timecode in the preceding line.
+#This depends on the transcribers' brackets and on their alignment.
+#Since the export indicates the beginning and the ending time of each segment, overlap can be found from the times:
+#a segment starts in overlap if it starts during a segment of another speaker.
+#The segments are sorted by beginning; for each one, the latest ending among the segments that start before it
+#is stored, together with the latest ending of another speaker, so that the segments of another speaker
+#still going on at any time are found by a binary search (OverlapIndex).
+#Read line by line, the segments of the export come in order of beginning and the same is done while reading
+#(OverlapSweep), keeping only the latest endings in memory.
+#Segments of AMBIENT_NOISES are not speech: they are neither in overlap nor overlapped.
+#An overlap shorter than MIN_OVERLAP milliseconds is ignored (segment boundaries set by hand are not exact).
+#The same index is used by TIGRlayout.combicheck (option --overlap) to compare the transcribers' brackets
+#with the overlap found from the times.
+#Usage:
+#python -m TIGRformat tcfilter TRANSCRIPT.txt -i 30 --timing
+
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from ..transcript import classify_line, LABEL
+from .timeconvert import parse_timecode
+
+#Overlap (in milliseconds) below which two segments are not considered to overlap.
+MIN_OVERLAP = 50
+#Label of the tier of ambient noises, whose segments are not speech.
+NOISE_LABEL = "AMBIENT_NOISES"
+
+#A segment of the transcript: speaker label, beginning and ending time in milliseconds,
+#index of the line with its timecode.
+Segment = namedtuple("Segment", ["label", "start", "end", "line"])
+
+
+def segment_end(line, offset):
+    """Returns the ending time of the segment whose timecode line "begin - end" starts at offset,
+    or None if the line has no ending time (e.g. a "--TIMECODE--" line of a processed transcript)."""
+
+    if line[offset + 12:offset + 15] != " - ":
+        return None
+    try:
+        return parse_timecode(line[offset + 15:offset + 27])
+    except ValueError:
+        return None
+
+def label_of(line):
+    """Returns the speaker label of a label line (its first word)."""
+
+    return line.split(None, 1)[0]
+
+def transcript_segments(transcript):
+    """Lists the segments of a transcript parsed into a Transcript.
+
+    Each timecode line "begin - end" belongs to the segment of the nearest preceding speaker label.
+    A timecode line repeated on the next line (duplicate exported by ELAN) is not a new segment."""
+
+    lines = transcript.lines
+    kinds = transcript.kinds
+    times = transcript.times
+    segments = []
+    label = None
+    for i in range(len(lines)):
+        if kinds[i] == LABEL:
+            label = label_of(lines[i])
+        elif times[i] >= 0 and label is not None and (i == 0 or lines[i] != lines[i - 1]):
+            end = segment_end(lines[i], transcript.offsets[i])
+            if end is not None:
+                segments.append(Segment(label, times[i], end, i))
+    return segments
+
+def iter_segments(lines):
+    """Yields the segments of a transcript read line by line (see transcript_segments()).
+
+    lines is any iterable of lines, e.g. an open file."""
+
+    label = None
+    preceding = None
+    for i, line in enumerate(lines):
+        kind, flags, field, offset, time = classify_line(line)
+        if kind == LABEL:
+            label = label_of(line)
+        elif time >= 0 and label is not None and line != preceding:
+            end = segment_end(line, offset)
+            if end is not None:
+                yield Segment(label, time, end, i)
+        preceding = line
+
+def add_ending(latest, label, end):
+    """Adds the ending of a segment to latest, the list [latest ending, its label, latest ending of another label,
+    its label], and returns the new list."""
+
+    best_end, best_label, second_end, second_label = latest
+    if label == best_label:
+        return [max(best_end, end), best_label, second_end, second_label]
+    if end > best_end:
+        return [end, label, best_end, best_label]
+    if end > second_end:
+        return [best_end, best_label, end, label]
+    return latest
+
+def other_ending(latest, label):
+    """Returns the latest ending and the label of a segment of another speaker than label in latest (see add_ending())."""
+
+    if latest[1] != label:
+        return latest[0], latest[1]
+    return latest[2], latest[3]
+
+
+class OverlapIndex:
+    """Segments sorted by beginning, with the latest endings of the segments starting before each of them.
+
+        Each query is answered by a binary search in the beginnings (O(log n))."""
+
+    def __init__(self, segments):
+        segments = sorted((segment for segment in segments if segment.label != NOISE_LABEL),
+                          key=lambda segment: segment.start)
+        self.starts = array("q", [segment.start for segment in segments])
+        self.best_ends = array("q")
+        self.second_ends = array("q")
+        self.best_labels = []
+        self.second_labels = []
+        latest = [-1, None, -1, None]
+        for segment in segments:
+            latest = add_ending(latest, segment.label, segment.end)
+            self.best_ends.append(latest[0])
+            self.best_labels.append(latest[1])
+            self.second_ends.append(latest[2])
+            self.second_labels.append(latest[3])
+
+    def other_ending(self, label, time):
+        """Returns the latest ending, and its label, of the segments of another speaker than label
+        that start before time (-1 and None if there is none)."""
+
+        position = bisect_left(self.starts, time) - 1
+        if position < 0:
+            return -1, None
+        if self.best_labels[position] != label:
+            return self.best_ends[position], self.best_labels[position]
+        return self.second_ends[position], self.second_labels[position]
+
+    def starts_inside(self, segment, minimum=MIN_OVERLAP):
+        """Returns the label of the speaker during whose segment the segment starts, or None."""
+
+        if segment.label == NOISE_LABEL:
+            return None
+        end, label = self.other_ending(segment.label, segment.start)
+        if end > segment.start + minimum:
+            return label
+        return None
+
+    def overlaps(self, segment, minimum=MIN_OVERLAP):
+        """Checks if the segment overlaps a segment of another speaker by more than minimum milliseconds."""
+
+        if segment.label == NOISE_LABEL:
+            return False
+        end, label = self.other_ending(segment.label, segment.end - minimum)
+        return end > segment.start + minimum
+
+
+class OverlapSweep:
+    """Latest endings of the segments read so far, for segments read in order of beginning.
+
+        Segments starting at the same time are not in overlap with each other: they are added to the latest endings
+        once a segment starting later is checked."""
+
+    def __init__(self):
+        self.latest = [-1, None, -1, None]
+        self.pending = []
+        self.pending_start = None
+
+    def starts_inside(self, segment, minimum=MIN_OVERLAP):
+        """Returns the label of the speaker during whose segment the segment starts, or None,
+        among the segments added so far."""
+
+        if segment.label == NOISE_LABEL:
+            return None
+        if self.pending and self.pending_start < segment.start:
+            for label, end in self.pending:
+                self.latest = add_ending(self.latest, label, end)
+            self.pending = []
+        end, label = other_ending(self.latest, segment.label)
+        if end > segment.start + minimum:
+            return label
+        return None
+
+    def add(self, segment):
+        """Adds a segment, which must not start before the segments already added."""
+
+        if segment.label == NOISE_LABEL:
+            return
+        if segment.start != self.pending_start:
+            for label, end in self.pending:
+                self.latest = add_ending(self.latest, label, end)
+            self.pending = []
+            self.pending_start = segment.start
+        self.pending.append((segment.label, segment.end))
+
+
+def overlapping_lines(transcript):
+    """Returns the set of the indexes of the timecode lines of the segments that start in overlap."""
+
+    segments = transcript_segments(transcript)
+    index = OverlapIndex(segments)
+    return {segment.line for segment in segments if index.starts_inside(segment) is not None}
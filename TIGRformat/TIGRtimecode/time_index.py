@@ -0,0 +1,233 @@
+#Index from video time to transcript lines
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#- transcript file processed by TIGRtimecode.timecode_at_intervals (and possibly by the following steps,
+#  including the numbering of lines);
+#- a time (e.g. 00:41:12.300) or two times delimiting an excerpt.
+#OUTPUT:
+#- an index file saved next to the transcript, appending "_tcindex" to the document name and the extension .tsv;
+#- the lines of the transcript corresponding to the time, or the excerpt between the two times.
+
+#EXPLANATION:
+#The timecodes kept in a processed transcript allow to find a passage of the transcript in the video.
+#The index allows to go the other way, from a time in the video to the transcript.
+#It has one row per "--TIMECODE--" line, sorted by time, with the following columns:
+#- ms: the timecode in milliseconds;
+#- line: the number of the line (counted from 1 in the whole file) containing the corresponding timecode mark "((TC))";
+#- offset: the position in bytes of the beginning of that line in the file;
+#- speaker: the speaker label of the etic turn containing the timecode mark.
+#The first line of the index file records the size and the modification time (in nanoseconds) of the transcript file:
+#if the transcript has been modified since, the index must be created again
+#(the size alone does not change when a timecode or a timecode mark is corrected).
+#To find a time, the index is searched by bisection and the transcript file is read
+#from the offset of the corresponding line only: the rest of the transcript is not read.
+#Usage:
+#python -m TIGRformat timeindex TRANSCRIPT.txt                                  (create the index)
+#python -m TIGRformat timeindex TRANSCRIPT.txt --at 00:41:12.300                (lines at a time)
+#python -m TIGRformat timeindex TRANSCRIPT.txt --at 00:41:12.300 00:42:00.000   (excerpt between two times)
+
+import argparse
+import os
+from bisect import bisect_right
+from collections import namedtuple
+
+from ..transcript import Transcript, LABEL, TIMECODE, HAS_MARK
+from ..TIGRlayout.number_lines import remove_line_numbers
+from .timeconvert import parse_timecodes, format_timecode
+
+#One row of the index (see above).
+IndexEntry = namedtuple("IndexEntry", ["ms", "line", "offset", "speaker"])
+
+COLUMNS = ["ms", "line", "offset", "speaker"]
+
+
+def index_name(filename):
+    """Returns the name of the index file of a transcript file."""
+
+    return filename[:-4]+"_tcindex.tsv"
+
+def build_index(data):
+    """Lists the index entries of a processed transcript read as bytes (file opened in "rb" mode).
+
+    Returns the list of IndexEntry tuples sorted by time."""
+
+    raw_lines = data.splitlines(keepends=True)
+    offsets = []
+    offset = 0
+    for raw_line in raw_lines:
+        offsets.append(offset)
+        offset += len(raw_line)
+    content = [raw_line.decode("utf-8").rstrip("\r\n") + "\n" for raw_line in raw_lines]
+    transcript = Transcript(remove_line_numbers(content))
+
+    #Each "--TIMECODE--" line is paired with the latest timecode mark found since the preceding
+    #"--TIMECODE--" line (timecode lines are placed after their mark by timecode_at_intervals).
+    #Without a mark, the timecode line itself is indexed.
+    entries = []
+    speaker = ""
+    mark = None
+    for i in range(len(transcript)):
+        if transcript.kinds[i] == LABEL:
+            speaker = transcript.speaker(i)
+        if transcript.kinds[i] == TIMECODE and transcript.times[i] >= 0:
+            if mark is None:
+                mark = (i, speaker)
+            line, mark_speaker = mark
+            entries.append(IndexEntry(transcript.times[i], line + 1, offsets[line], mark_speaker))
+            mark = None
+        if transcript.flags[i] & HAS_MARK:
+            mark = (i, speaker)
+    entries.sort()
+    return entries
+
+def file_stamp(filename):
+    """Returns the size and the modification time in nanoseconds of a file, which change when it is modified."""
+
+    status = os.stat(filename)
+    return status.st_size, status.st_mtime_ns
+
+def write_index(save, entries, stamp):
+    """Saves the index entries as a tab-separated file, preceded by the size and modification time
+    of the transcript file (see file_stamp())."""
+
+    with open(save, "w", encoding="utf-8", newline="\n") as f:
+        f.write("#size\t"+str(stamp[0])+"\t"+str(stamp[1])+"\n")
+        f.write("\t".join(COLUMNS)+"\n")
+        for entry in entries:
+            f.write("\t".join(str(value) for value in entry)+"\n")
+
+def read_index(filename):
+    """Reads an index file saved by write_index().
+
+    Returns the size and modification time of the indexed transcript file (the time is None in an index saved
+    with the size only) and the list of IndexEntry tuples."""
+
+    with open(filename, "r", encoding="utf-8") as f:
+        header = f.readline().rstrip("\n").split("\t")
+        stamp = (int(header[1]), int(header[2]) if len(header) > 2 else None)
+        f.readline()
+        entries = []
+        for row in f:
+            ms, line, offset, speaker = row.rstrip("\n").split("\t")
+            entries.append(IndexEntry(int(ms), int(line), int(offset), speaker))
+    return stamp, entries
+
+def index_file(filename):
+    """Creates the index of a transcript file and saves it next to the file (an existing index is replaced).
+
+    Returns the name of the index file."""
+
+    #The time is taken before reading: if the file is modified meanwhile, the index will be found outdated.
+    stamp = file_stamp(filename)
+    with open(filename, "rb") as f:
+        data = f.read()
+    save = index_name(filename)
+    write_index(save, build_index(data), stamp)
+    return save
+
+
+class TimeIndex:
+    """Index of a transcript file, answering questions about times by bisection.
+
+        The index file is created if it is missing or if the transcript has changed since it was created."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        stamp = None
+        if os.path.exists(index_name(filename)):
+            stamp, self.entries = read_index(index_name(filename))
+        if stamp != file_stamp(filename):
+            index_file(filename)
+            stamp, self.entries = read_index(index_name(filename))
+        self.times = [entry.ms for entry in self.entries]
+
+    def position(self, ms):
+        """Returns the position in the index of the last timecode at or before ms (-1 if ms precedes all timecodes)."""
+
+        return bisect_right(self.times, ms) - 1
+
+    def end_offset(self, position):
+        """Returns the offset where the passage starting at the index entry at position ends."""
+
+        start = self.entries[position].offset
+        for entry in self.entries[position + 1:]:
+            if entry.offset > start:
+                return entry.offset
+        return None
+
+    def read(self, start, end):
+        """Reads the transcript file between two offsets (until the end of the file if end is None)."""
+
+        with open(self.filename, "rb") as f:
+            f.seek(start)
+            if end is None:
+                data = f.read()
+            else:
+                data = f.read(end - start)
+        return data.decode("utf-8")
+
+    def lines_at(self, ms):
+        """Returns the index entry of the timecode at or before ms and the lines from its mark to the next timecode mark
+        (None and "" if ms precedes all timecodes)."""
+
+        position = self.position(ms)
+        if position < 0:
+            return None, ""
+        entry = self.entries[position]
+        return entry, self.read(entry.offset, self.end_offset(position))
+
+    def excerpt(self, start_ms, end_ms):
+        """Returns the lines of the transcript between two times, from the timecode mark at or before start_ms
+        to the first timecode mark after end_ms ("" if end_ms precedes all timecodes).
+        If start_ms precedes all timecodes, the excerpt starts at the first timecode mark."""
+
+        last = self.position(end_ms)
+        if last < 0:
+            return ""
+        first = max(self.position(start_ms), 0)
+        start = min(entry.offset for entry in self.entries[first:last + 1])
+        end = self.end_offset(last)
+        if end is not None and end <= start:
+            end = None
+        return self.read(start, end)
+
+
+def main(argv=None):
+    """Creates the index of a transcript or answers a question about times from the command line."""
+
+    parser = argparse.ArgumentParser(prog="python -m TIGRformat timeindex",
+                                     description="Find the lines of a processed transcript corresponding to a time in the video.")
+    parser.add_argument("transcript", help="transcript processed by timecode_at_intervals")
+    parser.add_argument("--at", nargs="+", metavar="TIME",
+                        help="time (HH:MM:SS.mmm) whose lines are printed, or two times delimiting an excerpt")
+    args = parser.parse_args(argv)
+    if args.at is not None and len(args.at) > 2:
+        parser.error("--at takes one or two times")
+    try:
+        times = parse_timecodes(args.at or [])
+    except ValueError as error:
+        parser.error(str(error))
+
+    if not times:
+        print("Index saved as", index_file(args.transcript))
+        return 0
+    index = TimeIndex(args.transcript)
+    if len(times) == 1:
+        entry, text = index.lines_at(times[0])
+        if entry is not None:
+            print("Timecode", format_timecode(entry.ms), "at line", entry.line, "of the file (" + entry.speaker + ")")
+    else:
+        text = index.excerpt(min(times), max(times))
+    if not text:
+        print("No timecode of the transcript at or before", format_timecode(max(times)))
+    print(text, end="")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
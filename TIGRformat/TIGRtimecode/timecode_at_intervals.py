@@ -1,255 +1,527 @@
-#Timecodes in transcripts at user-defined intervals
-
-#This script is part of the "TIGRformat" package.
-#The package supports a workflow in which "traditional transcripts" are exported from ELAN
-#and processed automatically and manually in view of qualitative analysis.
-#Refer to the package's readme file for more information.
-
-#INPUT: 
-#- "traditional transcript" file exported from ELAN with timecodes and without suppressing repeated speaker labels;
-#- interval in seconds defined by the user.
-#OUTPUT: a processed transcript file in which only the following timecodes are maintained:
-#- beginning time of an ELAN segment;
-#- not the beginning of overlapping speech;
-#- at roughly the interval defined by the user.
-
-#EXPLANATION:
-#The script's specific goal is to yield transcripts
-#- that are easily readable to the human eye, 
-#- that allow to retrieve discourse in the corresponding video or audio recording.
-#To achieve this goal, the script reduces the number of timecodes in the transcript.
-#NOTA BENE: 
-#Segment beginnings that are not in overlap usually correspond to transcribers' choices that respect word boundaries.
-#In the data this script was developed for, in many cases a segment boundary has been created at the beginning of overlapping speech.
-#In those cases, the segment may not respect word boundaries because overlap may start in the middle of a word.
-#That's why the script ignores timecodes at the beginning of overlapping speech:
-#This restriction has the effect of avoiding word-internal timecodes in the transcript.
-
-#AUTHOR: Johanna Miecznikowski, Università della Svizzera italiana
-#FUNDING: 
-#- InfinIta project, grant no. 192771 of the Swiss National Science Foundation
-#  (https://data.snf.ch/grants/grant/192771)
-#- ShareTIGR - Sharing the TIGR corpus of spoken Italian: an ORD case study, 
-#  project funded by USI Università della Svizzera italiana
-#  (https://search.usi.ch/projects/3090)
-
-#When using the script please mention author and funding institution in acknowledgements.
-#CREATED: December 2023
-#Bug fixed October 18, 2024: When there are pauses in the transcript that are longer than the
-#timecode interval defined by the user, the script now updates the counter by assigning it the
-#value in seconds of the first timecode after the pause. 
-#Bug fixed May 3, 2025: list(dict.fromkeys()) is applied to the list of all line-initial 
-#timecodes in order to eliminate any timecode duplicates.
-
-def run_function():
-
-    #Import the Regex module.
-    import re
-
-    #Function to check if preceding text line starts with overlap
-    def check_overlap(t, t_line, text):
-        """Checks if timecode refers to overlapping talk.
-
-        In a traditional transcript text exported from ELAN with timecodes, 
-        each segment is listed on a separate line and the corresponding timecode
-        is placed in the immediately following line.
-        This function checks if the text in the immediately preceding line
-        starts with an overlap (square brackets)."""    
-
-        t_position = t_line.index(t)
-        index_current_line = text.index(t_line)
-        preceding = text[index_current_line - 1]
-        if preceding[t_position] == "[":
-            return True
-        else:
-            return False
-
-    #Function to convert tc exported from ELAN into seconds
-    def timeconvert(tc):
-        """Converts video timecode into seconds.
-
-        Works for the hours:minutes:seconds.milliseconds format.""" 
-        tc_list = tc.split(":")
-        if tc_list:
-            hours = int(tc_list[0])
-            minutes = int(tc_list[1])
-            seconds = float(tc_list[2])
-            total_seconds = 3600*hours + 60*minutes + seconds
-            return total_seconds
-        else: 
-            print("Hours, minutes and seconds have not been successfully retrieved from timecode.")
-
-    #Instruct user
-    print("This script extracts a list of timecodes from a transcript at intervals defined by the user.\n")
-
-    #Open a transcript file containing timecodes.
-    attempts = 0
-    while attempts < 3:
-        try:
-            filename = input("Write the file path of a traditional transcript exported from ELAN: ")
-            file = open(filename, "r", encoding="utf-8")
-            input_successful = True
-            break
-        except:
-            if attempts < 2:
-                print("Problem with name or location of the file. Try again.")
-                input_successful = False
-                attempts += 1
-            else:
-                print("Problem with name or location of the file.")
-                input_successful = False
-                attempts += 1
-
-    if input_successful == True:
-
-        #Ask the user to define the timecode intervals.
-        while True:
-            try:
-                print("\nAt which interval do you wish to print timecodes in your transcript?")
-                interval = int(input("Write the desired number of seconds: "))
-            except ValueError:
-                print("You need to input a number. Try again.")
-                continue
-            else:
-                break
-
-        #Read the file as a sequence of lines and close it.
-        content = file.readlines()
-        file.close()
-
-        #Start by creating an empty list for line-initial timecodes.
-        #Find all timecodes at the beginning of a line.
-        #Complete the list by inserting those line-initial timecodes that do not refer to overlapping talk.
-        first_tc_list = []
-        for line in content:
-            first_tc = re.search(r"\d\d:\d\d:\d\d\.\d{3}", line)
-            if first_tc:
-                if check_overlap(first_tc.group(), line, content) == False:
-                    first_tc_list.append(first_tc.group())
-            else:
-                continue
-
-        #Transform the list of line-initial timecodes into a dictionary (maintaining 
-        #the order of the items) and back to a list. Since dictionaries do not allow 
-        #for duplicates, the effet is to eliminate any timecode duplicates. 
-        first_tc_list = list(dict.fromkeys(first_tc_list))
-
-        #Create an empty list to store timecodes at intervals defined by the user's input.
-        #Insert the first timecode of the transcript into the list.
-        interval_list = []        
-        interval_list.append(first_tc_list[0])
-
-        #Convert the first timecode of the transcript into seconds.
-        #Declare that amount of seconds as the starting point for counting intervals.
-        counter = timeconvert(first_tc_list[0])
-
-        #Loop through the list of line-initial timecodes: convert each timecode in seconds
-        #until you reach the first timecode that is greater than the initial counter + the interval defined by the user. 
-        #Insert that timecode into the list of timecodes at intervals and either update the counter by adding the interval
-        #or (when the timecode just added to the list occurs at a distance of more than two times the interval from the preceding timecode)
-        #update the counter by assigning it the value of the timecode just added. 
-        for tc in first_tc_list:
-            conv_in_seconds = timeconvert(tc)
-            if conv_in_seconds < counter + interval:
-                continue
-            else:
-                interval_list.append(tc)
-                if conv_in_seconds > counter + (2 * interval):
-                    counter = conv_in_seconds
-                else:
-                    counter = counter + interval
-
-        #Output the number of timecodes that should be maintained in the transcript.
-        print("\nThis is how many timecodes will be left in the transcript:")
-        print(len(interval_list))
-
-        #Remove lines that contain timecode which is not in the interval list.
-        for i in range(len(content)):
-            first_tc = re.search(r"\d\d:\d\d:\d\d\.\d{3}", content[i])
-            if not first_tc:
-                continue
-            else:
-                for j in interval_list:
-                    if first_tc.group() == j:
-                        has_interval_timecode = True
-                        break
-                    else:
-                        has_interval_timecode = False
-                if has_interval_timecode == False:
-                    content[i] = ""
-                else:
-                    continue
-
-        #Determine number of spaces before text beginning
-        for line in content:
-            first_tc = re.search(r"\d\d:\d\d:\d\d\.\d{3}", line)
-            if first_tc:
-                spaces = line.index(first_tc.group())
-                break
-            else:
-                continue
-
-        #Remove ending time and add line-initial "--TIMECODE--" and store index of timecode lines in list.
-        tc_lines = []
-        for i in range(len(content)):
-            first_tc = re.search(r"\d\d:\d\d:\d\d\.\d{3}", content[i])
-            if first_tc:
-                content[i] = "--TIMECODE--"+(" " * (spaces-12))+first_tc.group()+"\n"
-                tc_lines.append(i)
-            else:
-                continue
-
-        #Place a marker in transcript text corresponding to timecode.
-        #N.B. When repeated speaker labels are not suppressed during export from ELAN,
-        #each speaker label indicates the beginning of a segment. 
-        #This property is used here to find the nearest segment beginning looping through lines
-        #backwards from the line containing timecode.
-        for i in tc_lines:
-            for counter in range(1, 12):
-                if len(content[i-counter]) >=1:
-                    if (content[i-counter])[0] != " ":
-                        string_1 = (content[i-counter])[:spaces]
-                        string_2 = "((TC)) "
-                        string_3 = (content[i-counter])[spaces:]
-                        content[i-counter] = string_1+string_2+string_3
-                        break
-                else:
-                    continue  
-
-        #Shift up timecode lines if distant from timecode markers.
-        for i in range(len(content)):
-            if re.search("TC", content[i]):
-                for line in content[(i+1):len(content)]:
-                    if re.match("-", line):
-                        store_c = line
-                        store_i = content.index(line)
-                        break
-                if store_i == i+1:
-                    continue
-                else:
-                    content[i] = content[i]+line
-                    content[store_i] = ""
-                    
-        print("\nThese are the first 50 lines of the processed document:\n")
-        for line in content[0:50]:
-            print(line, end="")
-
-        #Save file.
-        save = filename[:-4]+"_tcfltrd.txt"
-        with open(save, "x", encoding="utf-8") as f:   
-            for line in content:
-                f.write(line)
-        print("\n---Timecode filtered and timecode marks inserted---")
-        print("\nFile saved as", save)
-
-
-        #Add statement about the timecode interval chosen at the end of the file.
-        with open(save, "a", encoding="utf-8") as f:
-            tc_metadata = "\nThis transcript contains indications of timecode at intervals of approximately "+str(interval)+" seconds.\n"
-            f.write(tc_metadata)
-    else:
-        print("\nInput failed several times.")
-        print("---Operation interrupted.---")
-
-#Perform all operations
-run_function()
+#Timecodes in transcripts at user-defined intervals
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT: 
+#- "traditional transcript" file exported from ELAN with timecodes and without suppressing repeated speaker labels;
+#- interval in seconds defined by the user (or several intervals, separated by commas).
+#OUTPUT: a processed transcript file in which only the following timecodes are maintained:
+#- beginning time of an ELAN segment;
+#- not the beginning of overlapping speech;
+#- at roughly the interval defined by the user.
+#When several intervals are given, one file is saved for each interval (suffix "_tcfltrd_XXs");
+#the transcript is read and checked for overlap only once.
+
+#EXPLANATION:
+#The script's specific goal is to yield transcripts
+#- that are easily readable to the human eye, 
+#- that allow to retrieve discourse in the corresponding video or audio recording.
+#To achieve this goal, the script reduces the number of timecodes in the transcript.
+#NOTA BENE: 
+#Segment beginnings that are not in overlap usually correspond to transcribers' choices that respect word boundaries.
+#In the data this script was developed for, in many cases a segment boundary has been created at the beginning of overlapping speech.
+#In those cases, the segment may not respect word boundaries because overlap may start in the middle of a word.
+#That's why the script ignores timecodes at the beginning of overlapping speech:
+#This restriction has the effect of avoiding word-internal timecodes in the transcript.
+
+#AUTHOR: Johanna Miecznikowski, Università della Svizzera italiana
+#FUNDING: 
+#- InfinIta project, grant no. 192771 of the Swiss National Science Foundation
+#  (https://data.snf.ch/grants/grant/192771)
+#- ShareTIGR - Sharing the TIGR corpus of spoken Italian: an ORD case study, 
+#  project funded by USI Università della Svizzera italiana
+#  (https://search.usi.ch/projects/3090)
+
+#When using the script please mention author and funding institution in acknowledgements.
+#CREATED: December 2023
+#Bug fixed October 18, 2024: When there are pauses in the transcript that are longer than the
+#timecode interval defined by the user, the script now updates the counter by assigning it the
+#value in seconds of the first timecode after the pause. 
+#Bug fixed May 3, 2025: list(dict.fromkeys()) is applied to the list of all line-initial 
+#timecodes in order to eliminate any timecode duplicates.
+#Rewritten to process long transcripts in linear time: lines are located by their index
+#instead of being searched in the document, and the timecodes to maintain are looked up in a set.
+#If NumPy is installed, the timecodes are selected with array operations (binary search in milliseconds).
+#Streaming mode (iter_filter_timecodes): the transcript file is read twice, line by line, first to select
+#the timecodes and then to process the lines; only the timecodes maintained and the last 11 lines,
+#in which a timecode mark may still be inserted, are kept in memory.
+#Option timing (--timing): overlapping speech is found from the beginning and ending times of the segments
+#instead of the square brackets (see TIGRtimecode.overlap): a timecode is ignored if its segment starts
+#during a segment of another speaker, whatever the transcribers' brackets.
+
+from collections import deque
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from ..transcript import Transcript, classify_line, CONTINUATION, EMPTY, LABEL, TIMECODE, HAS_MARK
+from .overlap import OverlapSweep, Segment, label_of, overlapping_lines, segment_end
+
+#Number of lines before a timecode line in which the timecode mark is placed.
+MARK_WINDOW = 11
+#Beginning of the statement on the timecode interval added at the end of the file (see timecode_statement()).
+STATEMENT = "This transcript contains indications of timecode"
+
+
+#Function to check if preceding text line starts with overlap
+def check_overlap(text, index, t_position):
+    """Checks if timecode refers to overlapping talk.
+
+    In a traditional transcript text exported from ELAN with timecodes, 
+    each segment is listed on a separate line and the corresponding timecode
+    is placed in the immediately following line.
+    This function checks if the text in the line immediately preceding
+    the line at index starts with an overlap (square brackets).
+    t_position is the position of the timecode in the line at index."""    
+
+    if index == 0:
+        return False
+    preceding = text[index - 1]
+    return len(preceding) > t_position and preceding[t_position] == "["
+
+def select_positions(times, interval):
+    """Returns the positions of the timecodes to be maintained at the interval defined by the user.
+
+    times is a list or array of timecodes in milliseconds, in the order of the transcript,
+    and the interval is expressed in milliseconds.
+    The first timecode is always maintained. The following ones are maintained when they are
+    at least one interval after the counter, which then moves on by one interval or,
+    after a gap longer than two intervals, to the timecode just maintained."""
+
+    positions = [0]
+    counter = int(times[0])
+
+    #When the timecodes are in increasing order (as they are in transcripts exported from ELAN),
+    #the next timecode to maintain is found by a binary search in the array,
+    #so that only the maintained timecodes are visited.
+    if numpy is not None and interval > 0 and len(times) > 1:
+        times = numpy.asarray(times, dtype=numpy.int64)
+        if numpy.all(times[1:] >= times[:-1]):
+            position = 0
+            while True:
+                position = max(int(numpy.searchsorted(times, counter + interval)), position + 1)
+                if position >= len(times):
+                    return positions
+                positions.append(position)
+                time = int(times[position])
+                if time > counter + (2 * interval):
+                    counter = time
+                else:
+                    counter = counter + interval
+
+    #Otherwise loop through all timecodes.
+    for position in range(len(times)):
+        time = int(times[position])
+        if time < counter + interval:
+            continue
+        else:
+            positions.append(position)
+            if time > counter + (2 * interval):
+                counter = time
+            else:
+                counter = counter + interval
+    return positions
+
+def line_initial_timecodes(content, timing=False):
+    """Lists the line-initial timecodes that may be maintained in a transcript, whatever the interval.
+
+    The document must be opened as a list of lines (file.readlines()),
+    or parsed into a Transcript.
+    If timing is True, overlapping talk is found from the times of the segments instead of the square brackets.
+    Returns the list of timecodes, without duplicates, and their values in milliseconds."""
+
+    transcript = content if isinstance(content, Transcript) else Transcript(content)
+    content = transcript.lines
+
+    #Start by creating an empty list for line-initial timecodes.
+    #Find all timecodes at the beginning of a line.
+    #Complete the list by inserting those line-initial timecodes that do not refer to overlapping talk.
+    #A timecode line repeated on the next line (duplicate exported by ELAN)
+    #refers to the same segment as the first one, so the same result is used.
+    first_tc_list = []
+    first_tc_lines = {}
+    overlap = False
+    if timing:
+        in_overlap = overlapping_lines(transcript)
+    for i in range(len(content)):
+        first_tc = transcript.timecode(i)
+        if first_tc:
+            if i == 0 or content[i] != content[i - 1]:
+                if timing:
+                    overlap = i in in_overlap
+                else:
+                    overlap = check_overlap(content, i, transcript.offsets[i])
+            if overlap == False:
+                first_tc_list.append(first_tc)
+                first_tc_lines.setdefault(first_tc, i)
+        else:
+            continue
+
+    #Transform the list of line-initial timecodes into a dictionary (maintaining 
+    #the order of the items) and back to a list. Since dictionaries do not allow 
+    #for duplicates, the effet is to eliminate any timecode duplicates. 
+    first_tc_list = list(dict.fromkeys(first_tc_list))
+
+    #Retrieve the timecodes in milliseconds, converted once when the transcript was parsed.
+    #first_tc_lines holds the index of the line where each timecode first occurs.
+    first_tc_lines = [first_tc_lines[tc] for tc in first_tc_list]
+    if numpy is not None:
+        times = numpy.frombuffer(transcript.times, dtype=numpy.int64)[first_tc_lines]
+    else:
+        times = [transcript.times[i] for i in first_tc_lines]
+    return first_tc_list, times
+
+def select_timecodes(content, interval, timecodes=None, timing=False):
+    """Lists the timecodes to be maintained in a transcript at the interval defined by the user.
+
+    The document must be opened as a list of lines (file.readlines()),
+    or parsed into a Transcript.
+    The interval is expressed in seconds.
+    timecodes, if given, is the result of line_initial_timecodes() for the same document,
+    so that it is computed only once when several intervals are applied.
+    If timing is True, overlapping talk is found from the times of the segments (see line_initial_timecodes())."""
+
+    if timecodes is None:
+        timecodes = line_initial_timecodes(content, timing)
+    first_tc_list, times = timecodes
+    if not first_tc_list:
+        return []
+    interval_list = [first_tc_list[k] for k in select_positions(times, round(interval * 1000))]
+
+    return interval_list
+
+def apply_timecodes(content, interval_list):
+    """Keeps the timecodes of interval_list in a transcript and inserts the corresponding timecode marks.
+
+    The document must be opened as a list of lines (file.readlines()),
+    or parsed into a Transcript.
+    The list of lines is modified and returned."""
+
+    transcript = content if isinstance(content, Transcript) else Transcript(content)
+    content = transcript.lines
+    kinds = transcript.kinds
+
+    #Remove lines that contain timecode which is not in the interval list.
+    #The interval list is turned into a set so that each look-up takes constant time.
+    maintained = set(interval_list)
+    for i in range(len(content)):
+        first_tc = transcript.timecode(i)
+        if first_tc and first_tc not in maintained:
+            transcript.set_line(i, "")
+
+    #Determine number of spaces before text beginning and store index of timecode lines in list.
+    tc_lines = [i for i in range(len(content)) if transcript.times[i] >= 0]
+    if not tc_lines:
+        return content
+    spaces = transcript.offsets[tc_lines[0]]
+
+    #Remove ending time and add line-initial "--TIMECODE--".
+    for i in tc_lines:
+        first_tc = transcript.timecode(i)
+        transcript.set_line(i, "--TIMECODE--"+(" " * (spaces-12))+first_tc+"\n")
+
+    #Place a marker in transcript text corresponding to timecode.
+    #N.B. When repeated speaker labels are not suppressed during export from ELAN,
+    #each speaker label indicates the beginning of a segment. 
+    #This property is used here to find the nearest segment beginning looping through lines
+    #backwards from the line containing timecode.
+    for i in tc_lines:
+        for counter in range(1, MARK_WINDOW + 1):
+            if kinds[i-counter] != EMPTY:
+                if kinds[i-counter] != CONTINUATION:
+                    string_1 = (content[i-counter])[:spaces]
+                    string_2 = "((TC)) "
+                    string_3 = (content[i-counter])[spaces:]
+                    transcript.set_line(i-counter, string_1+string_2+string_3)
+                    break
+            else:
+                continue  
+
+    #Shift up timecode lines if distant from timecode markers.
+    #The "--TIMECODE--" lines are visited in order with a single pointer:
+    #for each marker, the pointer moves on to the first timecode line after the marker
+    #that has not already been shifted up.
+    dash_lines = [i for i in range(len(content)) if kinds[i] == TIMECODE]
+    pointer = 0
+    for i in range(len(content)):
+        if transcript.flags[i] & HAS_MARK:
+            while pointer < len(dash_lines) and (dash_lines[pointer] <= i or kinds[dash_lines[pointer]] != TIMECODE):
+                pointer += 1
+            if pointer == len(dash_lines):
+                continue
+            store_i = dash_lines[pointer]
+            if store_i == i+1:
+                continue
+            else:
+                transcript.set_line(i, content[i]+content[store_i])
+                transcript.set_line(store_i, "")
+
+    return content
+
+def filter_timecodes(content, interval, timing=False):
+    """Filters the timecodes of a transcript at the interval (in seconds) defined by the user.
+
+    The document must be opened as a list of lines (file.readlines()).
+    If timing is True, overlapping talk is found from the times of the segments (see line_initial_timecodes()).
+    The list is modified and returned."""
+
+    transcript = Transcript(content)
+    return apply_timecodes(transcript, select_timecodes(transcript, interval, timing=timing))
+
+def filter_variants(content, intervals, timing=False):
+    """Filters the timecodes of a transcript at several intervals (in seconds) defined by the user.
+
+    The document must be opened as a list of lines (file.readlines()).
+    The lines are classified and checked for overlap once; each interval then only requires
+    the selection of its timecodes and the insertion of the timecode marks.
+    Returns a dictionary with a new list of lines for each interval; content is not modified."""
+
+    transcript = Transcript(content)
+    timecodes = line_initial_timecodes(transcript, timing)
+    variants = {}
+    for interval in intervals:
+        variant = transcript.copy()
+        variants[interval] = apply_timecodes(variant, select_timecodes(variant, interval, timecodes))
+    return variants
+
+def iter_line_initial_timecodes(lines, timing=False):
+    """Yields the line-initial timecodes that may be maintained, and their values in milliseconds,
+    reading the document line by line (see line_initial_timecodes()). Duplicates are not removed.
+
+    lines is any iterable of lines, e.g. an open file. Only the preceding line is kept
+    and, if timing is True, the latest endings of the segments read (see overlap.OverlapSweep)."""
+
+    preceding = None
+    overlap = False
+    sweep = OverlapSweep() if timing else None
+    label = None
+    for line in lines:
+        kind, flags, field, offset, time = classify_line(line)
+        if timing and kind == LABEL:
+            label = label_of(line)
+        if time >= 0:
+            if line != preceding and timing:
+                #The segments of the export are in order of beginning: only the segments read so far may be
+                #going on when this one starts.
+                end = segment_end(line, offset)
+                overlap = False
+                if end is not None and label is not None:
+                    segment = Segment(label, time, end, None)
+                    overlap = sweep.starts_inside(segment) is not None
+                    sweep.add(segment)
+            elif line != preceding:
+                #Same check as check_overlap(), on the preceding line.
+                overlap = preceding is not None and len(preceding) > offset and preceding[offset] == "["
+            if overlap == False:
+                yield line[offset:offset + 12], time
+        preceding = line
+
+def stream_select_timecodes(lines, interval, timing=False):
+    """Lists the timecodes to be maintained at the interval (in seconds) defined by the user,
+    reading the document line by line. The result is the same as select_timecodes().
+
+    Only the timecodes maintained are kept in memory. A timecode already seen can be skipped without
+    remembering all timecodes: if it was maintained, it is in the list; if not, it was before the counter,
+    which never decreases, so it cannot be maintained now."""
+
+    interval = round(interval * 1000)
+    interval_list = []
+    maintained = set()
+    counter = None
+    for first_tc, time in iter_line_initial_timecodes(lines, timing):
+        if first_tc in maintained:
+            continue
+        if counter is None:
+            counter = time
+        elif time < counter + interval:
+            continue
+        elif time > counter + (2 * interval):
+            counter = time
+        else:
+            counter = counter + interval
+        interval_list.append(first_tc)
+        maintained.add(first_tc)
+    return interval_list
+
+def iter_mark_timecodes(lines, interval_list):
+    """Keeps the timecodes of interval_list and inserts the corresponding timecode marks,
+    reading the document line by line (first part of apply_timecodes()).
+
+    Only the last MARK_WINDOW lines, in which a timecode mark may still be inserted, are kept:
+    the search for the nearest segment beginning stops at the beginning of the document."""
+
+    maintained = set(interval_list)
+    window = deque()
+    spaces = None
+    for line in lines:
+        kind, flags, field, offset, time = classify_line(line)
+        if time >= 0:
+            first_tc = line[offset:offset + 12]
+            if first_tc not in maintained:
+                line = ""
+            else:
+                if spaces is None:
+                    spaces = offset
+                line = "--TIMECODE--"+(" " * (spaces-12))+first_tc+"\n"
+                for counter in range(1, min(MARK_WINDOW, len(window)) + 1):
+                    preceding = window[-counter]
+                    if preceding and preceding[0] != " ":
+                        window[-counter] = preceding[:spaces]+"((TC)) "+preceding[spaces:]
+                        break
+        window.append(line)
+        if len(window) > MARK_WINDOW:
+            yield window.popleft()
+    yield from window
+
+def iter_shift_timecodes(lines, window=MARK_WINDOW + 1):
+    """Shifts up timecode lines distant from their timecode marks, reading the document line by line
+    (second part of apply_timecodes()).
+
+    Each "--TIMECODE--" line goes to the earliest timecode mark still waiting for one, which is the same
+    as visiting the marks in order as apply_timecodes() does. The lines are kept from the earliest
+    waiting mark on; a mark not followed by a "--TIMECODE--" line within window lines stops waiting."""
+
+    held = deque()
+    first = 0
+    marks = deque()
+    for index, line in enumerate(lines):
+        if line[:1] == "-" and marks:
+            mark = marks.popleft()
+            if mark != index - 1:
+                held[mark - first] = held[mark - first] + line
+                line = ""
+        if "TC" in line:
+            marks.append(index)
+        held.append(line)
+        while marks and index - marks[0] >= window:
+            marks.popleft()
+        end = marks[0] if marks else index + 1
+        while first < end:
+            yield held.popleft()
+            first += 1
+    yield from held
+
+def iter_filter_timecodes(file, interval, timing=False):
+    """Filters the timecodes of a transcript at the interval (in seconds) defined by the user,
+    yielding the processed lines one by one (see filter_timecodes()).
+
+    file is a transcript file opened for reading; it is read twice, first to select the timecodes
+    and then to process the lines, so that the document is never held in memory.
+    If timing is True, overlapping talk is found from the times of the segments (see line_initial_timecodes())."""
+
+    interval_list = stream_select_timecodes(file, interval, timing)
+    file.seek(0)
+    yield from iter_shift_timecodes(iter_mark_timecodes(file, interval_list))
+
+def variant_name(filename, interval):
+    """Returns the name under which the transcript filtered at one of several intervals is saved."""
+
+    return filename[:-4]+"_tcfltrd_"+str(interval)+"s.txt"
+
+def parse_intervals(text):
+    """Converts the user's input (one or more numbers of seconds) into a list of intervals.
+
+    The numbers may be separated by commas or spaces. Raises ValueError if the input contains no number."""
+
+    intervals = [int(number) for number in text.replace(",", " ").split()]
+    if not intervals:
+        raise ValueError("No interval given.")
+    return list(dict.fromkeys(intervals))
+
+def timecode_statement(interval):
+    """Returns the statement about the timecode interval added at the end of the file."""
+
+    return "\n"+STATEMENT+" at intervals of approximately "+str(interval)+" seconds.\n"
+
+def run_function():
+
+    #Instruct user
+    print("This script extracts a list of timecodes from a transcript at intervals defined by the user.\n")
+
+    #Open a transcript file containing timecodes.
+    attempts = 0
+    while attempts < 3:
+        try:
+            filename = input("Write the file path of a traditional transcript exported from ELAN: ")
+            file = open(filename, "r", encoding="utf-8")
+            input_successful = True
+            break
+        except:
+            if attempts < 2:
+                print("Problem with name or location of the file. Try again.")
+                input_successful = False
+                attempts += 1
+            else:
+                print("Problem with name or location of the file.")
+                input_successful = False
+                attempts += 1
+
+    if input_successful == True:
+
+        #Ask the user to define the timecode intervals.
+        #Several intervals can be given at once, e.g. "10, 30, 60": a filtered transcript is then saved for each interval.
+        while True:
+            try:
+                print("\nAt which interval do you wish to print timecodes in your transcript?")
+                intervals = parse_intervals(input("Write the desired number of seconds (or several numbers separated by commas): "))
+            except ValueError:
+                print("You need to input a number. Try again.")
+                continue
+            else:
+                break
+
+        #Read the file as a sequence of lines and close it.
+        content = file.readlines()
+        file.close()
+
+        #Classify the lines and list the timecodes that do not refer to overlapping talk (once for all intervals).
+        transcript = Transcript(content)
+        timecodes = line_initial_timecodes(transcript)
+
+        for interval in intervals:
+            if len(intervals) == 1:
+                variant = transcript
+                save = filename[:-4]+"_tcfltrd.txt"
+            else:
+                variant = transcript.copy()
+                save = variant_name(filename, interval)
+
+            #Select the timecodes to be maintained.
+            interval_list = select_timecodes(variant, interval, timecodes)
+
+            #Output the number of timecodes that should be maintained in the transcript.
+            print("\nThis is how many timecodes will be left in the transcript at intervals of", interval, "seconds:")
+            print(len(interval_list))
+
+            #Remove the other timecodes and insert timecode marks.
+            apply_timecodes(variant, interval_list)
+
+            if len(intervals) == 1:
+                print("\nThese are the first 50 lines of the processed document:\n")
+                for line in variant.lines[0:50]:
+                    print(line, end="")
+
+            #Save file.
+            with open(save, "x", encoding="utf-8") as f:   
+                for line in variant.lines:
+                    f.write(line)
+            print("\n---Timecode filtered and timecode marks inserted---")
+            print("\nFile saved as", save)
+
+
+            #Add statement about the timecode interval chosen at the end of the file.
+            with open(save, "a", encoding="utf-8") as f:
+                tc_metadata = timecode_statement(interval)
+                f.write(tc_metadata)
+    else:
+        print("\nInput failed several times.")
+        print("---Operation interrupted.---")
+
+#Perform all operations
+if __name__ == "__main__":
+    run_function()
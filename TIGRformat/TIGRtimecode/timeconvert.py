@@ -1,30 +1,142 @@
-#This script converts video timecode into seconds.
-#TC exported from WLAN is in the hours:minutes:seconds.milliseconds format.
-#The framerate is set to 25 f/s.
-#This is the fourth version of this script.
-#In v4, the conversion has been changed according to the format output by ELAN.
-    
-def timeconvert(h, m, s):
-    """Converts video timecode into seconds.
-
-    Works for the hours:minutes:seconds.milliseconds format.""" 
-    total_seconds = 3600*h + 60*m + s
-    return total_seconds
-    
-#Fetches input from user
-#(an alternative method would be to retrieve TC from transcript text):
-tc = input("Type timecode here:")
-
-#Creates list of strings:
-tc_list = tc.split(":")
-
-#Converts the list items to numbers and assigns these to variables:
-hours = int(tc_list[0])
-minutes = int(tc_list[1])
-seconds = float(tc_list[2])
-
-#Calls timeconvert function:
-total_seconds = timeconvert(hours, minutes, seconds)
-
-#Outputs a statement for the user:
-print("These are", total_seconds, "seconds.")
+#This script converts video timecode into seconds.
+#TC exported from WLAN is in the hours:minutes:seconds.milliseconds format.
+#The framerate is set to 25 f/s.
+#This is the fourth version of this script.
+#In v4, the conversion has been changed according to the format output by ELAN.
+#In v5, the script has become a library used by the other scripts of the package:
+#- timecodes are converted into whole milliseconds (integers), so that no rounding error can occur;
+#- timecodes are validated: a malformed timecode raises ValueError instead of giving a wrong result;
+#- milliseconds can be formatted back into timecode and converted into frames at 25 f/s and back;
+#- many timecodes can be converted at once (parse_timecodes) or one after the other (iter_timecodes).
+#The other scripts convert timecodes with this library only (e.g. transcript.classify_line()).
+#When the script is run, it still converts a timecode typed by the user into seconds.
+
+import re
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#Frames per second of the video recordings.
+FRAMERATE = 25
+
+#Timecode in the format exported by ELAN, e.g. "00:08:31.484".
+TIMECODE_FORMAT = re.compile(r"(\d\d+):([0-5]\d):([0-5]\d)\.(\d{3})")
+
+#Position of the digits in a timecode of 12 characters ("HH:MM:SS.mmm") and their value in milliseconds.
+DIGIT_VALUES = {0: 36000000, 1: 3600000, 3: 600000, 4: 60000, 6: 10000, 7: 1000, 9: 100, 10: 10, 11: 1}
+
+
+def timeconvert(h, m, s):
+    """Converts video timecode into seconds.
+
+    Works for the hours:minutes:seconds.milliseconds format."""
+    total_seconds = 3600*h + 60*m + s
+    return total_seconds
+
+def parse_timecode(tc):
+    """Converts a timecode in the hours:minutes:seconds.milliseconds format into milliseconds.
+
+    Returns an integer. Raises ValueError if the timecode is malformed."""
+
+    match = TIMECODE_FORMAT.fullmatch(tc.strip())
+    if not match:
+        raise ValueError("Malformed timecode: " + repr(tc))
+    hours, minutes, seconds, milliseconds = match.groups()
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(milliseconds)
+
+def format_timecode(ms):
+    """Converts milliseconds into a timecode in the hours:minutes:seconds.milliseconds format.
+
+    Raises ValueError if the number of milliseconds is negative."""
+
+    ms = int(ms)
+    if ms < 0:
+        raise ValueError("Negative time: " + str(ms))
+    seconds, milliseconds = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return "%02d:%02d:%02d.%03d" % (hours, minutes, seconds, milliseconds)
+
+def ms_to_frames(ms, framerate=FRAMERATE):
+    """Returns the number of the frame shown at a time expressed in milliseconds."""
+
+    return int(ms) * framerate // 1000
+
+def frames_to_ms(frames, framerate=FRAMERATE):
+    """Returns the time in milliseconds at which a frame starts."""
+
+    return -(-int(frames) * 1000 // framerate)
+
+def timecode_to_frames(tc, framerate=FRAMERATE):
+    """Converts a timecode in the hours:minutes:seconds.milliseconds format into a frame number."""
+
+    return ms_to_frames(parse_timecode(tc), framerate)
+
+def frames_to_timecode(frames, framerate=FRAMERATE):
+    """Converts a frame number into a timecode in the hours:minutes:seconds.milliseconds format."""
+
+    return format_timecode(frames_to_ms(frames, framerate))
+
+def iter_timecodes(timecodes):
+    """Converts timecodes into milliseconds one after the other, as they are needed.
+
+    timecodes can be any iterable, e.g. a generator reading a long file.
+    Raises ValueError at the first malformed timecode."""
+
+    for tc in timecodes:
+        yield parse_timecode(tc)
+
+def parse_timecodes(timecodes):
+    """Converts a list of timecodes into milliseconds at once.
+
+    Returns an array of integers (array("q"), which NumPy can use without copying it).
+    Raises ValueError if a timecode is malformed."""
+
+    timecodes = list(timecodes)
+    #With NumPy, timecodes of 12 characters are converted all together:
+    #the characters are turned into digits and multiplied by the value of their position.
+    if numpy is not None and timecodes and all(len(tc) == 12 for tc in timecodes):
+        try:
+            characters = numpy.frombuffer("".join(timecodes).encode("ascii"), dtype=numpy.uint8)
+        except UnicodeEncodeError:
+            characters = None
+        if characters is not None:
+            characters = characters.reshape(len(timecodes), 12).astype(numpy.int64) - ord("0")
+            positions = list(DIGIT_VALUES)
+            digits = characters[:, positions]
+            valid = ((digits >= 0) & (digits <= 9)).all()
+            valid = valid and (characters[:, [2, 5]] == ord(":") - ord("0")).all()
+            valid = valid and (characters[:, 8] == ord(".") - ord("0")).all()
+            valid = valid and (characters[:, 3] <= 5).all() and (characters[:, 6] <= 5).all()
+            if valid:
+                values = numpy.array([DIGIT_VALUES[position] for position in positions], dtype=numpy.int64)
+                return array("q", (digits * values).sum(axis=1).tobytes())
+    #Otherwise (or to find the malformed timecode), convert them one by one.
+    return array("q", iter_timecodes(timecodes))
+
+def run_function():
+
+    #Fetches input from user
+    #(an alternative method would be to retrieve TC from transcript text):
+    while True:
+        tc = input("Type timecode here:")
+
+        #Converts the timecode into milliseconds, checking its format:
+        try:
+            ms = parse_timecode(tc)
+        except ValueError:
+            print("The timecode must be in the hours:minutes:seconds.milliseconds format (e.g. 00:08:31.484). Try again.")
+            continue
+        else:
+            break
+
+    #Outputs a statement for the user:
+    print("These are", ms / 1000, "seconds.")
+    print("This is frame", ms_to_frames(ms), "at", FRAMERATE, "frames per second.")
+
+#Perform all operations
+if __name__ == "__main__":
+    run_function()
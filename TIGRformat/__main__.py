@@ -0,0 +1,296 @@
+#Command line interface of the TIGRformat package
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#EXPLANATION:
+#Each script of the package can be run without any question being asked, as a subcommand:
+#python -m TIGRformat SUBCOMMAND [INPUT] [-o OUTPUT] [options]
+#The transcript is read from INPUT (a file path) or, if INPUT is missing or "-", from the standard input.
+#The result is written to OUTPUT (a new file) or, if OUTPUT is missing or "-", to the standard output.
+#Subcommands can therefore be chained in the command prompt, e.g.:
+#python -m TIGRformat tcfilter export.txt -i 30 | python -m TIGRformat nolabels -o export_nolbls.txt
+#Only the script needed by the subcommand is loaded.
+#With the option --stream, a transforming subcommand reads and writes the transcript line by line
+#instead of holding it in memory (tcfilter reads its input twice: the standard input is first copied to a temporary file).
+#Type "python -m TIGRformat SUBCOMMAND --help" for the options of a subcommand.
+
+import argparse
+import importlib
+import io
+import os
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from itertools import chain
+
+#Subcommands that transform a transcript: module, function and description.
+TRANSFORMS = {
+    "tcfilter": ("TIGRformat.TIGRtimecode.timecode_at_intervals", "filter_timecodes",
+                 "keep timecodes at an interval and insert timecode marks (timecode_at_intervals)"),
+    "nolabels": ("TIGRformat.TIGRlayout.suppress_repeated_labels", "suppress_labels",
+                 "suppress speaker labels repeated within etic turns (suppress_repeated_labels)"),
+    "concat": ("TIGRformat.TIGRlayout.concatenate", "concatenate",
+               "concatenate etic turns and break long lines (concatenate)"),
+    "number": ("TIGRformat.TIGRlayout.number_lines", "number_transcript",
+               "number the lines of the transcript (number_lines)"),
+    "fix-pauses": ("TIGRformat.TIGRlayout.ad_hoc_corrections.correct_pause_placement", "correct_pauses",
+                   "move pauses placed at the line beginning to the text position (correct_pause_placement)"),
+    "reindent": ("TIGRformat.TIGRlayout.ad_hoc_corrections.reduce_indent", "reduce_indent",
+                 "reduce the indent of the transcript text (reduce_indent)"),
+}
+
+#Subcommands that check a transcript and print a report: module and description.
+CHECKS = {
+    "checkbrackets": ("TIGRformat.TIGRlayout.check_orphan_brackets",
+                      "list orphan brackets (check_orphan_brackets)"),
+    "combicheck": ("TIGRformat.TIGRlayout.combicheck",
+                   "list repeated labels, timecode marks followed by brackets and noise arrows (combicheck)"),
+}
+
+#Subcommands that have their own command line: module and description.
+PROGRAMS = {
+    "pipeline": ("TIGRformat.pipeline", "run several stages on a transcript in memory"),
+    "batch": ("TIGRformat.batch", "run the stages on a whole corpus in parallel"),
+    "recheck": ("TIGRformat.TIGRlayout.recheck", "check transcripts again after corrections, using a cache (--watch: on each save)"),
+    "eaf": ("TIGRformat.TIGRelan.eaf_export", "build the traditional transcript of ELAN documents (.eaf) without exporting them"),
+    "overlapstats": ("TIGRformat.TIGRanalysis.overlap_stats", "overlap and turn-transition statistics of a corpus (CSV or JSON)"),
+    "pauses": ("TIGRformat.TIGRanalysis.pauses", "pauses and speech-rate profiles of processed transcripts (CSV or JSON)"),
+    "turns": ("TIGRformat.TIGRanalysis.turns", "table of the etic turns of processed transcripts (columns, CSV or Parquet)"),
+    "timeindex": ("TIGRformat.TIGRtimecode.time_index", "index a processed transcript by time and find the lines at a time"),
+    "synthetic": ("TIGRformat.TIGRbenchmark.synthetic", "generate a synthetic transcript as exported from ELAN"),
+    "benchmark": ("TIGRformat.TIGRbenchmark.benchmark", "measure the scripts on synthetic transcripts of growing length"),
+}
+
+
+def read_text(path):
+    """Reads a transcript from a file or, if path is "-", from the standard input."""
+
+    if path == "-":
+        return io.StringIO(sys.stdin.buffer.read().decode("utf-8"), newline=None).read()
+    with open(path, "r", encoding="utf-8") as file:
+        return file.read()
+
+
+def write_text(path, text):
+    """Writes text to a new file or, if path is "-", to the standard output."""
+
+    if path == "-":
+        sys.stdout.buffer.write(text.encode("utf-8"))
+        sys.stdout.flush()
+    else:
+        with open(path, "x", encoding="utf-8") as f:
+            f.write(text)
+
+
+def open_input(path):
+    """Opens a transcript file or, if path is "-", the standard input, to be read line by line."""
+
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def seekable_input(file):
+    """Returns the file if it can be read again, otherwise a temporary copy of it."""
+
+    if file.seekable():
+        return file
+    copy = tempfile.TemporaryFile("w+", encoding="utf-8")
+    copy.writelines(file)
+    copy.seek(0)
+    return copy
+
+
+def write_lines(path, lines):
+    """Writes lines as they are produced to a new file or, if path is "-", to the standard output.
+
+        If producing the lines fails, the incomplete file is removed."""
+
+    if path == "-":
+        for line in lines:
+            sys.stdout.buffer.write(line.encode("utf-8"))
+        sys.stdout.flush()
+        return
+    with open(path, "x", encoding="utf-8") as f:
+        try:
+            f.writelines(lines)
+        except BaseException:
+            f.close()
+            os.remove(path)
+            raise
+
+
+def interval_list(text):
+    """Converts the value of --interval (one or more numbers of seconds, separated by commas) into a list of intervals."""
+
+    module = importlib.import_module("TIGRformat.TIGRtimecode.timecode_at_intervals")
+    try:
+        return module.parse_intervals(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a number of seconds or several separated by commas, e.g. 10,30,60: "
+                                         + repr(text))
+
+
+def split_lines(text):
+    """Splits a text into a list of lines as file.readlines() does."""
+
+    return io.StringIO(text).readlines()
+
+
+def run_transform(args):
+    """Applies a transforming subcommand to the input transcript."""
+
+    module_name, function_name, description = TRANSFORMS[args.command]
+    module = importlib.import_module(module_name)
+    if args.stream:
+        return run_stream_transform(args, module, function_name)
+    content = split_lines(read_text(args.input))
+    if args.command == "tcfilter" and len(args.interval) > 1:
+        #One file per interval, named after OUTPUT (or, by default, after INPUT).
+        base = args.output if args.output != "-" else args.input[:-4]+"_tcfltrd.txt"
+        for interval, variant in module.filter_variants(content, args.interval, args.timing).items():
+            variant.append(module.timecode_statement(interval))
+            write_text(base[:-4]+"_"+str(interval)+"s.txt", "".join(variant))
+        return 0
+    if args.command == "tcfilter":
+        content = module.filter_timecodes(content, args.interval[0], args.timing)
+        content.append(module.timecode_statement(args.interval[0]))
+    elif args.command == "concat":
+        content = module.concatenate(content, args.width, args.indent)
+    else:
+        content = getattr(module, function_name)(content)
+    write_text(args.output, "".join(content))
+    return 0
+
+
+def run_stream_transform(args, module, function_name):
+    """Applies a transforming subcommand to the input transcript line by line (option --stream)."""
+
+    with open_input(args.input) as file:
+        if args.command == "tcfilter":
+            file = seekable_input(file)
+            base = args.output if args.output != "-" else args.input[:-4]+"_tcfltrd.txt"
+            for interval in args.interval:
+                lines = chain(module.iter_filter_timecodes(file, interval, args.timing), [module.timecode_statement(interval)])
+                if len(args.interval) > 1:
+                    write_lines(base[:-4]+"_"+str(interval)+"s.txt", lines)
+                else:
+                    write_lines(args.output, lines)
+                file.seek(0)
+        elif args.command == "concat":
+            write_lines(args.output, module.iter_concatenate(file, args.width, args.indent))
+        else:
+            write_lines(args.output, getattr(module, "iter_"+function_name)(file))
+    return 0
+
+
+def run_check(args):
+    """Applies a checking subcommand to the input transcripts and writes its report.
+
+        Returns 1 if problems (orphan brackets, diagnostics of combicheck) are found, 0 otherwise."""
+
+    module = importlib.import_module(CHECKS[args.command][0])
+    report = io.StringIO()
+    records = []
+    status = 0
+    for path in args.input:
+        with redirect_stdout(report):
+            if len(args.input) > 1 and args.format == "text":
+                print("\n==>", path, "<==")
+            if args.command == "checkbrackets":
+                #Files are mapped in memory rather than read (see check_orphan_brackets.check_file()).
+                if path == "-":
+                    orphans = module.checkbr(read_text(path))
+                else:
+                    orphans = module.check_file(path)
+                module.report_orphans(orphans)
+                found = orphans
+            else:
+                content = split_lines(read_text(path))
+                rules = module.overlap_rules() if args.overlap else None
+                found = module.check(content, rules)
+                if args.format == "text":
+                    module.print_report(content, found, rules)
+                else:
+                    records.extend(module.as_records(found, path))
+        if found:
+            status = 1
+    if args.format != "text":
+        module.write_json(records, report, lines=(args.format == "jsonl"))
+    write_text(args.output, report.getvalue())
+    return status
+
+
+def run_program(args):
+    """Passes the remaining arguments to a subcommand that has its own command line."""
+
+    module = importlib.import_module(PROGRAMS[args.command][0])
+    return module.main(args.arguments) or 0
+
+
+def build_parser():
+    """Defines the subcommands and their arguments."""
+
+    parser = argparse.ArgumentParser(prog="python -m TIGRformat",
+                                     description="Process traditional transcripts exported from ELAN.")
+    subparsers = parser.add_subparsers(dest="command", metavar="SUBCOMMAND")
+    subparsers.required = True
+    for name, (module_name, description) in CHECKS.items():
+        subparser = subparsers.add_parser(name, help=description, description=description)
+        subparser.set_defaults(handler=run_check, format="text", overlap=False)
+        subparser.add_argument("input", nargs="*", default=["-"], help="transcript files (default: standard input)")
+        if name == "combicheck":
+            subparser.add_argument("--format", choices=["text", "json", "jsonl"], default="text",
+                                   help="text report, or JSON list / JSON Lines of the problems found (default: text)")
+            subparser.add_argument("--overlap", action="store_true",
+                                   help="also check the square brackets against the times of the segments "
+                                        "(exported transcripts with \"begin - end\" timecode lines)")
+    for name, (module_name, function_name, description) in TRANSFORMS.items():
+        subparser = subparsers.add_parser(name, help=description, description=description)
+        subparser.set_defaults(handler=run_transform)
+        if name == "tcfilter":
+            subparser.add_argument("-i", "--interval", type=interval_list, required=True,
+                                   help="interval in seconds at which timecodes are maintained; with several intervals "
+                                        "separated by commas (e.g. 10,30,60), one file is written per interval, "
+                                        "named after OUTPUT or INPUT with the suffix _XXs")
+            subparser.add_argument("--timing", action="store_true",
+                                   help="find overlapping talk from the times of the segments instead of the square brackets")
+        if name == "concat":
+            subparser.add_argument("--width", type=int, default=86,
+                                   help="maximum length of lines (default: 86)")
+            subparser.add_argument("--indent", type=int,
+                                   help="position where the text of broken lines starts (default: the transcript's text position)")
+    for name, subparser in list(subparsers.choices.items()):
+        if name not in CHECKS:
+            subparser.add_argument("input", nargs="?", default="-", help="transcript file (default: standard input)")
+        subparser.add_argument("-o", "--output", default="-", help="new file to write to (default: standard output)")
+        if name in TRANSFORMS:
+            subparser.add_argument("--stream", action="store_true",
+                                   help="read and write the transcript line by line instead of holding it in memory")
+    for name, (module_name, description) in PROGRAMS.items():
+        subparsers.add_parser(name, help=description, description=description)
+    return parser
+
+
+def main(argv=None):
+    """Runs a subcommand from the command line and returns its exit status."""
+
+    if argv is None:
+        argv = sys.argv[1:]
+    #Pass all remaining arguments, options included, to the subcommands that have their own command line.
+    if argv and argv[0] in PROGRAMS:
+        return run_program(argparse.Namespace(command=argv[0], arguments=argv[1:]))
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "tcfilter" and len(args.interval) > 1 and args.input == "-" and args.output == "-":
+        parser.error("several intervals need an input file or --output to name the files")
+    if args.command == "concat" and args.indent is not None and not 0 <= args.indent < args.width:
+        parser.error("--indent must be between 0 and --width")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
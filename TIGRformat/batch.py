@@ -0,0 +1,197 @@
+#Run the automatic steps of the workflow on a whole corpus
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#- directories containing "traditional transcript" files exported from ELAN (all .txt files are processed),
+#  or glob patterns (e.g. "corpus/*.txt") or file paths;
+#  with the option --eaf, the ELAN documents (.eaf files) of the directories are processed instead,
+#  without exporting them first (see TIGRelan.eaf_export);
+#- interval in seconds at which timecodes are maintained.
+#OUTPUT:
+#- one processed file per transcript (see TIGRformat.pipeline), saved in the output directory
+#  or, if no output directory is given, next to the transcript;
+#- a summary listing the transcripts processed successfully and those that failed;
+#- with the option --report FILE, the run report of each transcript (see TIGRformat.runreport)
+#  and the report of the whole batch, saved as FILE (JSON): time and lines per stage over the corpus,
+#  slowest transcripts and the report of each transcript.
+
+#EXPLANATION:
+#Each transcript is processed by a separate worker process, so that the corpus is processed
+#on as many processor cores as there are workers (option --jobs, by default the number of cores).
+#The transcripts are processed and listed in alphabetical order,
+#so that the output files and the summary are the same whatever the number of workers.
+#Files whose names contain the suffix of a processing stage (e.g. "_tcfltrd") are not considered
+#transcripts exported from ELAN and are skipped when a directory is given.
+#Usage:
+#python -m TIGRformat.batch CORPUS_FOLDER --interval 30 --output-dir PROCESSED_FOLDER
+
+import argparse
+import glob
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from . import pipeline
+from . import runreport
+
+#Outcome of the processing of one transcript.
+#save is the name of the saved file, error the error message (None if successful),
+#report the run report (None if not requested).
+Result = namedtuple("Result", ["transcript", "save", "error", "report"], defaults=[None])
+
+
+def is_processed(filename):
+    """Checks if a file name contains the suffix of one of the processing stages."""
+
+    name = os.path.basename(filename)
+    for suffix in pipeline.SUFFIXES.values():
+        if suffix + "_" in name or name.endswith(suffix + ".txt"):
+            return True
+    return False
+
+
+def find_transcripts(paths, extension=".txt"):
+    """Lists the transcript files designated by directories, glob patterns or file paths.
+
+        The files of each directory with the extension (".txt", or ".eaf" for ELAN documents) are listed.
+        The files of each directory or pattern are sorted alphabetically, and no file is listed twice."""
+
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = [name for name in glob.glob(os.path.join(path, "*" + extension)) if not is_processed(name)]
+        elif glob.has_magic(path):
+            names = glob.glob(path)
+        else:
+            names = [path]
+        for name in sorted(names):
+            if name not in found:
+                found.append(name)
+    return found
+
+
+def parallel_map(function, items, *arguments, jobs=None):
+    """Calls function on each item (and the corresponding values of the other lists of arguments) in parallel.
+
+        jobs is the number of worker processes (by default the number of processor cores);
+        with jobs=1 the items are processed one after the other in the current process.
+        Returns the list of the results, in the order of the items."""
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(items)))
+    if jobs == 1:
+        return list(map(function, items, *arguments))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(function, items, *arguments))
+
+
+def process_one(transcript, interval, stages, keep_intermediate, directory, index=False, stream=False, report=False,
+                profile=False, xref=False, timing=False):
+    """Processes one transcript and returns a Result instead of raising errors."""
+
+    try:
+        save = pipeline.process_file(transcript, interval, stages, keep_intermediate, directory=directory, index=index,
+                                     stream=stream, report=report, profile=profile, xref=xref,
+                                     timing=timing)
+        record = None
+        if report or profile:
+            record = runreport.load_report(runreport.report_name(save))
+    except Exception as error:
+        return Result(transcript, None, type(error).__name__ + ": " + str(error))
+    return Result(transcript, save, None, record)
+
+
+def process_corpus(transcripts, interval, stages=pipeline.STAGE_NAMES, keep_intermediate=False, directory=None, jobs=None,
+                   index=False, stream=False, report=False, profile=False, xref=False, timing=False):
+    """Processes a list of transcripts in parallel.
+
+        jobs is the number of worker processes (by default the number of processor cores);
+        if index is True, the time index of each processed file is saved as well;
+        if xref is True, the cross-reference from line numbers to timecodes of each numbered file is saved as well;
+        if timing is True, the tcfilter stage finds overlapping talk from the times of the segments;
+        if stream is True, each transcript is processed line by line instead of being held in memory;
+        if report is True, the run report of each transcript is saved and returned in its Result;
+        if profile is True, the stages are profiled as well;
+        with jobs=1 the transcripts are processed one after the other in the current process.
+        Returns the list of Result tuples, in the order of the transcripts."""
+
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    arguments = ([interval] * len(transcripts), [stages] * len(transcripts),
+                 [keep_intermediate] * len(transcripts), [directory] * len(transcripts), [index] * len(transcripts),
+                 [stream] * len(transcripts), [report] * len(transcripts), [profile] * len(transcripts),
+                 [xref] * len(transcripts), [timing] * len(transcripts))
+    return parallel_map(process_one, transcripts, *arguments, jobs=jobs)
+
+
+def report(results):
+    """Prints a summary of the results returned by process_corpus()."""
+
+    failed = [result for result in results if result.error is not None]
+    print("\nProcessed successfully:", len(results) - len(failed), "of", len(results), "transcripts")
+    for result in results:
+        if result.error is None:
+            print("OK     ", result.transcript, "->", result.save)
+    for result in failed:
+        print("FAILED ", result.transcript, ":", result.error)
+
+
+def main(argv=None):
+    """Processes a corpus from the command line."""
+
+    parser = argparse.ArgumentParser(prog="python -m TIGRformat.batch",
+                                     description="Run the automatic steps of the TIGRformat workflow on a whole corpus.")
+    parser.add_argument("paths", nargs="+", help="directories, glob patterns or transcript files")
+    parser.add_argument("--eaf", action="store_true",
+                        help="process the ELAN documents (.eaf) of the directories instead of exported transcripts")
+    parser.add_argument("-i", "--interval", type=int, help="interval in seconds at which timecodes are maintained")
+    parser.add_argument("--timing", action="store_true",
+                        help="find overlapping talk from the times of the segments instead of the square brackets (tcfilter stage)")
+    parser.add_argument("-d", "--output-dir", help="directory for the processed files (default: next to each transcript)")
+    parser.add_argument("-j", "--jobs", type=int, help="number of worker processes (default: number of processor cores)")
+    parser.add_argument("--stages", type=pipeline.parse_stages, default=pipeline.STAGE_NAMES,
+                        help="comma-separated stages to run (default: " + ",".join(pipeline.STAGE_NAMES) + ")")
+    parser.add_argument("--keep-intermediate", action="store_true",
+                        help="also save the document produced by each stage")
+    parser.add_argument("--index", action="store_true",
+                        help="also save the time index of each processed file (_tcindex.tsv)")
+    parser.add_argument("--xref", action="store_true",
+                        help="also save the cross-reference from line numbers to timecodes of each file (_lnxref.tsv)")
+    parser.add_argument("--stream", action="store_true",
+                        help="process each transcript line by line instead of holding it in memory (for very long files)")
+    parser.add_argument("--report", metavar="FILE",
+                        help="save the run report of each transcript and the report of the batch as FILE (JSON)")
+    parser.add_argument("--profile", action="store_true",
+                        help="run each stage under cProfile and tracemalloc and save the results next to each processed file")
+    args = parser.parse_args(argv)
+    if "tcfilter" in args.stages and args.interval is None:
+        parser.error("the tcfilter stage needs --interval")
+    if args.xref and "number" not in args.stages:
+        parser.error("--xref needs the number stage")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.report is not None and os.path.exists(args.report):
+        parser.error(args.report + " already exists")
+
+    transcripts = find_transcripts(args.paths, ".eaf" if args.eaf else ".txt")
+    if not transcripts:
+        parser.error("no transcript found")
+    results = process_corpus(transcripts, args.interval, args.stages, args.keep_intermediate,
+                             args.output_dir, args.jobs, args.index, args.stream, args.report is not None, args.profile,
+                             args.xref, args.timing)
+    report(results)
+    if args.report is not None:
+        runreport.save_report(args.report, runreport.batch_report(results))
+        print("\nReport saved as", args.report)
+    if any(result.error is not None for result in results):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
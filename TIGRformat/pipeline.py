@@ -0,0 +1,392 @@
+#Run the automatic steps of the workflow on a transcript in one go
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#- "traditional transcript" file exported from ELAN with timecodes and without suppressing repeated speaker labels,
+#  or the ELAN document itself (.eaf), whose traditional transcript is then built directly (see TIGRelan.eaf_export);
+#- interval in seconds at which timecodes are maintained.
+#OUTPUT:
+#transcript file processed by the following scripts, in this order:
+#- TIGRtimecode.timecode_at_intervals ("_tcfltrd");
+#- TIGRlayout.suppress_repeated_labels ("_nolbls");
+#- TIGRlayout.concatenate ("_concat");
+#- TIGRlayout.ad_hoc_corrections.correct_pause_placement ("_pausecorr");
+#- TIGRlayout.number_lines ("_ln").
+#The document is saved appending the suffixes of all stages to the document name.
+
+#EXPLANATION:
+#The document is read once and passed from one stage to the next in memory.
+#Between two stages it is split into lines exactly as if it had been saved
+#and opened again with file.readlines(), so that the result is the same
+#as when the scripts are run one after the other.
+#The intermediate documents are only saved if requested (option --keep-intermediate).
+#With the option --index, the time index of the processed file is saved as well (see TIGRtimecode.time_index).
+#With the option --xref, the cross-reference from line numbers to timecodes is saved while numbering
+#(see TIGRlayout.number_lines).
+#With the option --stream, the document is not held in memory: each stage reads the lines produced by the
+#preceding one as they come and keeps only the few lines it needs, and the processed lines are saved as they come.
+#The transcript file is read twice by the first stage (tcfilter). The result is the same as without --stream.
+#With the option --report, the time and counts of each stage are saved as JSON next to the processed file,
+#and with --profile each stage is run under cProfile and tracemalloc (see TIGRformat.runreport).
+#Usage:
+#python -m TIGRformat.pipeline TRANSCRIPT.txt --interval 30
+
+import argparse
+import io
+import os
+import tempfile
+from itertools import chain
+from time import perf_counter
+
+from .TIGRtimecode import timecode_at_intervals
+from .TIGRtimecode import time_index
+from .TIGRlayout import suppress_repeated_labels
+from .TIGRlayout import concatenate
+from .TIGRlayout.ad_hoc_corrections import correct_pause_placement
+from .TIGRlayout import number_lines
+from .TIGRlayout import combicheck
+from .TIGRlayout import check_orphan_brackets
+from . import runreport
+from .TIGRelan import eaf_export
+
+#Name and file name suffix of each stage, in the order of the workflow.
+STAGES = [("tcfilter", "_tcfltrd"),
+          ("nolabels", "_nolbls"),
+          ("concat", "_concat"),
+          ("fix-pauses", "_pausecorr"),
+          ("number", "_ln")]
+STAGE_NAMES = [name for name, suffix in STAGES]
+SUFFIXES = dict(STAGES)
+
+
+def split_lines(text):
+    """Splits a text into a list of lines as file.readlines() does."""
+
+    return io.StringIO(text).readlines()
+
+
+def read_transcript(filename):
+    """Opens a transcript file and returns it as a list of lines.
+
+        The traditional transcript of an ELAN document (.eaf) is built directly."""
+
+    if eaf_export.is_eaf(filename):
+        return eaf_export.eaf_lines(filename)
+    with open(filename, "r", encoding="utf-8") as file:
+        return file.readlines()
+
+
+def open_transcript(filename):
+    """Opens a transcript file to be read line by line (and read again after file.seek(0)).
+
+        The traditional transcript of an ELAN document (.eaf) is built directly and written to a temporary file."""
+
+    if eaf_export.is_eaf(filename):
+        file = tempfile.TemporaryFile("w+", encoding="utf-8")
+        file.writelines(eaf_export.iter_transcript(eaf_export.merge_annotations(eaf_export.read_eaf(filename))))
+        file.seek(0)
+        return file
+    return open(filename, "r", encoding="utf-8")
+
+
+def iter_split_lines(chunks):
+    """Splits the text made of a sequence of strings into lines as file.readlines() does,
+        yielding the lines one by one instead of joining the whole text."""
+
+    rest = ""
+    for chunk in chunks:
+        lines = (rest + chunk).split("\n")
+        rest = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if rest:
+        yield rest
+
+
+def save_transcript(save, content):
+    """Saves a list of lines to a new file (an existing file is never overwritten)."""
+
+    with open(save, "x", encoding="utf-8") as f:
+        f.write("".join(content))
+
+
+def save_stream(save, lines):
+    """Saves lines to a new file as they are produced (an existing file is never overwritten).
+
+        If producing the lines fails, the incomplete file is removed."""
+
+    with open(save, "x", encoding="utf-8") as f:
+        try:
+            f.writelines(lines)
+        except BaseException:
+            f.close()
+            os.remove(save)
+            raise
+
+
+def iter_save(save, lines):
+    """Yields lines while saving them to a new file, which is removed if the lines are not all read."""
+
+    with open(save, "x", encoding="utf-8") as f:
+        try:
+            for line in lines:
+                f.write(line)
+                yield line
+        except BaseException:
+            f.close()
+            os.remove(save)
+            raise
+
+
+def run_stage(name, content, interval=None, xref=None, timing=False, joined=None):
+    """Applies one stage of the workflow to a document opened as a list of lines.
+
+        If xref is a list, the number stage appends the cross-reference of the numbered lines to it.
+        If joined is a list, the concat stage appends the number of lines it joined to it.
+        If timing is True, the tcfilter stage finds overlapping talk from the times of the segments.
+        Returns the processed document as a new list of lines."""
+
+    if name == "tcfilter":
+        content = timecode_at_intervals.filter_timecodes(content, interval, timing)
+        content.append(timecode_at_intervals.timecode_statement(interval))
+    elif name == "nolabels":
+        content = suppress_repeated_labels.suppress_labels(content)
+    elif name == "concat":
+        content = concatenate.concatenate(content, joined=joined)
+    elif name == "fix-pauses":
+        content = correct_pause_placement.correct_pauses(content)
+    elif name == "number":
+        content = number_lines.number_transcript(content, xref)
+    else:
+        raise ValueError("Unknown stage: " + name)
+    return split_lines("".join(content))
+
+
+def stream_stage(name, lines, interval=None, xref=None, timing=False, joined=None):
+    """Applies one stage of the workflow to a document read line by line.
+
+        lines is any iterable of lines; for the tcfilter stage, it must be a transcript file opened
+        for reading, which is read twice. Returns an iterator over the processed lines."""
+
+    if name == "tcfilter":
+        lines = chain(timecode_at_intervals.iter_filter_timecodes(lines, interval, timing),
+                      [timecode_at_intervals.timecode_statement(interval)])
+    elif name == "nolabels":
+        lines = suppress_repeated_labels.iter_suppress_labels(lines)
+    elif name == "concat":
+        lines = concatenate.iter_concatenate(lines, joined=joined)
+    elif name == "fix-pauses":
+        lines = correct_pause_placement.iter_correct_pauses(lines)
+    elif name == "number":
+        lines = number_lines.iter_number_transcript(lines, xref)
+    else:
+        raise ValueError("Unknown stage: " + name)
+    return iter_split_lines(lines)
+
+
+def run_stream(file, interval, stages=STAGE_NAMES, on_stage=None, meter=None, xref=None, timing=False, joined=None):
+    """Applies the stages of the workflow to a transcript file opened for reading, line by line.
+
+        on_stage, if given, is called with the name of each stage and the iterator over the lines it produces,
+        and returns the iterator passed on to the next stage.
+        meter, if given, is a runreport.RunMeter counting and timing the lines produced by each stage.
+        If xref is a list, the number stage appends the cross-reference of the numbered lines to it.
+        If joined is a list, the concat stage appends the number of lines it joined to it once all lines are read.
+        If timing is True, the tcfilter stage finds overlapping talk from the times of the segments.
+        Returns an iterator over the processed lines: the file is only read as the lines are requested."""
+
+    lines = file
+    for name in stages:
+        if name == "tcfilter" and interval is None:
+            raise ValueError("The tcfilter stage needs a timecode interval.")
+        if name == "tcfilter" and lines is not file:
+            raise ValueError("The tcfilter stage must be the first stage.")
+        lines = stream_stage(name, lines, interval, xref, timing, joined)
+        if on_stage:
+            lines = on_stage(name, lines)
+        if meter is not None:
+            lines = meter.wrap(name, lines)
+    return lines
+
+
+def run_pipeline(content, interval, stages=STAGE_NAMES, on_stage=None, meter=None, xref=None, timing=False,
+                 joined=None):
+    """Applies the stages of the workflow to a document opened as a list of lines.
+
+        on_stage, if given, is called with the name of each stage and the document it produced.
+        meter, if given, is a runreport.RunMeter through which each stage is run.
+        If xref is a list, the number stage appends the cross-reference of the numbered lines to it.
+        If joined is a list, the concat stage appends the number of lines it joined to it.
+        If timing is True, the tcfilter stage finds overlapping talk from the times of the segments.
+        Returns the processed document as a new list of lines."""
+
+    for name in stages:
+        if name == "tcfilter" and interval is None:
+            raise ValueError("The tcfilter stage needs a timecode interval.")
+        if meter is not None:
+            content = meter.run(name, run_stage, name, list(content), interval, xref, timing, joined)
+        else:
+            content = run_stage(name, list(content), interval, xref, timing, joined)
+        if on_stage:
+            on_stage(name, content)
+    return content
+
+
+def output_name(filename, stages=STAGE_NAMES):
+    """Returns the file name obtained by appending the suffixes of the stages to the document name."""
+
+    return filename[:-4] + "".join(SUFFIXES[name] for name in stages) + ".txt"
+
+
+def check_saved(save, stages=STAGE_NAMES):
+    """Counts the problems found by combicheck and check_orphan_brackets in a processed file, by rule."""
+
+    content = read_transcript(save)
+    if "number" in stages:
+        content = number_lines.remove_line_numbers(content)
+    return runreport.count_diagnostics(combicheck.check(content), check_orphan_brackets.check_file(save))
+
+
+def process_file(filename, interval, stages=STAGE_NAMES, keep_intermediate=False, save=None, directory=None, index=False,
+                 stream=False, report=False, profile=False, xref=False, timing=False):
+    """Runs the stages of the workflow on a transcript file and saves the result.
+
+        If keep_intermediate is True, the document produced by each stage is saved as well.
+        If index is True, the time index of the saved file is created (see TIGRtimecode.time_index).
+        If xref is True and the number stage is run, the cross-reference from line numbers to timecodes is saved
+        next to the saved file (see TIGRlayout.number_lines).
+        If timing is True, the tcfilter stage finds overlapping talk from the times of the segments
+        (see TIGRtimecode.overlap).
+        If stream is True, the document is processed and saved line by line instead of being held in memory.
+        If report is True, the run report is saved next to the saved file (see TIGRformat.runreport);
+        if profile is True, the stages are profiled as well.
+        The files are saved in directory if given, otherwise next to the transcript file.
+        Returns the name of the saved file."""
+
+    base = filename
+    if directory is not None:
+        base = os.path.join(directory, os.path.basename(filename))
+    done = []
+
+    def keep(name, content):
+        done.append(name)
+        if keep_intermediate and len(done) < len(stages):
+            save_transcript(output_name(base, done), content)
+
+    def keep_stream(name, lines):
+        done.append(name)
+        if keep_intermediate and len(done) < len(stages):
+            return iter_save(output_name(base, done), lines)
+        return lines
+
+    if save is None:
+        save = output_name(base, stages)
+    pairs = [] if xref and "number" in stages else None
+    meter = None
+    if report or profile:
+        meter = runreport.RunMeter(runreport.Profiler(save) if profile else None)
+    start = perf_counter()
+    if stream:
+        with open_transcript(filename) as file:
+            if meter is None:
+                save_stream(save, run_stream(file, interval, stages, keep_stream, xref=pairs, timing=timing))
+            else:
+                meter.start(file)
+                file.seek(0)
+                lines = run_stream(file, interval, stages, keep_stream, meter, pairs, timing, meter.joined)
+                if meter.profiler is not None:
+                    #The stages run at once, one line at a time, so they can only be profiled together.
+                    meter.profiler.call("stream", save_stream, save, lines)
+                else:
+                    save_stream(save, lines)
+                meter.finish()
+    else:
+        content = read_transcript(filename)
+        if meter is not None:
+            meter.start(content)
+        save_transcript(save, run_pipeline(content, interval, stages, keep, meter, pairs, timing,
+                                           meter.joined if meter is not None else None))
+    seconds = perf_counter() - start
+    if pairs is not None:
+        number_lines.write_xref(number_lines.xref_name(save), pairs)
+    if index:
+        time_index.index_file(save)
+    if meter is not None:
+        record = {"transcript": filename,
+                  "save": save,
+                  "interval": interval,
+                  "timing": timing,
+                  "stream": stream,
+                  "seconds": seconds,
+                  "stages": [runreport.stage_record(stats, meter.joined) for stats in meter.stages],
+                  "diagnostics": check_saved(save, stages)}
+        if meter.profiler is not None:
+            record["profile"] = meter.profiler.save_summary()
+            record["peak_bytes"] = max(meter.profiler.peaks.values(), default=0)
+        runreport.save_report(runreport.report_name(save), record)
+    return save
+
+
+def parse_stages(text):
+    """Converts a comma-separated list of stage names into a list, in workflow order."""
+
+    names = [name.strip() for name in text.split(",") if name.strip()]
+    for name in names:
+        if name not in SUFFIXES:
+            raise argparse.ArgumentTypeError("unknown stage " + repr(name) + " (choose from " + ", ".join(STAGE_NAMES) + ")")
+    return [name for name in STAGE_NAMES if name in names]
+
+
+def build_parser(parser=None):
+    """Defines the command line arguments of the pipeline."""
+
+    if parser is None:
+        parser = argparse.ArgumentParser(prog="python -m TIGRformat.pipeline",
+                                         description="Run the automatic steps of the TIGRformat workflow on a transcript.")
+    parser.add_argument("transcript", help="traditional transcript exported from ELAN, or ELAN document (.eaf)")
+    parser.add_argument("-i", "--interval", type=int, help="interval in seconds at which timecodes are maintained")
+    parser.add_argument("--timing", action="store_true",
+                        help="find overlapping talk from the times of the segments instead of the square brackets (tcfilter stage)")
+    parser.add_argument("-o", "--output", help="name of the saved file (default: suffixes of all stages appended)")
+    parser.add_argument("--stages", type=parse_stages, default=STAGE_NAMES,
+                        help="comma-separated stages to run (default: " + ",".join(STAGE_NAMES) + ")")
+    parser.add_argument("--keep-intermediate", action="store_true",
+                        help="also save the document produced by each stage")
+    parser.add_argument("--index", action="store_true",
+                        help="also save the time index of the processed file (_tcindex.tsv)")
+    parser.add_argument("--xref", action="store_true",
+                        help="also save the cross-reference from line numbers to timecodes (_lnxref.tsv; number stage)")
+    parser.add_argument("--stream", action="store_true",
+                        help="process the transcript line by line instead of holding it in memory (for very long files)")
+    parser.add_argument("--report", action="store_true",
+                        help="also save the time and counts of each stage as JSON (_report.json)")
+    parser.add_argument("--profile", action="store_true",
+                        help="run each stage under cProfile and tracemalloc and save the results (implies --report)")
+    return parser
+
+
+def main(argv=None):
+    """Runs the pipeline from the command line."""
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if "tcfilter" in args.stages and args.interval is None:
+        parser.error("the tcfilter stage needs --interval")
+    if args.xref and "number" not in args.stages:
+        parser.error("--xref needs the number stage")
+    save = process_file(args.transcript, args.interval, args.stages, args.keep_intermediate, args.output, index=args.index,
+                        stream=args.stream, report=args.report, profile=args.profile, xref=args.xref,
+                        timing=args.timing)
+    print("File saved as", save)
+    if args.report or args.profile:
+        record = runreport.load_report(runreport.report_name(save))
+        runreport.print_stages(record)
+        print("Report saved as", runreport.report_name(save))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#Statistics and profiling of the automatic steps of the workflow
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#INPUT:
+#the stages run by TIGRformat.pipeline (or TIGRformat.batch) with the option --report or --profile.
+#OUTPUT:
+#- a run report saved next to the processed file, appending "_report.json" to its name:
+#  for each stage, the time it took, the numbers of lines, speaker labels and timecodes it received and produced,
+#  and what it did (timecodes kept, labels suppressed, lines concatenated);
+#  for the processed file, the number of problems found by combicheck and check_orphan_brackets;
+#- with --profile, the cProfile statistics of each stage ("_STAGE.prof", to be opened with pstats or snakeviz)
+#  and a summary of the slowest functions and of the largest memory allocations ("_profile.txt").
+
+#EXPLANATION:
+#Lines, labels and timecodes are counted as the documents pass from one stage to the next.
+#The counts are not part of the times reported.
+#The lines concatenated by the stage "concat" are counted by the stage itself: the difference between its lines in and out
+#also depends on the line breaks it inserts.
+#The statement on the timecode interval added by tcfilter at the end of the document is neither a label nor a timecode.
+#Numbering (stage "number") changes neither labels nor timecodes, which can no longer be told apart once the lines
+#start with their number: the numbered document is reported with the labels and timecodes it received.
+#A speaker label is a line starting with an uppercase letter, a timecode a line containing "HH:MM:SS.mmm"
+#(in the export, the "begin - end" line of each segment; after tcfilter, the "--TIMECODE--" lines).
+#In streaming mode (option --stream) all stages run at once, one line at a time:
+#the time of each stage is then the time spent producing its lines minus the time spent by the preceding stage,
+#and all stages are profiled together ("_stream.prof").
+#Profiling slows the stages down considerably: the times of a profiled run only show where the time goes.
+#Usage:
+#python -m TIGRformat.pipeline TRANSCRIPT.txt --interval 30 --report [--profile]
+
+import cProfile
+import io
+import json
+import marshal
+import pstats
+import tracemalloc
+from collections import namedtuple
+from time import perf_counter
+
+from .transcript import TIMECODE_PATTERN
+from .TIGRtimecode.timecode_at_intervals import STATEMENT
+
+#Number of functions and of allocation sites listed for each stage in the profile summary.
+PROFILE_TOP = 20
+#Number of slowest transcripts listed in the batch report.
+SLOWEST = 10
+
+#Time and counts of one stage. peak_bytes is the memory peak traced while profiling (None if not profiled).
+StageStats = namedtuple("StageStats", ["stage", "seconds", "lines_in", "lines_out", "labels_in", "labels_out",
+                                       "timecodes_in", "timecodes_out", "peak_bytes"])
+
+
+class LineCounts:
+    """Numbers of lines, speaker labels and timecodes of a document, counted one line at a time.
+
+        Labels and timecodes are no longer counted after the statement on the timecode interval."""
+
+    def __init__(self):
+        self.lines = 0
+        self.labels = 0
+        self.timecodes = 0
+        self.ended = False
+
+    def add(self, line):
+        self.lines += 1
+        if self.ended:
+            return
+        if line.startswith(STATEMENT):
+            self.ended = True
+            return
+        if "A" <= line[:1] <= "Z":
+            self.labels += 1
+        if ":" in line and TIMECODE_PATTERN.search(line):
+            self.timecodes += 1
+
+
+def count_lines(lines):
+    """Counts the lines, speaker labels and timecodes of a document (any iterable of lines)."""
+
+    counts = LineCounts()
+    for line in lines:
+        counts.add(line)
+    return counts
+
+
+class MeteredLines:
+    """Iterator over the lines produced by a stage in streaming mode, counting them and timing the stage.
+
+        seconds is the time spent waiting for the lines (including the time of the preceding stages),
+        overhead the time spent counting them."""
+
+    def __init__(self, lines):
+        self.lines = iter(lines)
+        self.counts = LineCounts()
+        self.seconds = 0.0
+        self.overhead = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = perf_counter()
+        try:
+            line = next(self.lines)
+        finally:
+            stop = perf_counter()
+            self.seconds += stop - start
+        self.counts.add(line)
+        self.overhead += perf_counter() - stop
+        return line
+
+
+class Profiler:
+    """Profiles function calls with cProfile and tracemalloc and saves the results next to the processed file."""
+
+    def __init__(self, save):
+        self.base = save[:-4]
+        self.files = []
+        self.summary = []
+        self.peaks = {}
+
+    def call(self, name, function, *args):
+        """Calls function(*args) under the profilers and returns its result."""
+
+        profiler = cProfile.Profile()
+        tracemalloc.start()
+        profiler.enable()
+        try:
+            result = function(*args)
+        finally:
+            profiler.disable()
+            self.peaks[name] = tracemalloc.get_traced_memory()[1]
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        self.save_profile(name, profiler)
+        self.add_summary(name, profiler, snapshot)
+        return result
+
+    def save_profile(self, name, profiler):
+        """Saves the statistics of profiler as pstats.Stats.dump_stats() does, without overwriting an existing file."""
+
+        filename = self.base + "_" + name + ".prof"
+        profiler.create_stats()
+        with open(filename, "xb") as f:
+            marshal.dump(profiler.stats, f)
+        self.files.append(filename)
+
+    def add_summary(self, name, profiler, snapshot):
+        """Adds the slowest functions and the largest allocations of a profiled call to the summary."""
+
+        text = io.StringIO()
+        stats = pstats.Stats(profiler, stream=text)
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+        self.summary.append("=== " + name + " ===\n")
+        self.summary.append("Memory peak: " + format(self.peaks[name] / 1e6, ".1f") + " MB\n")
+        self.summary.append(text.getvalue())
+        self.summary.append("Largest allocations still held at the end:\n")
+        for statistic in snapshot.statistics("lineno")[:PROFILE_TOP]:
+            self.summary.append(str(statistic) + "\n")
+        self.summary.append("\n")
+
+    def save_summary(self):
+        """Saves the summary of all profiled calls and returns the list of files saved."""
+
+        filename = self.base + "_profile.txt"
+        with open(filename, "x", encoding="utf-8") as f:
+            f.write("".join(self.summary))
+        return self.files + [filename]
+
+
+class RunMeter:
+    """Collects the StageStats of the stages of one run, optionally profiling them.
+
+        In memory, each stage is run through run(); in streaming mode, the lines produced by each stage
+        are passed through wrap()."""
+
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.stages = []
+        #Number of lines joined by the stage "concat" (see TIGRlayout.concatenate).
+        self.joined = []
+        self.counts = None
+        self.streamed = []
+
+    def start(self, lines):
+        """Counts the lines of the document received by the first stage."""
+
+        self.counts = count_lines(lines)
+
+    def run(self, name, function, *args):
+        """Runs a stage on a document held in memory and returns the processed document (a list of lines)."""
+
+        start = perf_counter()
+        if self.profiler is None:
+            content = function(*args)
+        else:
+            content = self.profiler.call(name, function, *args)
+        seconds = perf_counter() - start
+        self.add(name, seconds, count_lines(content))
+        return content
+
+    def wrap(self, name, lines):
+        """Returns an iterator over the lines produced by a stage in streaming mode, counting and timing them."""
+
+        metered = MeteredLines(lines)
+        self.streamed.append((name, metered))
+        return metered
+
+    def finish(self):
+        """Adds the StageStats of the stages run in streaming mode, once all lines have been read."""
+
+        previous = None
+        for name, metered in self.streamed:
+            seconds = metered.seconds
+            if previous is not None:
+                seconds -= previous.seconds + previous.overhead
+            self.add(name, max(seconds, 0.0), metered.counts)
+            previous = metered
+        self.streamed = []
+
+    def add(self, name, seconds, counts):
+        """Adds the StageStats of a stage, given the counts of the document it produced."""
+
+        peak = None
+        if self.profiler is not None:
+            peak = self.profiler.peaks.get(name)
+        if name == "number":
+            counts.labels = self.counts.labels
+            counts.timecodes = self.counts.timecodes
+        self.stages.append(StageStats(name, seconds, self.counts.lines, counts.lines, self.counts.labels, counts.labels,
+                                      self.counts.timecodes, counts.timecodes, peak))
+        self.counts = counts
+
+
+def stage_record(stats, joined=None):
+    """Converts StageStats into a dictionary, adding what the stage did.
+
+    joined is the list to which the concat stage appended the number of lines it joined."""
+
+    record = stats._asdict()
+    if stats.peak_bytes is None:
+        del record["peak_bytes"]
+    if stats.stage == "tcfilter":
+        record["timecodes_kept"] = stats.timecodes_out
+    elif stats.stage == "nolabels":
+        record["labels_suppressed"] = stats.labels_in - stats.labels_out
+    elif stats.stage == "concat" and joined:
+        record["lines_concatenated"] = sum(joined)
+    return record
+
+
+def count_diagnostics(diagnostics, orphans):
+    """Counts the Diagnostic tuples found by combicheck by rule, and the orphan brackets."""
+
+    counts = {}
+    for diagnostic in diagnostics:
+        counts[diagnostic.rule] = counts.get(diagnostic.rule, 0) + 1
+    counts["orphan-bracket"] = len(orphans)
+    return counts
+
+
+def report_name(save):
+    """Returns the name of the report of a processed file."""
+
+    return save[:-4] + "_report.json"
+
+
+def save_report(filename, report):
+    """Saves a report as JSON to a new file (an existing file is never overwritten)."""
+
+    with open(filename, "x", encoding="utf-8") as f:
+        json.dump(report, f, indent=1, ensure_ascii=False)
+        f.write("\n")
+
+
+def load_report(filename):
+    """Opens a report saved by save_report()."""
+
+    with open(filename, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def batch_report(results):
+    """Combines the reports of the transcripts of a corpus (Result tuples returned by TIGRformat.batch)
+        into the report of the batch: totals per stage, slowest transcripts and the report of each transcript."""
+
+    files = []
+    stages = {}
+    for result in results:
+        if result.error is not None:
+            files.append({"transcript": result.transcript, "error": result.error})
+            continue
+        files.append(result.report)
+        for record in result.report["stages"]:
+            total = stages.setdefault(record["stage"], {"seconds": 0.0, "lines_in": 0, "lines_out": 0})
+            for key in total:
+                total[key] += record[key]
+    done = [report for report in files if "error" not in report]
+    slowest = sorted(done, key=lambda report: report["seconds"], reverse=True)[:SLOWEST]
+    return {"transcripts": len(files),
+            "failed": len(files) - len(done),
+            "seconds": sum(report["seconds"] for report in done),
+            "stages": stages,
+            "slowest": [{"transcript": report["transcript"], "seconds": report["seconds"]} for report in slowest],
+            "files": files}
+
+
+def print_stages(report):
+    """Prints the time and counts of each stage of a run report."""
+
+    print("stage          seconds   lines in  lines out")
+    for record in report["stages"]:
+        print(record["stage"].ljust(12), format(record["seconds"], "9.3f"), format(record["lines_in"], "10d"),
+              format(record["lines_out"], "10d"))
@@ -0,0 +1,233 @@
+#Parsed representation of transcripts shared by all scripts
+
+#This script is part of the "TIGRformat" package.
+#The package supports a workflow in which "traditional transcripts" are exported from ELAN
+#and processed automatically and manually in view of qualitative analysis.
+#Refer to the package's readme file for more information.
+
+#EXPLANATION:
+#All scripts need to know, for each line of a transcript, whether it starts with a speaker label,
+#continues the discourse of the preceding line, contains timecode, etc.
+#The Transcript class classifies each line once and stores the result in compact arrays,
+#one item per line:
+#- kinds: what the line starts with (see the constants below);
+#- flags: what the line contains (pause, timecode mark "TC", arrow "-->");
+#- speakers: number of the speaker label (labels are interned: the same label always has the same number);
+#- offsets: position in the line where the text starts (for lines with timecode: position of the timecode);
+#- times: first timecode of the line in milliseconds.
+#The position where the transcribed discourse starts (text_column) is calculated once per document,
+#from the first timecode mark "TC" if present (as the scripts have always done),
+#otherwise from the first timecode (as in transcripts exported from ELAN).
+#Scripts that read a transcript line by line without holding it in memory (streaming mode)
+#classify each line with classify_line(), which applies the same rules.
+
+import re
+from array import array
+from itertools import chain
+
+from .TIGRtimecode.timeconvert import parse_timecode
+
+#Kinds of lines, determined by their first character.
+EMPTY = 0           #empty string (line deleted by a script)
+LABEL = 1           #uppercase letter: speaker label
+CONTINUATION = 2    #space: discourse, pause or timecode continuing the preceding segment
+TIMECODE = 3        #"-": "--TIMECODE--" line
+PAUSE = 4           #pause "(X.XX)" placed at the line beginning
+OTHER = 5           #anything else, e.g. a blank line or metadata
+
+#Flags describing the content of lines.
+HAS_PAUSE = 1       #contains a pause "(X.XX)"
+HAS_MARK = 2        #contains "TC" (timecode mark "((TC))")
+HAS_ARROW = 4       #contains "-->" (pointer to the ending of an ambient noise)
+
+PAUSE_PATTERN = re.compile(r"\(\d+\.\d+\)")
+TIMECODE_PATTERN = re.compile(r"(\d\d):(\d\d):(\d\d)\.(\d{3})")
+
+
+def find_text_column(content):
+    """Returns the position in the line where the transcribed discourse starts.
+
+        The position is calculated from the first timecode mark "TC" in the document (content opened as a list of lines),
+        or, if there is none, from the first timecode. Returns None if there is neither."""
+
+    for line in content:
+        position = line.find("TC")
+        if position >= 0:
+            return position - 2
+    for line in content:
+        timecode = TIMECODE_PATTERN.search(line)
+        if timecode:
+            return timecode.start()
+    return None
+
+
+def label_field(line, text_column):
+    """Returns the part of a line reserved for the speaker label (up to text_column, or the first word if it is None)."""
+
+    if text_column is None:
+        return line.split(None, 1)[0]
+    return line[:text_column]
+
+
+def classify_line(line, text_column=None):
+    """Classifies one line of a transcript.
+
+        Returns its kind, flags, label field (None if the line does not start with a speaker label),
+        offset and time in milliseconds (-1 if the line contains no timecode), as stored by Transcript.
+        Scripts that read a transcript line by line use this function instead of the Transcript class."""
+
+    field = None
+    offset = 0
+    time = -1
+    flags = 0
+    if not line:
+        kind = EMPTY
+    elif line[0] == " ":
+        kind = CONTINUATION
+        offset = len(line) - len(line.lstrip(" "))
+    elif line[0] == "-":
+        kind = TIMECODE
+    elif "A" <= line[0] <= "Z":
+        kind = LABEL
+        field = label_field(line, text_column)
+        if text_column is not None:
+            offset = text_column
+    elif PAUSE_PATTERN.match(line):
+        kind = PAUSE
+    else:
+        kind = OTHER
+    if "(" in line and PAUSE_PATTERN.search(line):
+        flags |= HAS_PAUSE
+    if "TC" in line:
+        flags |= HAS_MARK
+    if "-->" in line:
+        flags |= HAS_ARROW
+    if ":" in line:
+        timecode = TIMECODE_PATTERN.search(line)
+        if timecode:
+            #A malformed timecode (e.g. 00:75:00.000) is not a time.
+            try:
+                time = parse_timecode(timecode.group())
+                offset = timecode.start()
+            except ValueError:
+                pass
+    return kind, flags, field, offset, time
+
+
+def text_column_ahead(lines):
+    """Finds the position where the transcribed discourse starts in a document read line by line.
+
+        lines is any iterable of lines (e.g. an open file). The lines are read ahead until the first
+        timecode mark "TC" or, in a document without timecode marks (e.g. exported from ELAN), the first timecode,
+        so that only the lines preceding it are held in memory (see find_text_column()).
+        Returns the position (or None) and an iterator over all the lines, starting with those read ahead."""
+
+    lines = iter(lines)
+    ahead = []
+    for line in lines:
+        ahead.append(line)
+        if "TC" in line or ":" in line and TIMECODE_PATTERN.search(line):
+            break
+    return find_text_column(ahead), chain(ahead, lines)
+
+
+class Transcript:
+    """Lines of a transcript classified once, with one record per line stored in parallel arrays.
+
+        The document must be opened as a list of lines (file.readlines()).
+        Lines must be modified with set_line() so that their records stay up to date."""
+
+    __slots__ = ("lines", "kinds", "flags", "speakers", "offsets", "times",
+                 "text_column", "speaker_ids", "speaker_names")
+
+    def __init__(self, content, text_column=None):
+        self.lines = content
+        if text_column is None:
+            text_column = find_text_column(content)
+        self.text_column = text_column
+        self.speaker_ids = {}
+        self.speaker_names = []
+        count = len(content)
+        self.kinds = array("b", bytes(count))
+        self.flags = array("B", bytes(count))
+        self.speakers = array("i", [-1]) * count
+        self.offsets = array("i", [0]) * count
+        self.times = array("q", [-1]) * count
+        for index in range(count):
+            self.classify(index)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def copy(self):
+        """Returns an independent copy of the transcript, without classifying the lines again."""
+
+        other = Transcript.__new__(Transcript)
+        other.lines = list(self.lines)
+        other.kinds = array("b", self.kinds)
+        other.flags = array("B", self.flags)
+        other.speakers = array("i", self.speakers)
+        other.offsets = array("i", self.offsets)
+        other.times = array("q", self.times)
+        other.text_column = self.text_column
+        other.speaker_ids = dict(self.speaker_ids)
+        other.speaker_names = list(self.speaker_names)
+        return other
+
+    def classify(self, index):
+        """Computes the record of the line at index."""
+
+        kind, flags, field, offset, time = classify_line(self.lines[index], self.text_column)
+        self.kinds[index] = kind
+        self.flags[index] = flags
+        self.speakers[index] = self.intern(field) if field is not None else -1
+        self.offsets[index] = offset
+        self.times[index] = time
+
+    def label_field(self, line):
+        """Returns the part of a line reserved for the speaker label."""
+
+        return label_field(line, self.text_column)
+
+    def intern(self, field):
+        """Returns the number of a speaker label, assigning a new number to labels not seen before."""
+
+        speaker = self.speaker_ids.get(field)
+        if speaker is None:
+            speaker = len(self.speaker_names)
+            self.speaker_ids[field] = speaker
+            self.speaker_names.append(field.strip())
+        return speaker
+
+    def set_line(self, index, line):
+        """Replaces the line at index and updates its record."""
+
+        self.lines[index] = line
+        self.classify(index)
+
+    def timecode(self, index):
+        """Returns the first timecode of the line at index as a string ("HH:MM:SS.mmm"), or None."""
+
+        if self.times[index] < 0:
+            return None
+        offset = self.offsets[index]
+        return self.lines[index][offset:offset + 12]
+
+    def speaker(self, index):
+        """Returns the speaker label of the line at index, or None if the line has no label."""
+
+        if self.speakers[index] < 0:
+            return None
+        return self.speaker_names[self.speakers[index]]
+
+    def indexes(self, kind=None, flag=None):
+        """Lists the indexes of the lines of a kind and/or with a flag."""
+
+        return [index for index in range(len(self.lines))
+                if (kind is None or self.kinds[index] == kind) and (flag is None or self.flags[index] & flag)]
+
+
+def parse(content):
+    """Parses a document opened as a list of lines (file.readlines()) into a Transcript."""
+
+    return Transcript(content)
@@ -0,0 +1,44 @@
+#Check of the transcript built from an ELAN document (TIGRelan.eaf_export)
+
+#The fixture overlap_chain.eaf contains a chain of overlaps: ANNA speaks from 1 to 4 s, BEA from 3 to 6 s,
+#then ANNA again from 5 to 9 s, while an ambient noise lasts from 5 to 6 s.
+#BEA is overlapped twice: every overlap must be marked, also in a segment that already has brackets,
+#so that TIGRlayout.combicheck --overlap finds no mismatch between the brackets and the times.
+#Usage (in the folder containing TIGRformat):
+#python -m unittest discover tests
+
+import os
+import unittest
+
+from TIGRformat.TIGRelan.eaf_export import eaf_lines
+from TIGRformat.TIGRlayout.combicheck import check, overlap_rules
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "overlap_chain.eaf")
+
+EXPECTED = [
+    "ANNA                allora oggi ci vediamo [alle tre]\n",
+    "                    00:00:01.000 - 00:00:04.000\n",
+    "BEA                 [sì va] bene alle [tre allora]\n",
+    "                    00:00:03.000 - 00:00:06.000\n",
+    "ANNA                [no aspetta] facciamo alle quattro allora va bene\n",
+    "                    00:00:05.000 - 00:00:09.000\n",
+    "AMBIENT_NOISES      ((rumore)) -->\n",
+    "                    00:00:05.000 - 00:00:06.000\n",
+    "(1.00)\n",
+    "BEA                 perfetto ciao\n",
+    "                    00:00:10.000 - 00:00:11.000\n",
+]
+
+
+class OverlapChainTest(unittest.TestCase):
+
+    def test_every_overlap_is_marked(self):
+        self.assertEqual(eaf_lines(FIXTURE), EXPECTED)
+
+    def test_brackets_match_times(self):
+        diagnostics = check(eaf_lines(FIXTURE), overlap_rules())
+        self.assertEqual([diagnostic for diagnostic in diagnostics if diagnostic.rule == "overlap-bracket"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+#Check of the cross-reference from line numbers to timecodes (TIGRlayout.number_lines)
+
+#Lines are numbered after the manual corrections, so that a "--TIMECODE--" line may contain a mistyped timecode:
+#the line is numbered as any other and left out of the cross-reference.
+#Usage (in the folder containing TIGRformat):
+#python -m unittest discover tests
+
+import unittest
+
+from TIGRformat.TIGRlayout.number_lines import iter_number_transcript, number_transcript
+
+CONTENT = [
+    "Recording: X\n",
+    "----Transcript----\n",
+    "\n",
+    "ANNA                ((TC)) allora oggi\n",
+    "--TIMECODE--        00:00:04.680\n",
+    "BEA                 ((TC)) sì va bene\n",
+    "--TIMECODE--        00:75:00.000\n",
+    "ANNA                ((TC)) perfetto\n",
+    "--TIMECODE--        00:01:02.500\n",
+]
+
+
+class MalformedTimecodeTest(unittest.TestCase):
+
+    def test_malformed_timecode_is_numbered(self):
+        xref = []
+        numbered = number_transcript(CONTENT, xref)
+        self.assertEqual(numbered[6], "4    --TIMECODE--        00:75:00.000\n")
+        self.assertEqual(xref, [(2, 4680), (6, 62500)])
+
+    def test_stream_is_the_same(self):
+        xref = []
+        self.assertEqual(list(iter_number_transcript(CONTENT, xref)), number_transcript(CONTENT))
+        self.assertEqual(xref, [(2, 4680), (6, 62500)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+#Check of the memory needed to process a transcript line by line (streaming mode, "--stream")
+
+#A transcript exported from ELAN has no "----Transcript----" title and no timecode mark "((TC))":
+#the lines read ahead to find them must not amount to the whole document.
+#Usage (in the folder containing TIGRformat):
+#python -m unittest discover tests
+
+import tracemalloc
+import unittest
+from unittest import mock
+
+from TIGRformat.TIGRlayout import number_lines
+from TIGRformat.TIGRlayout.suppress_repeated_labels import iter_suppress_labels
+from TIGRformat.TIGRtimecode.timeconvert import format_timecode
+
+#Number of segments of the generated transcript (about 2.5 MB) and memory allowed while streaming it.
+SEGMENTS = 20000
+PEAK = 1 << 20
+
+
+def exported_lines():
+    """Yields the lines of a long transcript as exported from ELAN, without keeping them."""
+
+    for k in range(SEGMENTS):
+        speaker = "ANNA" if k % 3 else "BEA"
+        yield speaker + " " * (20 - len(speaker)) + "allora oggi ci vediamo alle tre e poi andiamo a casa insieme\n"
+        yield " " * 20 + format_timecode(k * 2000) + " - " + format_timecode(k * 2000 + 1500) + "\n"
+
+
+def peak_memory(lines):
+    """Returns the peak memory allocated while the lines are read to the end."""
+
+    tracemalloc.start()
+    try:
+        for line in lines:
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class UntitledStreamTest(unittest.TestCase):
+
+    def test_numbering_is_spooled(self):
+        with mock.patch.object(number_lines, "SPOOL_SIZE", 1 << 16):
+            self.assertLess(peak_memory(number_lines.iter_number_transcript(exported_lines())), PEAK)
+
+    def test_text_column_without_marks(self):
+        self.assertLess(peak_memory(iter_suppress_labels(exported_lines())), PEAK)
+
+    def test_numbering_without_title(self):
+        lines = list(exported_lines())[:4]
+        self.assertEqual(list(number_lines.iter_number_transcript(lines)),
+                         [number_lines.line_number_prefix(i) + line for i, line in enumerate(lines)])
+
+
+if __name__ == "__main__":
+    unittest.main()